@@ -9,7 +9,7 @@ from shop.models import WishList
 from pages.models import DashboardSettings
 from .forms import SupportForm, ProfileForm
 from .models import MemberResource
-from shop.models import OrderItem
+from shop.models import Entitlement
 
 
 @login_required
@@ -28,7 +28,7 @@ def dashboard_view(request):
         )
 
     purchased_count = (
-        OrderItem.objects.filter(order__user=user).values("product").distinct().count()
+        Entitlement.objects.filter(user=user).values("product").distinct().count()
     )
 
     member_resources = MemberResource.objects.filter(is_active=True)
@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.contrib.admin.widgets import AdminTextareaWidget
 from .models import Category, Post
 from django.utils.html import format_html, format_html_join
+from ebuilder.thumbnails import thumbnail_url
 from pages.widgets import RichTextWidget
 
 
@@ -63,9 +64,10 @@ class PostAdmin(admin.ModelAdmin):
         )
 
     def display_thumbnail(self, obj):
-        image_url = obj.get_thumbnail_url()
+        # External images can't be resized; uploads get a 100px rendition
+        image_url = obj.external_image_url or thumbnail_url(obj.thumbnail or obj.image)
         if image_url:
-            return format_html('<img src="{}" width="50" />', image_url)
+            return format_html('<img src="{}" width="50" loading="lazy" />', image_url)
         return "-"
 
     display_thumbnail.short_description = "Thumbnail"
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-19 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0005_alter_post_external_image_url"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["status", "publish_date"], name="post_published_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["category", "status", "publish_date"],
+                name="post_category_published_idx",
+            ),
+        ),
+    ]
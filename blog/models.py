@@ -104,6 +104,13 @@ class Post(YouTubeVideoMixin, models.Model):
 
     class Meta:
         ordering = ["-publish_date", "-created"]
+        indexes = [
+            models.Index(fields=["status", "publish_date"], name="post_published_idx"),
+            models.Index(
+                fields=["category", "status", "publish_date"],
+                name="post_category_published_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
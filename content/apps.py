@@ -1,6 +1,20 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.db.models.signals import post_delete, post_save
 
 
 class ContentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'content'
+
+    def ready(self):
+        from .signals import invalidate_content_cache
+
+        # Everything the cached homepage / shop list content is built from
+        models = list(self.get_models()) + [
+            apps.get_model("pages", "Page"),
+            apps.get_model("blog", "Post"),
+            apps.get_model("shop", "ShopSettings"),
+        ]
+        for model in models:
+            post_save.connect(invalidate_content_cache, sender=model)
+            post_delete.connect(invalidate_content_cache, sender=model)
@@ -0,0 +1,55 @@
+# content/cache.py
+"""
+Published content blocks, cached stale-while-revalidate (ebuilder/swr.py).
+
+The homepage and shop list rebuild the same container blocks for every
+visitor. These helpers cache them - with FAQ items and gallery images
+prefetched, so templates don't query - in the "content" namespace, which
+content/signals.py invalidates whenever an editor saves a block, page,
+post or shop settings. CONTENT_FRESH_FOR only bounds how long an edit made
+outside the ORM (a queryset .update()) can go unseen.
+"""
+
+from ebuilder.swr import stale_while_revalidate
+
+from .models import ContentContainer
+
+CONTENT_FRESH_FOR = 60 * 5
+CONTENT_STALE_FOR = 60 * 60 * 24
+NAMESPACE = "content"
+
+# What each block's template reads beyond the block itself
+RELATED = {
+    "faq_blocks": ["items"],
+    "gallery_blocks": ["images"],
+}
+
+
+@stale_while_revalidate(CONTENT_FRESH_FOR, CONTENT_STALE_FOR, namespace=NAMESPACE)
+def container_blocks(container_id, *relations):
+    """
+    A container's published blocks from the given relations, by order.
+    Usage: container_blocks(container.id, "sections", "faq_blocks")
+    """
+    container = ContentContainer(pk=container_id)
+    blocks = []
+    for relation in relations:
+        blocks += (
+            getattr(container, relation)
+            .filter(published=True)
+            .prefetch_related(*RELATED.get(relation, []))
+        )
+    for block in blocks:
+        block.block_type = block.__class__.__name__
+    return sorted(blocks, key=lambda block: block.order)
+
+
+@stale_while_revalidate(CONTENT_FRESH_FOR, CONTENT_STALE_FOR, namespace=NAMESPACE)
+def container_hero(container_id):
+    """A container's first published hero block, or None."""
+    return (
+        ContentContainer(pk=container_id)
+        .hero_blocks.filter(published=True)
+        .order_by("order")
+        .first()
+    )
@@ -0,0 +1,9 @@
+# content/signals.py
+from ebuilder import swr
+
+from .cache import NAMESPACE
+
+
+def invalidate_content_cache(sender, **kwargs):
+    """Saved/deleted block, page, post or shop settings -> drop cached blocks."""
+    swr.invalidate(NAMESPACE)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ebuilder.settings')
 
 application = get_asgi_application()
+
+# Build this worker's in-memory catalog before it takes requests
+from shop.catalog_index import warm  # noqa: E402
+
+warm()
@@ -0,0 +1,159 @@
+# ebuilder/db.py
+"""
+Database helpers shared across apps.
+
+- SQLITE_PRAGMAS: the production SQLite tuning applied on every new
+  connection (see DATABASES in settings.py).
+- retry_on_locked: opt-in retry-with-backoff wrapper for write transactions
+  that may hit "database is locked" under concurrent writers.
+- preserve_timestamps: keep explicit created/updated values on bulk writes.
+- observe_queries: pass a request's queries through an execute wrapper,
+  including those run in sync_to_async threads under ASGI.
+"""
+
+import functools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Applied in order on connect. WAL lets readers run alongside the single
+# writer; synchronous=NORMAL is safe with WAL and avoids an fsync per commit.
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=20000",
+    "PRAGMA mmap_size=134217728",  # 128 MB
+    "PRAGMA cache_size=-20000",  # ~20 MB
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+def sqlite_init_command(pragmas=None):
+    """Return the OPTIONS['init_command'] string for the given pragmas."""
+    return "; ".join(pragmas or SQLITE_PRAGMAS)
+
+
+def is_locked_error(exc):
+    """True if the exception is SQLite's transient lock/busy error."""
+    message = str(exc).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+def retry_on_locked(
+    func=None, *, retries=None, base_delay=0.05, max_delay=1.0, using=None
+):
+    """
+    Run the wrapped function in its own transaction, retrying with
+    exponential backoff and jitter when SQLite reports the database as locked.
+
+    Only retries when called outside an existing transaction - inside an
+    outer atomic block a retry can't recover, so the error is re-raised.
+
+    Usage:
+        @retry_on_locked
+        def record_download(...): ...
+
+        @retry_on_locked(retries=5)
+        def create_order(...): ...
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            alias = using or DEFAULT_DB_ALIAS
+            max_retries = (
+                retries
+                if retries is not None
+                else getattr(settings, "DATABASE_WRITE_RETRIES", 3)
+            )
+            attempt = 0
+            while True:
+                try:
+                    with transaction.atomic(using=alias):
+                        return fn(*args, **kwargs)
+                except OperationalError as exc:
+                    in_outer_transaction = connections[alias].in_atomic_block
+                    if (
+                        not is_locked_error(exc)
+                        or in_outer_transaction
+                        or attempt >= max_retries
+                    ):
+                        raise
+                    delay = min(max_delay, base_delay * (2**attempt))
+                    delay = random.uniform(delay / 2, delay)
+                    attempt += 1
+                    logger.warning(
+                        f"Database locked in {fn.__qualname__}, "
+                        f"retry {attempt}/{max_retries} in {delay:.3f}s"
+                    )
+                    time.sleep(delay)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+@contextmanager
+def preserve_timestamps(model):
+    """
+    Temporarily switch off auto_now/auto_now_add so copied or generated rows
+    keep the created/updated values set on them.
+    """
+    changed = []
+    for field in model._meta.concrete_fields:
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+            changed.append((field, field.auto_now, field.auto_now_add))
+            field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+# Connections are per thread, so a wrapper installed on one thread's
+# connection misses queries an async view runs via sync_to_async. Instead
+# every connection gets _dispatch, which forwards to the observers in the
+# current context - contextvars follow the request into those threads.
+_observers = ContextVar("query_observers", default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    for observer in _observers.get():
+        execute = functools.partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+connection_created.connect(_install)
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Pass the queries run inside the block (in this context) through
+    observer(execute, sql, params, many, context), as execute_wrapper would.
+    Works in sync and async code.
+    """
+    for connection in connections.all():
+        _install(connection)
+    token = _observers.set((*_observers.get(), observer))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
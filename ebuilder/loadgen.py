@@ -0,0 +1,420 @@
+# ebuilder/loadgen.py
+"""
+Synthetic data for load testing and benchmarks.
+
+LoadDataGenerator fills the database with a production-shaped dataset:
+categories, products (with downloads and images), customers, orders with
+items and download logs, reviews, wishlists, blog posts and info pages.
+
+- Deterministic: the same seed and counts give the same rows.
+- Skewed like real shops: a few best sellers take most orders, a few
+  customers place most of them, most orders are recent, most ratings are
+  4-5 stars.
+- Fast: everything is written with chunked bulk_create inside one
+  transaction (100k orders take well under a minute on SQLite).
+
+Generated rows are tagged (slugs "load-...", emails "@load.example",
+order ids "ORD-LOAD...") so clear() can remove them again without touching
+real data.
+"""
+
+import random
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from blog.models import Category as BlogCategory
+from blog.models import Post
+from ebuilder.db import preserve_timestamps
+from infopages.models import Category as InfoCategory
+from infopages.models import InfoPage
+from shop.models import (
+    Category,
+    DownloadLog,
+    Order,
+    OrderItem,
+    Product,
+    ProductDownload,
+    ProductImage,
+    ProductReview,
+    WishList,
+)
+
+SLUG_PREFIX = "load-"
+EMAIL_DOMAIN = "load.example"
+ORDER_PREFIX = "ORD-LOAD"
+
+WORDS = (
+    "guide template planner course ebook toolkit bundle starter pro budget "
+    "business marketing design photo video audio python django writing notes "
+    "checklist workbook masterclass journal recipes fitness finance social "
+    "brand logo invoice resume portfolio podcast garden travel wedding"
+).split()
+
+FIRST_NAMES = (
+    "Alex Sam Jo Chris Pat Robin Jamie Morgan Taylor Casey Jordan Riley "
+    "Avery Quinn Charlie Drew Elliot Frankie Harper Jesse"
+).split()
+
+# Items per order, order outcome, downloads per purchased item, star rating
+ITEMS_PER_ORDER = ([1, 2, 3, 4], [60, 25, 10, 5])
+ORDER_STATUSES = (["completed", "pending", "failed"], [90, 6, 4])
+DOWNLOADS_PER_ITEM = ([0, 1, 2, 3, 5], [30, 40, 15, 10, 5])
+RATINGS = ([1, 2, 3, 4, 5], [3, 4, 10, 30, 53])
+
+DEFAULT_COUNTS = {
+    "categories": 12,
+    "products": 500,
+    "users": 5000,
+    "orders": 20000,
+    "reviews": 4000,
+    "wishlists": 10000,
+    "posts": 300,
+    "pages": 60,
+}
+
+
+def zipf_weights(n, exponent, rng):
+    """Cumulative Zipf-like weights over n items, in a shuffled rank order."""
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    return list(accumulate(1 / rank**exponent for rank in ranks))
+
+
+class LoadDataGenerator:
+    def __init__(self, seed=42, days=365, chunk_size=5000, log=None):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.chunk_size = chunk_size
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    # Helpers
+
+    def _words(self, count):
+        return " ".join(self.rng.choices(WORDS, k=count))
+
+    def _title(self):
+        return self._words(3).title()
+
+    def _html(self, sections, words=60):
+        return "".join(
+            f"<h2>{self._title()}</h2><p>{self._words(words)}.</p>"
+            for _ in range(sections)
+        )
+
+    def _past(self, skew=1.5):
+        """A moment in the last `days` days, skewed towards recent ones."""
+        return self.now - timedelta(
+            seconds=self.days * 86400 * self.rng.random() ** skew
+        )
+
+    def _bulk(self, model, objs):
+        with preserve_timestamps(model):
+            return model.objects.bulk_create(objs, batch_size=self.chunk_size)
+
+    # Public API
+
+    @classmethod
+    def exists(cls):
+        return Product.objects.filter(slug__startswith=SLUG_PREFIX).exists()
+
+    @classmethod
+    def clear(cls):
+        """Delete everything a previous run generated."""
+        with transaction.atomic():
+            Order.objects.filter(order_id__startswith=ORDER_PREFIX).delete()
+            get_user_model().objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+            Product.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+            Category.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+            Post.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+            BlogCategory.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+            InfoPage.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+            InfoCategory.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+
+    def generate(self, **counts):
+        """Create the dataset; returns the number of rows written per model."""
+        counts = {**DEFAULT_COUNTS, **counts}
+        self.written = Counter()
+        with transaction.atomic():
+            categories = self._categories(counts["categories"])
+            products = self._products(counts["products"], categories)
+            users = self._users(counts["users"])
+            if products and users:
+                pairs = self._orders(counts["orders"], products, users)
+                self._reviews(counts["reviews"], pairs)
+                self._wishlists(counts["wishlists"], products, users)
+            self._posts(counts["posts"])
+            self._pages(counts["pages"])
+        return dict(self.written)
+
+    # Catalogue
+
+    def _categories(self, count):
+        categories = self._bulk(
+            Category,
+            [
+                Category(
+                    name=f"{self._title()} {i}",
+                    slug=f"{SLUG_PREFIX}category-{i}",
+                    description=self._words(20),
+                )
+                for i in range(count)
+            ],
+        )
+        self.written["categories"] += len(categories)
+        return categories
+
+    def _products(self, count, categories):
+        rng = self.rng
+        category_weights = zipf_weights(len(categories), 1.0, rng)
+        products = []
+        for i in range(count):
+            created = self._past(skew=1.0)
+            price = rng.choice([299, 499, 799, 999, 1499, 1999, 2999, 4999])
+            products.append(
+                Product(
+                    title=f"{self._title()} {i}",
+                    slug=f"{SLUG_PREFIX}product-{i}",
+                    public_id=f"{SLUG_PREFIX}product-{i}",
+                    category=(
+                        rng.choices(categories, cum_weights=category_weights)[0]
+                        if categories
+                        else None
+                    ),
+                    description=self._words(40),
+                    long_description=self._html(3),
+                    status=rng.choices(["publish", "soon", "draft"], [90, 4, 6])[0],
+                    price_pence=price,
+                    sale_price_pence=price * 3 // 4 if rng.random() < 0.15 else None,
+                    featured=rng.random() < 0.05,
+                    order=i,
+                    download_limit=rng.choice([3, 5, 5, 10]),
+                    created=created,
+                    updated=created,
+                )
+            )
+        products = self._bulk(Product, products)
+        self.written["products"] += len(products)
+
+        downloads = []
+        images = []
+        for product in products:
+            for n in range(rng.choices([1, 2, 3], [70, 20, 10])[0]):
+                downloads.append(
+                    ProductDownload(
+                        product=product,
+                        label=["Download", "PDF Version", "Bonus Pack"][n],
+                        file=f"products/downloads/{product.slug}-{n}.zip",
+                        order=n,
+                    )
+                )
+            for n in range(rng.randint(1, 4)):
+                images.append(
+                    ProductImage(
+                        product=product,
+                        image=f"products/{product.slug}-{n}.jpg",
+                        alt_text=product.title,
+                        is_primary=n == 0,
+                        order=n,
+                    )
+                )
+        downloads = self._bulk(ProductDownload, downloads)
+        self.written["downloads"] += len(downloads)
+        self.written["images"] += len(self._bulk(ProductImage, images))
+
+        # Orders buy the first (primary) download variant
+        self.primary_download = {}
+        for download in downloads:
+            self.primary_download.setdefault(download.product_id, download)
+        return [p for p in products if p.status == "publish"]
+
+    # Customers and orders
+
+    def _users(self, count):
+        rng = self.rng
+        password = make_password(None)
+        User = get_user_model()
+        users = self._bulk(
+            User,
+            [
+                User(
+                    email=f"customer{i}@{EMAIL_DOMAIN}",
+                    password=password,
+                    first_name=rng.choice(FIRST_NAMES),
+                    is_verified=rng.random() < 0.8,
+                    date_joined=self._past(skew=1.0),
+                )
+                for i in range(count)
+            ],
+        )
+        self.written["users"] += len(users)
+        return users
+
+    def _orders(self, count, products, users):
+        """
+        Orders, their items and download logs, oldest first. Returns the
+        (user, product) pairs from completed orders, for reviews.
+        """
+        rng = self.rng
+        product_weights = zipf_weights(len(products), 1.1, rng)
+        user_weights = zipf_weights(len(users), 0.8, rng)
+        created_at = sorted(self._past() for _ in range(count))
+        purchases = Counter()
+        pairs = set()
+
+        for start in range(0, count, self.chunk_size):
+            stop = min(start + self.chunk_size, count)
+            buyers = rng.choices(users, cum_weights=user_weights, k=stop - start)
+            orders = []
+            for i, user in zip(range(start, stop), buyers):
+                status = rng.choices(*ORDER_STATUSES)[0]
+                orders.append(
+                    Order(
+                        order_id=f"{ORDER_PREFIX}{i:08d}",
+                        user=user,
+                        email=user.email,
+                        status=status,
+                        paid=status == "completed",
+                        payment_intent_id=f"pi_load_{i:08d}",
+                        created=created_at[i],
+                        updated=created_at[i],
+                    )
+                )
+            orders = self._bulk(Order, orders)
+
+            items = []
+            for order in orders:
+                size = rng.choices(*ITEMS_PER_ORDER)[0]
+                chosen = set(rng.choices(products, cum_weights=product_weights, k=size))
+                for product in chosen:
+                    downloads = 0
+                    if order.status == "completed":
+                        purchases[product.pk] += 1
+                        pairs.add((order.user_id, product.pk))
+                        downloads = min(
+                            rng.choices(*DOWNLOADS_PER_ITEM)[0],
+                            product.download_limit,
+                        )
+                    items.append(
+                        OrderItem(
+                            order=order,
+                            product=product,
+                            purchased_download=self.primary_download.get(product.pk),
+                            price_paid_pence=product.sale_price_pence
+                            or product.price_pence,
+                            download_count=downloads,
+                        )
+                    )
+            items = self._bulk(OrderItem, items)
+
+            logs = [
+                DownloadLog(
+                    order_item=item,
+                    user_id=item.order.user_id,
+                    downloaded_at=item.order.created
+                    + timedelta(hours=rng.random() * 24 * (n + 1)),
+                )
+                for item in items
+                for n in range(item.download_count)
+            ]
+            self._bulk(DownloadLog, logs)
+
+            self.written["orders"] += len(orders)
+            self.written["order_items"] += len(items)
+            self.written["download_logs"] += len(logs)
+            self.log(f"  orders {stop:>10}/{count}")
+
+        for product in products:
+            product.purchase_count = purchases[product.pk]
+        Product.objects.bulk_update(
+            products, ["purchase_count"], batch_size=self.chunk_size
+        )
+        return sorted(pairs)
+
+    def _reviews(self, count, pairs):
+        rng = self.rng
+        chosen = rng.sample(pairs, min(count, len(pairs)))
+        reviews = [
+            ProductReview(
+                user_id=user_id,
+                product_id=product_id,
+                rating=rng.choices(*RATINGS)[0],
+                comment=self._words(rng.randint(8, 40)).capitalize() + ".",
+                verified_purchase=True,
+                created=self._past(),
+            )
+            for user_id, product_id in chosen
+        ]
+        self.written["reviews"] += len(self._bulk(ProductReview, reviews))
+
+    def _wishlists(self, count, products, users):
+        rng = self.rng
+        product_weights = zipf_weights(len(products), 1.0, rng)
+        pairs = {
+            (rng.choice(users).pk, product.pk)
+            for product in rng.choices(products, cum_weights=product_weights, k=count)
+        }
+        wishlists = [
+            WishList(user_id=user_id, product_id=product_id, created=self._past())
+            for user_id, product_id in sorted(pairs)
+        ]
+        self.written["wishlists"] += len(self._bulk(WishList, wishlists))
+
+    # Content
+
+    def _posts(self, count):
+        rng = self.rng
+        categories = self._bulk(
+            BlogCategory,
+            [
+                BlogCategory(
+                    name=f"{self._title()} {i}", slug=f"{SLUG_PREFIX}topic-{i}"
+                )
+                for i in range(max(1, count // 40))
+            ],
+        )
+        posts = []
+        for i in range(count):
+            published = self._past(skew=1.0)
+            posts.append(
+                Post(
+                    title=f"{self._title()} {i}",
+                    slug=f"{SLUG_PREFIX}post-{i}",
+                    content=self._html(rng.randint(3, 10), words=120),
+                    category=rng.choice(categories),
+                    status="published" if rng.random() < 0.9 else "draft",
+                    is_featured=rng.random() < 0.03,
+                    publish_date=published,
+                    created=published,
+                    updated=published,
+                )
+            )
+        self.written["posts"] += len(self._bulk(Post, posts))
+
+    def _pages(self, count):
+        rng = self.rng
+        categories = self._bulk(
+            InfoCategory,
+            [
+                InfoCategory(name=f"{self._title()} {i}", slug=f"{SLUG_PREFIX}docs-{i}")
+                for i in range(max(1, count // 10))
+            ],
+        )
+        pages = [
+            InfoPage(
+                title=f"{self._title()} {i}",
+                slug=f"{SLUG_PREFIX}page-{i}",
+                page_type="policy" if i % 10 == 0 else "doc",
+                category=None if i % 10 == 0 else rng.choice(categories),
+                content=self._html(rng.randint(4, 12)),
+                last_updated=self._past(skew=1.0),
+            )
+            for i in range(count)
+        ]
+        self.written["pages"] += len(self._bulk(InfoPage, pages))
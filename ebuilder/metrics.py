@@ -0,0 +1,331 @@
+# ebuilder/metrics.py
+"""
+Lightweight request metrics in Prometheus text format.
+
+- MetricsMiddleware: per-URL-name latency histogram, response counts, and
+  DB query count/time per request.
+- TimedDjangoTemplates: template backend that times every top-level
+  template render.
+- timed("stripe", "create_payment_intent"): context manager for outbound
+  calls (Stripe, SMTP).
+- metrics_view: the protected /metrics endpoint.
+
+Each worker process aggregates in memory and periodically writes a snapshot
+to METRICS_DIR/<pid>.json (atomic rename, one file per process, so workers
+never contend). /metrics merges every snapshot, so whichever worker answers
+reports the whole server.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+
+from .db import observe_queries
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "ebuilder_http_request_duration_seconds": (
+        "histogram",
+        "Request latency by URL name",
+    ),
+    "ebuilder_http_responses_total": ("counter", "Responses by URL name and status"),
+    "ebuilder_db_queries_total": ("counter", "Database queries by URL name"),
+    "ebuilder_db_query_seconds_total": (
+        "counter",
+        "Time spent in database queries by URL name",
+    ),
+    "ebuilder_template_render_seconds": ("histogram", "Template render time"),
+    "ebuilder_external_call_seconds": (
+        "histogram",
+        "Outbound call duration (Stripe, SMTP)",
+    ),
+    "ebuilder_cache_lookups_total": (
+        "counter",
+        "Cache lookups by result (l1_hit, l2_hit, miss)",
+    ),
+}
+
+
+class Registry:
+    """In-process metric store; thread-safe and cheap to update."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._last_flush = 0.0
+
+    @staticmethod
+    def _key(labels):
+        return json.dumps(sorted(labels.items()))
+
+    def inc(self, name, labels, value=1):
+        key = self._key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = self._key(labels)
+        index = bisect_left(LATENCY_BUCKETS, value)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = {
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            if index < len(LATENCY_BUCKETS):
+                hist["buckets"][index] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(
+                json.dumps({"counters": self.counters, "histograms": self.histograms})
+            )
+
+    def maybe_flush(self):
+        """Write this process's snapshot if METRICS_FLUSH_INTERVAL has passed."""
+        now = time.monotonic()
+        if now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        self.flush()
+
+    def flush(self):
+        directory = Path(settings.METRICS_DIR)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{os.getpid()}.json"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.snapshot()))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+
+registry = Registry()
+
+
+def enabled():
+    return settings.METRICS_ENABLED
+
+
+@contextmanager
+def timed(service, operation):
+    """Time an outbound call: with timed("stripe", "retrieve_payment_intent"): ..."""
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(
+            "ebuilder_external_call_seconds",
+            {"service": service, "operation": operation},
+            time.perf_counter() - start,
+        )
+
+
+class _QueryTimer:
+    """connection.execute_wrapper that counts and times queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and DB work per resolved URL name.
+    Sync and async capable, so it doesn't force ASGI requests onto threads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with observe_queries(timer):
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+
+        timer = _QueryTimer()
+        start = time.perf_counter()
+        with observe_queries(timer):
+            response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    def _record(self, request, response, elapsed, timer):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        labels = {"view": view, "method": request.method}
+
+        registry.observe("ebuilder_http_request_duration_seconds", labels, elapsed)
+        registry.inc(
+            "ebuilder_http_responses_total",
+            {"view": view, "status": str(response.status_code)},
+        )
+        registry.inc("ebuilder_db_queries_total", {"view": view}, timer.count)
+        registry.inc("ebuilder_db_query_seconds_total", {"view": view}, timer.seconds)
+        registry.maybe_flush()
+
+
+class TimedTemplate:
+    """Backend template wrapper that records render time."""
+
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        if not enabled():
+            return self._wrapped.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            registry.observe(
+                "ebuilder_template_render_seconds",
+                {"template": self._wrapped.origin.template_name or "<string>"},
+                time.perf_counter() - start,
+            )
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend whose templates report their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def collect():
+    """Merge every worker's snapshot (plus this process's live data)."""
+    registry.flush()
+    merged = {"counters": {}, "histograms": {}}
+    for path in Path(settings.METRICS_DIR).glob("*.json"):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for name, series in data["counters"].items():
+            target = merged["counters"].setdefault(name, {})
+            for key, value in series.items():
+                target[key] = target.get(key, 0) + value
+        for name, series in data["histograms"].items():
+            target = merged["histograms"].setdefault(name, {})
+            for key, hist in series.items():
+                total = target.setdefault(
+                    key,
+                    {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0},
+                )
+                total["buckets"] = [
+                    a + b for a, b in zip(total["buckets"], hist["buckets"])
+                ]
+                total["sum"] += hist["sum"]
+                total["count"] += hist["count"]
+    return merged
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key, **extra):
+    pairs = [*json.loads(key), *extra.items()]
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render_prometheus(data):
+    lines = []
+    for name, series in sorted(data["counters"].items()):
+        kind, help_text = HELP.get(name, ("counter", name))
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for key, value in sorted(series.items()):
+            lines.append(f"{name}{_labels(key)} {value}")
+    for name, series in sorted(data["histograms"].items()):
+        kind, help_text = HELP.get(name, ("histogram", name))
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for key, hist in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(key, le=bound)} {cumulative}")
+            lines.append(f'{name}_bucket{_labels(key, le="+Inf")} {hist["count"]}')
+            lines.append(f"{name}_sum{_labels(key)} {hist['sum']}")
+            lines.append(f"{name}_count{_labels(key)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires "Authorization: Bearer <METRICS_TOKEN>"
+    (or a logged-in staff user).
+    """
+    token = settings.METRICS_TOKEN
+    header = request.headers.get("Authorization", "")
+    authorised = (token and constant_time_compare(header, f"Bearer {token}")) or (
+        request.user.is_authenticated and request.user.is_staff
+    )
+    if not authorised:
+        return HttpResponseForbidden("Forbidden")
+
+    return HttpResponse(
+        render_prometheus(collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
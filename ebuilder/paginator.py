@@ -0,0 +1,47 @@
+# ebuilder/paginator.py
+"""
+Paginator for admin changelists over large tables.
+
+An unfiltered changelist has to COUNT(*) the whole table just to number its
+pages; on PostgreSQL that is a full scan. EstimatedCountPaginator uses the
+planner's row estimate (pg_class.reltuples, kept fresh by autovacuum) for
+unfiltered querysets above ESTIMATE_THRESHOLD rows and exact counts for
+everything else - filtered/searched lists, small tables, and SQLite, where
+COUNT(*) is cheap enough.
+
+Pair it with show_full_result_count = False so filtered pages don't run a
+second unfiltered count.
+"""
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimated_count(queryset):
+    """Planner row estimate for an unfiltered queryset, or None."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql" or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:  # never analysed
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        estimate = None
+        if hasattr(self.object_list, "query"):
+            estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
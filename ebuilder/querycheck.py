@@ -0,0 +1,157 @@
+# ebuilder/querycheck.py
+"""
+N+1 / duplicate query detector.
+
+QueryInspectorMiddleware watches the SQL a request runs, groups it by a
+normalised fingerprint (literals and IN-lists stripped) and reports any
+fingerprint seen QUERY_INSPECTOR_THRESHOLD or more times, together with
+the project code that issued it. Reports go to the "ebuilder.queries"
+logger, written to data/logs/query-inspector.log.
+
+Runs on every request in DEBUG and on a QUERY_INSPECTOR_SAMPLE_RATE
+fraction of requests in production (0 switches it off).
+"""
+
+import logging
+import random
+import re
+import time
+import traceback
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .db import observe_queries
+
+logger = logging.getLogger("ebuilder.queries")
+
+_IN_LIST = re.compile(r"\bIN \((?:\s*(?:%s|\?|[-\d.]+|'[^']*')\s*,?)+\)", re.I)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Normalise SQL so the same query with different values matches."""
+    sql = _STRING.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    return _SPACE.sub(" ", sql).strip()
+
+
+def _project_stack(limit=8):
+    """The innermost frames from our own code (no Django/site-packages)."""
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base)
+        and "site-packages" not in frame.filename
+        and not frame.filename.endswith("querycheck.py")
+    ]
+    return traceback.format_list(frames[-limit:])
+
+
+class QueryRecorder:
+    """execute_wrapper collecting fingerprints, counts and a sample stack."""
+
+    def __init__(self):
+        self.total = 0
+        self.seconds = 0.0
+        self.groups = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total += 1
+            self.seconds += time.perf_counter() - start
+            key = fingerprint(sql)
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = {
+                    "count": 0,
+                    "statements": set(),
+                    "sql": sql,
+                    "stack": None,
+                }
+            group["count"] += 1
+            group["statements"].add((sql, repr(params)))
+            # The first repeat is the one worth a stack trace (cheap enough:
+            # at most once per fingerprint per request)
+            if group["count"] == 2:
+                group["stack"] = _project_stack()
+
+    def repeated(self, threshold):
+        return sorted(
+            (
+                (key, group)
+                for key, group in self.groups.items()
+                if group["count"] >= threshold
+            ),
+            key=lambda item: -item[1]["count"],
+        )
+
+
+class QueryInspectorMiddleware:
+    """Sync and async capable, so it doesn't force ASGI requests onto threads."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _sampled():
+        rate = settings.QUERY_INSPECTOR_SAMPLE_RATE
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with observe_queries(recorder):
+            response = self.get_response(request)
+        self._check(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        with observe_queries(recorder):
+            response = await self.get_response(request)
+        self._check(request, recorder)
+        return response
+
+    def _check(self, request, recorder):
+        problems = recorder.repeated(settings.QUERY_INSPECTOR_THRESHOLD)
+        if problems:
+            self._report(request, recorder, problems)
+
+    def _report(self, request, recorder, problems):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        lines = [
+            f"{request.method} {request.path} ({view}): {recorder.total} queries "
+            f"in {recorder.seconds * 1000:.1f}ms, {len(problems)} repeated"
+        ]
+        for key, group in problems:
+            duplicates = group["count"] - len(group["statements"])
+            kind = "N+1" if len(group["statements"]) > 1 else "duplicate"
+            lines.append(
+                f"  [{kind}] x{group['count']} ({duplicates} exact duplicates): {key}"
+            )
+            for frame in group["stack"] or []:
+                lines.extend("      " + line for line in frame.rstrip().splitlines())
+        logger.warning("\n".join(lines))
@@ -0,0 +1,124 @@
+# ebuilder/queryplans.py
+"""
+Query-plan checks for the storefront's hot querysets.
+
+_hot_queries() mirrors the filters the busiest views, checkout and the
+webhook run on every request. check_plans() EXPLAINs each one and reports
+those the database would answer with a full table scan, which usually
+means a view's filter drifted away from the indexes declared on the
+models. Run it with `manage.py explain_hot_queries` (the test suite does
+too).
+
+On PostgreSQL sequential scans are disabled for the EXPLAIN: tiny tables
+are always seq-scanned, so this asks "could an index serve it?" rather
+than "would one be picked at today's row counts?".
+"""
+
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Placeholder ids - a plan depends on the filters, not on the rows existing
+ANY_ID = 1
+
+
+def _hot_queries():
+    from blog.models import Post
+    from shop.catalog_index import LISTED_STATUSES, card_queryset
+    from shop.recommendations import recommended_ids
+    from shop.models import (
+        DownloadLog,
+        Entitlement,
+        Order,
+        Product,
+        ProductReview,
+        WishList,
+    )
+
+    now = timezone.now()
+    listed = Product.objects.filter(is_active=True, status__in=LISTED_STATUSES)
+    published = Post.objects.filter(status="published", publish_date__lte=now)
+    return {
+        # shop.catalog_index (listings, rebuilt when the catalog changes)
+        "catalog_index": card_queryset(),
+        # shop.views.catalog
+        "product_detail": listed.filter(slug="any-product"),
+        "related_products": recommended_ids(Product(id=ANY_ID)).order_by("rank"),
+        # shop.user_state (loaded once per user version)
+        "user_state_wishlisted": WishList.objects.filter(user_id=ANY_ID).values_list(
+            "product_id"
+        ),
+        "user_state_purchased": Entitlement.objects.filter(user_id=ANY_ID).values_list(
+            "product_id"
+        ),
+        "user_state_reviewed": ProductReview.objects.filter(user_id=ANY_ID).values_list(
+            "product_id"
+        ),
+        # shop.views.downloads
+        "purchases": Order.objects.filter(user_id=ANY_ID, status="completed").order_by(
+            "-created"
+        ),
+        "download_duplicate_check": DownloadLog.objects.filter(
+            order_item_id=ANY_ID, user_id=ANY_ID, downloaded_at__gte=now
+        )[:1],
+        # shop.views.checkout / shop.orders (webhook)
+        "order_by_payment_intent": Order.objects.filter(
+            payment_intent_id="pi_any", status__in=["pending", "failed"]
+        ),
+        "order_status": Order.objects.filter(
+            user_id=ANY_ID, payment_intent_id="pi_any"
+        )[:1],
+        # blog.views / pages.views
+        "blog_list": published.filter(is_featured=False)[:24],
+        "blog_featured": published.filter(is_featured=True).order_by("-publish_date")[
+            :4
+        ],
+        "blog_category": published.filter(category_id=ANY_ID).order_by("-publish_date")[
+            :36
+        ],
+        "blog_next_post": published.filter(publish_date__gt=now).order_by(
+            "publish_date"
+        )[:1],
+        "home_blog_posts": Post.objects.filter(status="published").order_by(
+            "-publish_date"
+        )[:3],
+    }
+
+
+# SQLite: "SCAN shop_product" (no index), PostgreSQL: "Seq Scan on shop_product"
+FULL_SCAN = {
+    "sqlite": re.compile(r"\bSCAN (\w+)$"),
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+}
+
+
+def explain(queryset):
+    """The database's plan for a queryset, one line per step."""
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain().splitlines()
+
+
+def check_plans(names=None):
+    """
+    EXPLAIN the hot queries (all, or just `names`). Returns
+    [(name, plan lines, tables scanned in full)].
+    """
+    pattern = FULL_SCAN.get(connection.vendor)
+    results = []
+    for name, queryset in _hot_queries().items():
+        if names and name not in names:
+            continue
+        plan = explain(queryset)
+        scans = []
+        if pattern:
+            scans = [m.group(1) for line in plan if (m := pattern.search(line.strip()))]
+        results.append((name, plan, scans))
+    return results
+
+
+def hot_query_names():
+    return list(_hot_queries())
@@ -1,6 +1,7 @@
 from pathlib import Path
 import environ
-from django.core.exceptions import DisallowedHost
+from django.core.exceptions import DisallowedHost, ImproperlyConfigured
+from ebuilder.db import sqlite_init_command
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -71,8 +72,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "ebuilder.metrics.MetricsMiddleware",
+    "ebuilder.querycheck.QueryInspectorMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise with an async branch: the stock middleware is sync-only and
+    # would run the whole chain (async views included) on threads under
+    # ASGI. Static files themselves are still read on a worker thread there.
+    "ebuilder.staticfiles.AsyncWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.redirects.middleware.RedirectFallbackMiddleware",
@@ -81,13 +87,15 @@ MIDDLEWARE = [
     "allauth.account.middleware.AccountMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "shop.middleware.CartCookieMiddleware",
 ]
 
 ROOT_URLCONF = "ebuilder.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates plus render timing for /metrics
+        "BACKEND": "ebuilder.metrics.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -96,6 +104,7 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
                 "shop.context_processors.cart",
+                "shop.context_processors.user_state",
                 "hosting.context_processors.current_site",
                 "pages.context_processors.ebuilder_settings",
                 "pages.context_processors.published_pages",
@@ -110,19 +119,76 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "ebuilder.wsgi.application"
-
-
-# Database - SQLite default for Docker. Use in production
-# DATABASES = {"default": env.db(default="sqlite:////app/db/db.sqlite3")}
-
-
-# Database - SQLite. Use in development
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "data" / "db" / "db.sqlite3",
+ASGI_APPLICATION = "ebuilder.asgi.application"
+
+# "wsgi" (gunicorn sync workers) or "asgi" (gunicorn + uvicorn workers).
+# In asgi mode checkout, payment success, the Stripe webhook and secure
+# downloads are served by async views. Must match how entrypoint.sh starts
+# the server.
+SERVER_MODE = env("SERVER_MODE", default="wsgi")
+
+
+# Database - SQLite at data/db/db.sqlite3 by default. Set DATABASE_URL to a
+# postgres:// URL to run on PostgreSQL instead. Older .env files carry a
+# sqlite:// DATABASE_URL that never moved the file; it is still ignored.
+SQLITE_PATH = BASE_DIR / "data" / "db" / "db.sqlite3"
+DATABASE_URL = env("DATABASE_URL", default="")
+
+if DATABASE_URL and not DATABASE_URL.startswith(
+    ("postgres://", "postgresql://", "pgsql://", "psql://", "sqlite:")
+):
+    raise ImproperlyConfigured(
+        f"Unsupported DATABASE_URL scheme {DATABASE_URL.split(':')[0]!r}:"
+        " use a postgresql:// URL, or leave it unset for SQLite"
+    )
+
+if DATABASE_URL.startswith(("postgres://", "postgresql://", "pgsql://", "psql://")):
+    DATABASES = {"default": env.db_url_config(DATABASE_URL)}
+
+    if env.bool("DB_POOL", default=True):
+        # Django's psycopg connection pool (one per worker process). Pooling
+        # replaces persistent connections, so CONN_MAX_AGE must stay 0.
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        # Merged: keep OPTIONS from the URL, e.g. ?sslmode=require
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+            "min_size": env.int("DB_POOL_MIN_SIZE", default=1),
+            "max_size": env.int("DB_POOL_MAX_SIZE", default=4),
+            "timeout": env.int("DB_POOL_TIMEOUT", default=10),
+            "max_idle": 300,
+        }
+    else:
+        # gunicorn sync workers serve one request at a time, so one
+        # long-lived connection per worker is enough.
+        DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=600)
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": SQLITE_PATH,
+        }
     }
-}
+
+    # SQLite production profile (on by default): WAL, relaxed fsync, busy
+    # waiting, mmap and an in-memory temp store, applied on every new
+    # connection. Writers take the lock up front (BEGIN IMMEDIATE) so they
+    # wait on busy_timeout instead of failing with "database is locked"
+    # mid-transaction.
+    if env.bool("SQLITE_TUNING", default=True):
+        DATABASES["default"].update(
+            {
+                "CONN_MAX_AGE": env.int("CONN_MAX_AGE", default=600),
+                "CONN_HEALTH_CHECKS": True,
+                "OPTIONS": {
+                    "timeout": 20,
+                    "transaction_mode": "IMMEDIATE",
+                    "init_command": sqlite_init_command(),
+                },
+            }
+        )
+
+# Retries for write transactions wrapped with ebuilder.db.retry_on_locked
+DATABASE_WRITE_RETRIES = env.int("DATABASE_WRITE_RETRIES", default=3)
 
 # Custom User Model
 AUTH_USER_MODEL = "accounts.User"
@@ -212,6 +278,48 @@ STRIPE_SECRET_KEY = env("STRIPE_SECRET_KEY", default="sk_test_placeholder")
 STRIPE_WEBHOOK_SECRET = env("STRIPE_WEBHOOK_SECRET", default="whsec_placeholder")
 
 CART_SESSION_ID = "cart"
+# Session key holding the checkout's active Stripe PaymentIntent
+CHECKOUT_INTENT_SESSION_ID = "checkout_intent"
+
+# Stripe client (shop/stripe_client.py): per-call timeout in seconds, retries
+# with backoff, and the circuit breaker that makes checkout fail fast while
+# Stripe is unreachable.
+STRIPE_API_BASE = env("STRIPE_API_BASE", default="https://api.stripe.com")
+STRIPE_TIMEOUT = env.float("STRIPE_TIMEOUT", default=10.0)
+STRIPE_MAX_RETRIES = env.int("STRIPE_MAX_RETRIES", default=2)
+STRIPE_BREAKER_THRESHOLD = env.int("STRIPE_BREAKER_THRESHOLD", default=5)
+STRIPE_BREAKER_RESET = env.float("STRIPE_BREAKER_RESET", default=30.0)
+# Seconds the success page waits on Stripe when the webhook hasn't landed yet
+STRIPE_CONFIRM_TIMEOUT = env.float("STRIPE_CONFIRM_TIMEOUT", default=3.0)
+
+# External product media URLs (shop/media_checks.py): per-request timeout,
+# and how long a successful check is trusted before it is probed again
+MEDIA_CHECK_TIMEOUT = env.float("MEDIA_CHECK_TIMEOUT", default=5.0)
+MEDIA_CHECK_MAX_AGE_DAYS = env.int("MEDIA_CHECK_MAX_AGE_DAYS", default=7)
+
+# Download logs older than this are rolled into daily DownloadLogSummary rows
+# by `manage.py compact_download_logs`
+DOWNLOAD_LOG_RETENTION_DAYS = env.int("DOWNLOAD_LOG_RETENTION_DAYS", default=90)
+
+# Version stamp shared by the workers' in-memory catalog indexes
+# (shop/catalog_index.py); must be on a volume every worker can see
+CATALOG_VERSION_FILE = env(
+    "CATALOG_VERSION_FILE", default=str(BASE_DIR / "data" / "catalog.version")
+)
+
+# Cart storage: "session" (default) or "cookie" (signed cookie, no session writes)
+CART_STORAGE = env("CART_STORAGE", default="session")
+CART_COOKIE_NAME = "cart"
+CART_COOKIE_MAX_AGE = 60 * 60 * 24 * 14  # 2 weeks
+CART_COOKIE_MAX_BYTES = 3072  # stay well under the 4KB browser cookie limit
+
+# Sessions: "db" (default) or "cached_db" (reads served from cache)
+SESSION_ENGINE = "django.contrib.sessions.backends." + env(
+    "SESSION_BACKEND", default="db"
+)
+# cached_db reads the "sessions" cache: the shared file without the
+# per-worker LRU, so every worker sees a session as soon as it is saved
+SESSION_CACHE_ALIAS = "sessions"
 ADMIN_EMAIL = env("ADMIN_EMAIL", default="admin@example.com")
 
 # Cookies
@@ -300,6 +408,67 @@ TINYMCE_DEFAULT_CONFIG = {
     "remove_script_host": True,
     "document_base_url": "/",
 }
+# ==================================================================
+# METRICS (ebuilder/metrics.py)
+# ==================================================================
+# Prometheus text at /metrics, for requests sending
+# "Authorization: Bearer <METRICS_TOKEN>" (or logged-in staff).
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=True)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+# Each worker writes its snapshot here at most every METRICS_FLUSH_INTERVAL s
+METRICS_DIR = env("METRICS_DIR", default=str(BASE_DIR / "data" / "metrics"))
+METRICS_FLUSH_INTERVAL = env.float("METRICS_FLUSH_INTERVAL", default=5.0)
+
+# ==================================================================
+# QUERY INSPECTOR (ebuilder/querycheck.py)
+# ==================================================================
+# Reports N+1 / duplicate queries to data/logs/query-inspector.log.
+# Every request in DEBUG, a sample in production (0 = off).
+QUERY_INSPECTOR_SAMPLE_RATE = env.float(
+    "QUERY_INSPECTOR_SAMPLE_RATE", default=1.0 if DEBUG else 0.01
+)
+# Report a query shape once it runs this many times in one request
+QUERY_INSPECTOR_THRESHOLD = env.int("QUERY_INSPECTOR_THRESHOLD", default=3)
+
+# ==================================================================
+# CACHE (ebuilder/tiered_cache.py)
+# ==================================================================
+# An in-process LRU per worker in front of a SQLite file all workers share;
+# must be on a volume every worker can see. Other workers' writes reach a
+# worker's LRU within CACHE_SYNC_INTERVAL seconds.
+# The file holds pickled, unencrypted cache values - session data (with
+# SESSION_BACKEND=cached_db) and the non-secret shop config among them;
+# secrets are kept out of it (shop/config_manager.py). It is created
+# readable by its owner only and must not be committed or shared.
+# CACHE_BACKEND=locmem gives each process its own cache instead (then
+# SESSION_BACKEND=cached_db is only safe with a single worker process).
+if env("CACHE_BACKEND", default="tiered") == "locmem":
+    CACHES = {
+        alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        for alias in ("default", "sessions")
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "ebuilder.tiered_cache.TieredCache",
+            "LOCATION": env(
+                "CACHE_FILE", default=str(BASE_DIR / "data" / "cache.sqlite3")
+            ),
+            "OPTIONS": {
+                "MAX_ENTRIES": env.int("CACHE_MAX_ENTRIES", default=20000),
+                "L1_MAX_ENTRIES": env.int("CACHE_L1_MAX_ENTRIES", default=1000),
+                "SYNC_INTERVAL": env.float("CACHE_SYNC_INTERVAL", default=0.5),
+            },
+        }
+    }
+    # Same file and limits, no L1 (see ebuilder/tiered_cache.py)
+    CACHES["sessions"] = {
+        **CACHES["default"],
+        "OPTIONS": {**CACHES["default"]["OPTIONS"], "L1_MAX_ENTRIES": 0},
+    }
+# Tests write the cache, catalog stamp, metrics and logs to a temp dir
+TEST_RUNNER = "ebuilder.test_runner.TestRunner"
+
 # ==================================================================
 # LOGGING CONFIGURATION
 # ==================================================================
@@ -350,6 +519,14 @@ LOGGING = {
             "backupCount": 3,
             "formatter": "simple",
         },
+        "file_queries": {
+            "level": "WARNING",
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": LOG_DIR / "query-inspector.log",
+            "maxBytes": 5 * 1024 * 1024,  # 5 MB
+            "backupCount": 3,
+            "formatter": "simple",
+        },
         "mail_admins": {
             "level": "ERROR",
             "class": "django.utils.log.AdminEmailHandler",
@@ -368,6 +545,11 @@ LOGGING = {
             "level": "ERROR",
             "propagate": False,
         },
+        "ebuilder.queries": {
+            "handlers": ["file_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
     },
 }
 
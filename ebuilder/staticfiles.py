@@ -0,0 +1,66 @@
+# ebuilder/staticfiles.py
+"""
+WhiteNoise without forcing ASGI requests onto threads.
+
+WhiteNoiseMiddleware is sync-only, and one sync-only middleware makes
+Django adapt the whole ASGI chain to sync - every async view would run
+through async_to_sync. AsyncWhiteNoiseMiddleware keeps WhiteNoise's
+behaviour under WSGI; under ASGI it looks files up in memory and streams
+them in chunks read on a worker thread, so only static requests touch
+threads. Behind a proxy that serves /static/ itself none of this runs.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def _read_chunks(file):
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(CHUNK_SIZE):
+            yield chunk
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG only: looks on disk
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+
+        response = await sync_to_async(
+            static_file.get_response, thread_sensitive=False
+        )(request.method, request.META)
+        if response.file is None:
+            http_response = HttpResponse(status=int(response.status))
+        else:
+            http_response = StreamingHttpResponse(
+                _read_chunks(response.file), status=int(response.status)
+            )
+        del http_response["content-type"]
+        for key, value in response.headers:
+            http_response[key] = value
+        return http_response
@@ -0,0 +1,191 @@
+# ebuilder/swr.py
+"""
+Stale-while-revalidate caching with request coalescing.
+
+When a plain cache entry expires, every request that arrives before it is
+recomputed recomputes it too - a launch spike can tie up every worker on
+the same homepage. Entries here have two lifetimes instead:
+
+- fresh_for: served as-is
+- stale_for (after that): still served, while exactly one caller - the
+  one that wins a cache.add() lock - recomputes it
+
+Only a cold miss makes callers wait, and then just for the one caller
+computing it (up to MAX_WAIT). If a refresh fails (database down), the
+stale value keeps being served and the lock is left to expire, so the
+failing backend is retried at most once per lock_timeout. If the cache
+itself fails, values are computed directly.
+
+- get_or_compute(key, compute, fresh_for, ...): the helper
+- @stale_while_revalidate(fresh_for, ...): memoise a function by its args
+- @cache_page_swr(fresh_for, ...): cache a public view's 200 responses
+  (only for requests without cookies - nothing per-visitor is shared)
+- invalidate(namespace): drop every entry in a namespace, e.g. "content"
+  when an editor saves a block
+
+Locks are as shared as the cache backend: across workers with the default
+tiered cache (ebuilder/tiered_cache.py), per process with LocMem.
+"""
+
+import functools
+import logging
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30
+MAX_WAIT = 5.0
+WAIT_INTERVAL = 0.05
+
+
+def _cache_call(method, *args, default=None):
+    """Run a cache operation, treating backend errors as a miss."""
+    try:
+        return method(*args)
+    except Exception as e:
+        logger.warning(f"Cache error on {args[0]}: {e}")
+        return default
+
+
+def _generation_key(namespace):
+    return f"swr:generation:{namespace}"
+
+
+def invalidate(namespace):
+    """Start a new generation: the namespace's entries are never read again."""
+    _cache_call(cache.set, _generation_key(namespace), time.time_ns(), None)
+
+
+def _store(key, value, fresh_for, stale_for):
+    _cache_call(cache.set, key, (value, time.time() + fresh_for), fresh_for + stale_for)
+
+
+def _refresh(key, lock_key, compute, fresh_for, stale_for, cacheable, stale=None):
+    """Compute and store a value while holding the key's lock."""
+    try:
+        value = compute()
+    except Exception:
+        if stale is None:
+            _cache_call(cache.delete, lock_key)
+            raise
+        # Keep the lock until it expires: retry at most once per lock_timeout
+        logger.exception(f"Refreshing {key} failed, serving the stale value")
+        return stale
+    if cacheable(value):
+        _store(key, value, fresh_for, stale_for)
+    _cache_call(cache.delete, lock_key)
+    return value
+
+
+def get_or_compute(
+    key,
+    compute,
+    fresh_for,
+    stale_for=None,
+    namespace=None,
+    lock_timeout=LOCK_TIMEOUT,
+    cacheable=lambda value: True,
+):
+    """
+    The cached value for `key`, recomputed by one caller at a time.
+    stale_for defaults to ten times fresh_for.
+    """
+    if stale_for is None:
+        stale_for = fresh_for * 10
+    if namespace:
+        generation = _cache_call(cache.get, _generation_key(namespace), 0, default=0)
+        key = f"swr:{namespace}:{generation}:{key}"
+    else:
+        key = f"swr:{key}"
+    lock_key = f"{key}:lock"
+    refresh = functools.partial(
+        _refresh, key, lock_key, compute, fresh_for, stale_for, cacheable
+    )
+
+    entry = _cache_call(cache.get, key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until:
+            return value
+        # Stale: one caller refreshes, everyone else gets the old value
+        if _cache_call(cache.add, lock_key, 1, lock_timeout, default=True):
+            return refresh(stale=value)
+        return value
+
+    # Cold miss: one caller computes, the rest wait for its result
+    if _cache_call(cache.add, lock_key, 1, lock_timeout, default=True):
+        return refresh()
+    deadline = time.monotonic() + min(lock_timeout, MAX_WAIT)
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = _cache_call(cache.get, key)
+        if entry is not None:
+            return entry[0]
+    logger.warning(f"Gave up waiting for {key}, computing it here")
+    return compute()
+
+
+def stale_while_revalidate(fresh_for, stale_for=None, namespace=None):
+    """
+    Memoise a function of hashable, str()-able arguments.
+    Usage: @stale_while_revalidate(300, namespace="content")
+    """
+
+    def decorator(func):
+        prefix = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = ":".join([prefix, *map(str, args)])
+            return get_or_compute(
+                key,
+                lambda: func(*args),
+                fresh_for,
+                stale_for=stale_for,
+                namespace=namespace,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def _is_ok(response):
+    return response.status_code == 200 and not response.cookies
+
+
+def cache_page_swr(fresh_for, stale_for=None, namespace=None):
+    """
+    Cache a public view's successful responses by URL.
+    Usage: path("sitemap.xml", cache_page_swr(900)(sitemap), ...)
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or request.COOKIES:
+                return view(request, *args, **kwargs)
+
+            def render():
+                response = view(request, *args, **kwargs)
+                if hasattr(response, "render") and callable(response.render):
+                    response = response.render()
+                return response
+
+            key = (
+                f"page:{request.scheme}:{request.get_host()}:{request.get_full_path()}"
+            )
+            return get_or_compute(
+                key,
+                render,
+                fresh_for,
+                stale_for=stale_for,
+                namespace=namespace,
+                cacheable=_is_ok,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,49 @@
+# ebuilder/test_runner.py
+import logging.config
+import tempfile
+from copy import deepcopy
+from pathlib import Path
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Points everything the app writes under data/ - the cache file, the
+    catalog version stamp, metrics snapshots and log files - at a temporary
+    directory for the run, like the test database, so tests neither read
+    nor change the development copies.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._data_dir = tempfile.TemporaryDirectory()
+        data = Path(self._data_dir.name)
+
+        caches = {}
+        for alias, config in settings.CACHES.items():
+            config = dict(config)
+            if config["BACKEND"] == "ebuilder.tiered_cache.TieredCache":
+                config["LOCATION"] = str(data / f"{alias}.sqlite3")
+            caches[alias] = config
+        self._override = override_settings(
+            CACHES=caches,
+            CATALOG_VERSION_FILE=str(data / "catalog.version"),
+            METRICS_DIR=str(data / "metrics"),
+        )
+        self._override.enable()
+
+        config = deepcopy(settings.LOGGING)
+        for handler in config.get("handlers", {}).values():
+            if "filename" in handler:
+                handler["filename"] = data / Path(handler["filename"]).name
+        logging.config.dictConfig(config)
+
+    def teardown_test_environment(self, **kwargs):
+        # Close the temporary log files before removing them
+        logging.config.dictConfig({"version": 1, "disable_existing_loggers": False})
+        self._override.disable()
+        self._data_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
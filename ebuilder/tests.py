@@ -0,0 +1,479 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import AsyncToSync, SyncToAsync, iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+
+from . import metrics, swr
+from .db import retry_on_locked
+from .loadgen import LoadDataGenerator
+from .querycheck import QueryInspectorMiddleware, fingerprint
+from .queryplans import check_plans
+from .staticfiles import AsyncWhiteNoiseMiddleware
+from .tiered_cache import TieredCache
+from content.cache import container_blocks
+from content.models import ContentContainer, SectionBlock
+from shop.models import Product
+
+
+class RetryOnLockedTests(TestCase):
+    def test_retries_locked_errors_then_succeeds(self):
+        calls = []
+
+        @retry_on_locked(retries=3, base_delay=0)
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "done"
+
+        # TestCase wraps each test in a transaction; pretend we're outside it.
+        with mock.patch("ebuilder.db.connections") as conns:
+            conns.__getitem__.return_value.in_atomic_block = False
+            self.assertEqual(write(), "done")
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        @retry_on_locked(retries=3, base_delay=0)
+        def write():
+            calls.append(1)
+            raise OperationalError("no such table: foo")
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+    def test_no_retry_inside_outer_transaction(self):
+        calls = []
+
+        @retry_on_locked(retries=3, base_delay=0)
+        def write():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with transaction.atomic():
+            with self.assertRaises(OperationalError):
+                write()
+        self.assertEqual(len(calls), 1)
+
+
+class LoadDataGeneratorTests(TestCase):
+    COUNTS = dict(
+        categories=3,
+        products=20,
+        users=15,
+        orders=60,
+        reviews=10,
+        wishlists=20,
+        posts=5,
+        pages=4,
+    )
+
+    def test_generates_deterministic_data_and_clears_it(self):
+        from shop.models import Order, OrderItem, Product
+
+        written = LoadDataGenerator(seed=7).generate(**self.COUNTS)
+        self.assertEqual(written["orders"], 60)
+        self.assertEqual(Order.objects.count(), 60)
+        self.assertEqual(OrderItem.objects.count(), written["order_items"])
+        first = list(OrderItem.objects.values_list("product__slug", flat=True))
+
+        LoadDataGenerator.clear()
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(LoadDataGenerator.exists())
+
+        LoadDataGenerator(seed=7).generate(**self.COUNTS)
+        again = list(OrderItem.objects.values_list("product__slug", flat=True))
+        self.assertEqual(first, again)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.metrics_dir = Path(tmp.name)
+        override = override_settings(
+            METRICS_DIR=tmp.name, METRICS_TOKEN="s3cret", METRICS_ENABLED=True
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.registry.reset()
+
+    def scrape(self):
+        return self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+
+    def test_records_latency_and_queries_per_url_name(self):
+        self.client.get("/health/")
+
+        body = self.scrape().content.decode()
+
+        self.assertIn(
+            'ebuilder_http_request_duration_seconds_count{method="GET",view="health"} 1',
+            body,
+        )
+        self.assertIn(
+            'ebuilder_http_responses_total{status="200",view="health"} 1', body
+        )
+        self.assertIn('ebuilder_db_queries_total{view="health"}', body)
+
+    def test_merges_snapshots_from_other_workers(self):
+        with metrics.timed("stripe", "PaymentIntentService.create"):
+            pass
+        other = metrics.Registry()
+        other.observe(
+            "ebuilder_external_call_seconds",
+            {"service": "stripe", "operation": "PaymentIntentService.create"},
+            0.2,
+        )
+        (self.metrics_dir / "99999.json").write_text(json.dumps(other.snapshot()))
+
+        body = self.scrape().content.decode()
+
+        self.assertIn(
+            'ebuilder_external_call_seconds_count{operation="PaymentIntentService.create",service="stripe"} 2',
+            body,
+        )
+
+    async def test_async_requests_stay_async(self):
+        async def view(request):
+            await sync_to_async(get_user_model().objects.exists)()
+            return HttpResponse()
+
+        middleware = metrics.MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(RequestFactory().get("/"))
+
+        counters = metrics.registry.snapshot()["counters"]
+        self.assertEqual(
+            counters["ebuilder_db_queries_total"], {'[["view", "<unresolved>"]]': 1}
+        )
+
+
+class QueryInspectorTests(TestCase):
+    def test_fingerprint_strips_values_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) LIMIT 5"),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE name = 'a' AND n = 1"),
+            "SELECT * FROM t WHERE name = ? AND n = ?",
+        )
+
+    def run_view(self, view):
+        request = RequestFactory().get("/some/page/")
+        return QueryInspectorMiddleware(view)(request)
+
+    @override_settings(QUERY_INSPECTOR_SAMPLE_RATE=1.0, QUERY_INSPECTOR_THRESHOLD=3)
+    def test_reports_repeated_queries_with_stack(self):
+        User = get_user_model()
+
+        def n_plus_one(request):
+            for pk in range(4):
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        with self.assertLogs("ebuilder.queries", "WARNING") as logs:
+            self.run_view(n_plus_one)
+
+        report = logs.output[0]
+        self.assertIn("GET /some/page/", report)
+        self.assertIn("[N+1] x4", report)
+        self.assertIn("n_plus_one", report)
+
+    @override_settings(QUERY_INSPECTOR_SAMPLE_RATE=0)
+    def test_disabled_when_sample_rate_is_zero(self):
+        def view(request):
+            for _ in range(5):
+                get_user_model().objects.exists()
+            return HttpResponse()
+
+        with self.assertNoLogs("ebuilder.queries"):
+            self.run_view(view)
+
+    @override_settings(QUERY_INSPECTOR_SAMPLE_RATE=1.0, QUERY_INSPECTOR_THRESHOLD=3)
+    async def test_reports_queries_from_async_views(self):
+        User = get_user_model()
+
+        def n_plus_one():
+            for pk in range(4):
+                User.objects.filter(pk=pk).exists()
+
+        async def view(request):
+            await sync_to_async(n_plus_one)()
+            return HttpResponse()
+
+        middleware = QueryInspectorMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertLogs("ebuilder.queries", "WARNING") as logs:
+            await middleware(RequestFactory().get("/some/page/"))
+        self.assertIn("[N+1] x4", logs.output[0])
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        scans = {name: scans for name, _plan, scans in check_plans() if scans}
+        self.assertEqual(scans, {})
+
+    def test_full_scan_is_reported(self):
+        unindexed = {"by_description": Product.objects.filter(description="x")}
+        with mock.patch("ebuilder.queryplans._hot_queries", return_value=unindexed):
+            [(name, _plan, scans)] = check_plans()
+        self.assertEqual((name, scans), ("by_description", ["shop_product"]))
+
+
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_serves_stale_while_one_caller_refreshes(self):
+        # fresh_for=0: stale as soon as it's stored
+        self.assertEqual(swr.get_or_compute("k", lambda: "v1", 0, 60), "v1")
+
+        # Another worker holds the refresh lock - serve stale, don't compute
+        cache.add("swr:k:lock", 1)
+        compute = mock.Mock(return_value="v2")
+        self.assertEqual(swr.get_or_compute("k", compute, 0, 60), "v1")
+        compute.assert_not_called()
+
+        cache.delete("swr:k:lock")
+        self.assertEqual(swr.get_or_compute("k", compute, 0, 60), "v2")
+        self.assertIsNone(cache.get("swr:k:lock"))
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(swr.get_or_compute("k", compute, 60))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["value"] * 5)
+
+    def test_failed_refresh_serves_stale_and_backs_off(self):
+        swr.get_or_compute("k", lambda: "v1", 0, 60)
+        failing = mock.Mock(side_effect=OperationalError("database is locked"))
+
+        with self.assertLogs("ebuilder.swr", "ERROR"):
+            self.assertEqual(swr.get_or_compute("k", failing, 0, 60), "v1")
+        # The lock is kept until it expires, so the next caller doesn't retry
+        self.assertEqual(swr.get_or_compute("k", failing, 0, 60), "v1")
+        self.assertEqual(failing.call_count, 1)
+
+    def test_cache_errors_fall_back_to_computing(self):
+        with mock.patch.object(cache, "get", side_effect=ConnectionError("down")):
+            with mock.patch.object(cache, "add", side_effect=ConnectionError("down")):
+                with self.assertLogs("ebuilder.swr", "WARNING"):
+                    value = swr.get_or_compute("k", lambda: "value", 60)
+        self.assertEqual(value, "value")
+
+    def test_invalidate_drops_namespace(self):
+        swr.get_or_compute("k", lambda: "v1", 60, namespace="content")
+        swr.get_or_compute("other", lambda: "v1", 60)
+
+        swr.invalidate("content")
+
+        self.assertEqual(
+            swr.get_or_compute("k", lambda: "v2", 60, namespace="content"), "v2"
+        )
+        self.assertEqual(swr.get_or_compute("other", lambda: "v2", 60), "v1")
+
+    def test_page_cache_stores_only_ok_responses(self):
+        statuses = iter([500, 200, 200])
+        view = mock.Mock(
+            side_effect=lambda request: HttpResponse(status=next(statuses))
+        )
+        cached_view = swr.cache_page_swr(60)(view)
+        factory = RequestFactory()
+
+        self.assertEqual(cached_view(factory.get("/sitemap.xml")).status_code, 500)
+        self.assertEqual(cached_view(factory.get("/sitemap.xml")).status_code, 200)
+        self.assertEqual(cached_view(factory.get("/sitemap.xml")).status_code, 200)
+        self.assertEqual(view.call_count, 2)
+
+        # Requests with cookies may see per-visitor content - never cached
+        request = factory.get("/sitemap.xml")
+        request.COOKIES["sessionid"] = "abc"
+        cached_view(request)
+        self.assertEqual(view.call_count, 3)
+
+    def test_content_blocks_invalidated_on_save(self):
+        container = ContentContainer.objects.create(name="Home")
+        block = SectionBlock.objects.create(
+            container=container, section_type="text", title="Old"
+        )
+        self.assertEqual(container_blocks(container.id, "sections")[0].title, "Old")
+
+        with self.assertNumQueries(0):
+            container_blocks(container.id, "sections")
+
+        block.title = "New"
+        block.save()
+        self.assertEqual(container_blocks(container.id, "sections")[0].title, "New")
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.location = str(Path(tmp.name) / "cache.sqlite3")
+
+    def worker(self, **options):
+        """A backend with its own L1, like another gunicorn worker."""
+        with mock.patch.dict("ebuilder.tiered_cache._tiers", clear=True):
+            return TieredCache(
+                self.location, {"OPTIONS": {"SYNC_INTERVAL": 0, **options}}
+            )
+
+    def test_serves_repeat_reads_from_l1(self):
+        cache = self.worker()
+        cache.set("k", {"a": 1})
+
+        other = self.worker()
+        self.assertEqual(other.get("k"), {"a": 1})
+        self.assertEqual(other.get("k"), {"a": 1})
+        self.assertEqual(other.get("missing"), None)
+
+        stats = other.stats()
+        self.assertEqual((stats["l1_hit"], stats["l2_hit"], stats["miss"]), (1, 1, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+    def test_other_workers_see_writes_and_deletes(self):
+        a, b = self.worker(), self.worker()
+        a.set("k", 1)
+        self.assertEqual(b.get("k"), 1)
+
+        a.set("k", 2)
+        self.assertEqual(b.get("k"), 2)
+        a.delete("k")
+        self.assertIsNone(b.get("k"))
+
+        a.set_many({"x": 1, "y": 2})
+        self.assertEqual(b.get_many(["x", "y", "z"]), {"x": 1, "y": 2})
+        a.clear()
+        self.assertEqual(b.get_many(["x", "y"]), {})
+
+    def test_l1_lags_by_at_most_the_sync_interval(self):
+        a, b = self.worker(), self.worker(SYNC_INTERVAL=60)
+        a.set("k", 1)
+        b.get("k")
+        a.set("k", 2)
+        self.assertEqual(b.get("k"), 1)
+
+        b._l1.last_sync = 0
+        self.assertEqual(b.get("k"), 2)
+
+    def test_per_key_timeouts(self):
+        cache = self.worker()
+        cache.set("short", 1, timeout=10)
+        cache.set("forever", 1, timeout=None)
+        with mock.patch("time.time", return_value=time.time() + 60):
+            self.assertIsNone(cache.get("short"))
+            self.assertEqual(cache.get("forever"), 1)
+
+    def test_add_and_incr_are_atomic_across_workers(self):
+        a, b = self.worker(), self.worker()
+        self.assertTrue(a.add("lock", 1, 30))
+        self.assertFalse(b.add("lock", 1, 30))
+
+        a.set("n", 1)
+        b.incr("n")
+        self.assertEqual(a.incr("n", 5), 7)
+
+    def test_cache_file_is_private(self):
+        self.worker().set("k", 1)
+        self.assertEqual(os.stat(self.location).st_mode & 0o777, 0o600)
+
+    def test_l1_is_bounded(self):
+        cache = self.worker(L1_MAX_ENTRIES=2)
+        cache.set_many({"a": 1, "b": 2, "c": 3})
+
+        self.assertEqual(list(cache._l1.entries), [":1:b", ":1:c"])
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["l2_hit"], 1)
+
+    def test_l2_only_worker_sees_writes_at_once(self):
+        a, b = self.worker(), self.worker(SYNC_INTERVAL=60, L1_MAX_ENTRIES=0)
+        a.set("session", 1)
+        self.assertEqual(b.get("session"), 1)
+        a.set("session", 2)
+        self.assertEqual(b.get("session"), 2)
+        self.assertEqual(b._l1.entries, {})
+
+    def test_sessions_alias_has_its_own_l1(self):
+        with mock.patch.dict("ebuilder.tiered_cache._tiers", clear=True):
+            default = TieredCache(self.location, {})
+            sessions = TieredCache(self.location, {"OPTIONS": {"L1_MAX_ENTRIES": 0}})
+        self.assertIsNot(default._l1, sessions._l1)
+
+
+class AsgiMiddlewareTests(TestCase):
+    def test_asgi_chain_has_no_sync_adapters(self):
+        handler = ASGIHandler()
+        layer = handler._middleware_chain
+        chain = []
+        while layer is not None:
+            chain.append(layer)
+            if isinstance(layer, (SyncToAsync, AsyncToSync)):
+                break
+            layer = getattr(layer, "__wrapped__", None) or getattr(
+                layer, "get_response", None
+            )
+
+        adapters = [
+            repr(layer)
+            for layer in chain
+            if isinstance(layer, (SyncToAsync, AsyncToSync))
+        ]
+        self.assertEqual(adapters, [])
+        self.assertGreater(len(chain), 10)
+
+    async def test_static_files_served_without_sync_chain(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        Path(tmp.name, "app.css").write_text("body { color: red }")
+
+        async def app(request):
+            return HttpResponse("app")
+
+        middleware = AsyncWhiteNoiseMiddleware(app)
+        middleware.add_files(tmp.name, prefix="static/")
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        response = await middleware(AsyncRequestFactory().get("/static/app.css"))
+        body = b"".join([chunk async for chunk in response])
+        self.assertEqual(body, b"body { color: red }")
+        self.assertTrue(response["Content-Type"].startswith("text/css"))
+
+        response = await middleware(AsyncRequestFactory().get("/shop/"))
+        self.assertEqual(response.content, b"app")
@@ -0,0 +1,60 @@
+# ebuilder/thumbnails.py
+"""
+Small cached renditions of uploaded images, for admin lists.
+
+thumbnail_url(image_field, size) returns the URL of a copy no larger than
+size x size pixels, stored beside the original as <dir>/thumbs/<size>/<file>
+in the same storage. It is made once with Pillow on first use and reused
+afterwards (uploads never overwrite, so a replaced image gets a new
+rendition). If the rendition can't be made the original URL is returned.
+"""
+
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+
+def rendition_name(name, size):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, "thumbs", str(size), filename)
+
+
+def thumbnail_url(image_field, size=100):
+    if not image_field:
+        return None
+    storage = image_field.storage
+    name = rendition_name(image_field.name, size)
+    try:
+        if not storage.exists(name):
+            _render(image_field, name, size)
+        return storage.url(name)
+    except (OSError, ValueError, UnidentifiedImageError) as e:
+        logger.warning(f"Could not make thumbnail for {image_field.name}: {e}")
+        try:
+            return image_field.url
+        except ValueError:
+            return None
+
+
+def _render(image_field, name, size):
+    extension = posixpath.splitext(name)[1].lower()
+    image_format = FORMATS.get(extension)
+    if image_format is None:
+        raise ValueError(f"unsupported image type {extension!r}")
+
+    with image_field.storage.open(image_field.name, "rb") as f:
+        image = Image.open(f)
+        image.thumbnail((size, size))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, format=image_format, quality=85, optimize=True)
+
+    image_field.storage.save(name, ContentFile(buffer.getvalue()))
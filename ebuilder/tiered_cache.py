@@ -0,0 +1,416 @@
+# ebuilder/tiered_cache.py
+"""
+Two-tier cache backend: an in-process LRU (L1) in front of a SQLite file
+every worker shares (L2). No cache server needed.
+
+    CACHES = {"default": {
+        "BACKEND": "ebuilder.tiered_cache.TieredCache",
+        "LOCATION": "data/cache.sqlite3",
+        "OPTIONS": {"MAX_ENTRIES": 20000, "L1_MAX_ENTRIES": 1000,
+                    "SYNC_INTERVAL": 0.5},
+    }}
+
+- get() answers from L1 when it can, else reads L2 and keeps a copy
+- set()/delete()/... write L2 and this process's L1
+- add() and incr() are atomic in L2, so cache.add() locks (ebuilder/swr.py)
+  work across workers
+- every key keeps its own timeout in both tiers
+
+Coherence: each L2 write appends the key to a change log; its sequence
+number is the version stamp. Every SYNC_INTERVAL seconds a worker reads the
+log since the last stamp it saw and drops those keys from its L1, so
+another worker's write or delete is seen within SYNC_INTERVAL. If a worker
+falls behind the trimmed log (or after clear()), its L1 is emptied.
+
+L1_MAX_ENTRIES=0 turns L1 off: every read goes to L2, so writes are seen by
+all workers at once. Sessions need that (settings.SESSION_CACHE_ALIAS) -
+two requests from one visitor on different workers must not read a stale
+session and overwrite each other's changes.
+
+Values are pickled in both tiers, so callers never share objects. L1 is
+shared by the threads of a process; MAX_ENTRIES bounds L2, culled like
+Django's database cache. L1/L2 hits and misses are counted in
+ebuilder_cache_lookups_total on /metrics, and stats() gives this
+process's hit rate.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+L1_MAX_ENTRIES = 1000
+SYNC_INTERVAL = 0.5
+# Writes between L2 culls, and how much of the change log is kept
+CULL_EVERY = 100
+CHANGE_LOG_SIZE = 10000
+# Logged in place of a key when every key changed (clear())
+ALL_KEYS = ""
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache"
+    " (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)",
+    "CREATE TABLE IF NOT EXISTS changes"
+    " (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL)",
+)
+LAST_SEQ = "(SELECT coalesce(max(seq), 0) FROM changes)"
+
+
+class _L1:
+    """One process's LRU for one LOCATION, shared by its threads."""
+
+    def __init__(self, max_entries):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (pickled, expires, seq)
+        self.max_entries = max_entries
+        self.seen = None  # last change-log seq applied
+        self.last_sync = 0.0
+        self.stats = {"l1_hit": 0, "l2_hit": 0, "miss": 0}
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, pickled, expires, seq):
+        if not self.max_entries:
+            return
+        with self.lock:
+            current = self.entries.get(key)
+            # Don't replace a newer copy with one read before it was written
+            if current is not None and current[2] > seq:
+                return
+            self.entries[key] = (pickled, expires, seq)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def apply(self, changes):
+        """Drop L1 copies older than the logged changes."""
+        with self.lock:
+            for seq, key in changes:
+                if key == ALL_KEYS:
+                    self.entries.clear()
+                    continue
+                entry = self.entries.get(key)
+                if entry is not None and entry[2] < seq:
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, result, n=1):
+        with self.lock:
+            self.stats[result] += n
+        if metrics.enabled():
+            metrics.registry.inc("ebuilder_cache_lookups_total", {"result": result}, n)
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = Path(location)
+        self._sync_interval = float(options.get("SYNC_INTERVAL", SYNC_INTERVAL))
+        l1_max_entries = int(options.get("L1_MAX_ENTRIES", L1_MAX_ENTRIES))
+        # Django creates a backend per thread; the L1 is per process (and
+        # per size, so an L2-only alias never shares another alias's L1)
+        with _tiers_lock:
+            self._l1 = _tiers.setdefault(
+                (str(self._path), l1_max_entries), _L1(l1_max_entries)
+            )
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        # Reconnect after a fork: SQLite connections can't cross processes
+        if self._conn is None or self._pid != os.getpid():
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            # Values are pickled in the clear: owner-only (the WAL files
+            # SQLite creates next to it copy this mode)
+            self._path.touch(mode=0o600, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _write(self, func):
+        """Run func(db) in a write transaction; returns its result."""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    @staticmethod
+    def _log(db, key):
+        return db.execute("INSERT INTO changes (key) VALUES (?)", (key,)).lastrowid
+
+    def _upsert(self, db, key, pickled, expires):
+        db.execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?)"
+            " ON CONFLICT (key) DO UPDATE"
+            " SET value = excluded.value, expires = excluded.expires",
+            (key, pickled, expires),
+        )
+        return self._log(db, key)
+
+    def _maybe_cull(self, db):
+        seq = db.execute(f"SELECT {LAST_SEQ}").fetchone()[0]
+        if seq % CULL_EVERY:
+            return
+        db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        db.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_LOG_SIZE,))
+        count = db.execute("SELECT count(*) FROM cache").fetchone()[0]
+        if count > self._max_entries:
+            # Soonest to expire go first, keys without a timeout last
+            db.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache"
+                " ORDER BY expires IS NULL, expires LIMIT ?)",
+                (count // self._cull_frequency if self._cull_frequency else count,),
+            )
+
+    def _sync(self, now):
+        """Apply other workers' writes to L1, at most every SYNC_INTERVAL."""
+        l1 = self._l1
+        if not l1.max_entries:
+            return
+        if now - l1.last_sync < self._sync_interval and l1.seen is not None:
+            return
+        l1.last_sync = now
+        db = self._db()
+        if l1.seen is None:
+            l1.seen = db.execute(f"SELECT {LAST_SEQ}").fetchone()[0]
+            return
+        oldest = db.execute("SELECT min(seq) FROM changes").fetchone()[0]
+        changes = db.execute(
+            "SELECT seq, key FROM changes WHERE seq > ? ORDER BY seq", (l1.seen,)
+        ).fetchall()
+        if oldest is not None and oldest > l1.seen + 1:
+            # Missed trimmed changes - nothing in L1 can be trusted
+            l1.clear()
+        l1.apply(changes)
+        if changes:
+            l1.seen = changes[-1][0]
+
+    @staticmethod
+    def _expired(expires, now):
+        return expires is not None and expires <= now
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        self._sync(now)
+        pickled = self._l1.get(key, now)
+        if pickled is not None:
+            self._l1.count("l1_hit")
+            return pickle.loads(pickled)
+        row = (
+            self._db()
+            .execute(
+                f"SELECT value, expires, {LAST_SEQ} FROM cache WHERE key = ?", (key,)
+            )
+            .fetchone()
+        )
+        if row is None or self._expired(row[1], now):
+            self._l1.count("miss")
+            return default
+        self._l1.count("l2_hit")
+        self._l1.put(key, row[0], row[1], row[2])
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        """L1 first, then one L2 query for the rest."""
+        now = time.time()
+        self._sync(now)
+        found = {}
+        missing = {}
+        for key in keys:
+            cache_key = self.make_and_validate_key(key, version=version)
+            pickled = self._l1.get(cache_key, now)
+            if pickled is None:
+                missing[cache_key] = key
+            else:
+                found[key] = pickle.loads(pickled)
+        if found:
+            self._l1.count("l1_hit", len(found))
+        if not missing:
+            return found
+        placeholders = ", ".join("?" * len(missing))
+        rows = (
+            self._db()
+            .execute(
+                f"SELECT key, value, expires, {LAST_SEQ} FROM cache"
+                f" WHERE key IN ({placeholders})",
+                list(missing),
+            )
+            .fetchall()
+        )
+        hits = 0
+        for cache_key, pickled, expires, seq in rows:
+            if self._expired(expires, now):
+                continue
+            self._l1.put(cache_key, pickled, expires, seq)
+            found[missing[cache_key]] = pickle.loads(pickled)
+            hits += 1
+        if hits:
+            self._l1.count("l2_hit", hits)
+        if len(missing) > hits:
+            self._l1.count("miss", len(missing) - hits)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (
+                self.make_and_validate_key(key, version=version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            )
+            for key, value in data.items()
+        ]
+        if self._expired(expires, time.time()):
+            self.delete_many(data, version=version)
+            return []
+
+        def write(db):
+            seqs = [self._upsert(db, key, pickled, expires) for key, pickled in rows]
+            self._maybe_cull(db)
+            return seqs
+
+        for (key, pickled), seq in zip(rows, self._write(write)):
+            self._l1.put(key, pickled, expires, seq)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Atomic across workers: only one add() of a missing key succeeds."""
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+
+        def write(db):
+            row = db.execute(
+                "SELECT expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._expired(row[0], now):
+                return None
+            seq = self._upsert(db, key, pickled, expires)
+            self._maybe_cull(db)
+            return seq
+
+        seq = self._write(write)
+        if seq is None:
+            return False
+        self._l1.put(key, pickled, expires, seq)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        """Atomic across workers."""
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+
+        def write(db):
+            row = db.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            pickled = pickle.dumps(pickle.loads(row[0]) + delta)
+            db.execute("UPDATE cache SET value = ? WHERE key = ?", (pickled, key))
+            return pickled, row[1], self._log(db, key)
+
+        pickled, expires, seq = self._write(write)
+        self._l1.put(key, pickled, expires, seq)
+        return pickle.loads(pickled)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+
+        def write(db):
+            updated = db.execute(
+                "UPDATE cache SET expires = ?"
+                " WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (expires, key, now),
+            ).rowcount
+            if updated:
+                self._log(db, key)
+            return bool(updated)
+
+        self._l1.discard([key])
+        return self._write(write)
+
+    def delete(self, key, version=None):
+        return self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+
+        def write(db):
+            deleted = 0
+            for key in keys:
+                count = db.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+                if count:
+                    self._log(db, key)
+                    deleted += count
+            return bool(deleted)
+
+        self._l1.discard(keys)
+        return self._write(write)
+
+    def clear(self):
+        def write(db):
+            db.execute("DELETE FROM cache")
+            self._log(db, ALL_KEYS)
+
+        self._write(write)
+        self._l1.clear()
+
+    def stats(self):
+        """This process's lookups by tier, and its overall hit rate."""
+        with self._l1.lock:
+            stats = dict(self._l1.stats)
+            stats["l1_entries"] = len(self._l1.entries)
+        lookups = stats["l1_hit"] + stats["l2_hit"] + stats["miss"]
+        stats["hit_rate"] = (
+            (stats["l1_hit"] + stats["l2_hit"]) / lookups if lookups else 0.0
+        )
+        return stats
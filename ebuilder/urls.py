@@ -6,10 +6,13 @@ from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
 from ebuilder.sitemaps import sitemaps
 from ebuilder import views as project_views
+from ebuilder.metrics import metrics_view
+from ebuilder.swr import cache_page_swr
 from pages.views_upload import tinymce_upload
 
 urlpatterns = [
     path("health/", project_views.health, name="health"),
+    path("metrics", metrics_view, name="metrics"),
     path("admin/", admin.site.urls),
     path("accounts/", include("allauth.urls")),
     path("accounts/", include("accounts.urls")),
@@ -19,7 +22,8 @@ urlpatterns = [
     path("tinymce/upload/", tinymce_upload, name="tinymce_upload"),
     path(
         "sitemap.xml",
-        sitemap,
+        # Fresh for 15 minutes, then refreshed by one request at a time
+        cache_page_swr(60 * 15, 60 * 60 * 24)(sitemap),
         {"sitemaps": sitemaps},
         name="django.contrib.sitemaps.views.sitemap",
     ),
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ebuilder.settings')
 
 application = get_wsgi_application()
+
+# Build this worker's in-memory catalog before it takes requests
+from shop.catalog_index import warm  # noqa: E402
+
+warm()
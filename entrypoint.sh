@@ -42,6 +42,18 @@ fi
 # ALWAYS ensure static files are present
 python manage.py collectstatic --noinput
 
+# Per-worker metrics snapshots are only meaningful for this server run
+rm -rf "${METRICS_DIR:-/app/data/metrics}"
+
+# SERVER_MODE=asgi runs the same gunicorn process manager with uvicorn
+# workers, so slow downloads and Stripe/SMTP calls don't tie up a worker.
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn ebuilder.asgi:application \
+        --bind 0.0.0.0:8000 \
+        --workers 3 \
+        --worker-class uvicorn_worker.UvicornWorker
+fi
+
 exec gunicorn ebuilder.wsgi:application \
     --bind 0.0.0.0:8000 \
     --workers 3
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class PagesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "pages"
+
+    def ready(self):
+        from .models import SiteSettings
+        from .signals import clear_site_settings_cache
+
+        post_save.connect(clear_site_settings_cache, sender=SiteSettings)
+        post_delete.connect(clear_site_settings_cache, sender=SiteSettings)
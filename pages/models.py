@@ -1,8 +1,12 @@
 # pages/models.py
+from django.core.cache import cache
 from django.db import models
 from django.urls import reverse
 import os
 
+SITE_SETTINGS_CACHE_KEY = "pages_site_settings"
+SITE_SETTINGS_CACHE_TIMEOUT = 300  # 5 minutes
+
 
 class SiteSettings(models.Model):
     """
@@ -204,6 +208,31 @@ class SiteSettings(models.Model):
     def __str__(self):
         return "Site Settings"
 
+    @classmethod
+    def get_cached(cls):
+        """
+        The settings row (or None), cached so pages that read it per item
+        (prices, admin lists) don't query it every time. The cache is
+        cleared whenever SiteSettings is saved.
+        """
+        site_settings = cache.get(SITE_SETTINGS_CACHE_KEY)
+        if site_settings is None:
+            # False caches "no row yet" as well
+            site_settings = cls.objects.first() or False
+            cache.set(
+                SITE_SETTINGS_CACHE_KEY, site_settings, SITE_SETTINGS_CACHE_TIMEOUT
+            )
+        return site_settings or None
+
+    @classmethod
+    def get_currency_symbol(cls):
+        site_settings = cls.get_cached()
+        return site_settings.currency_symbol if site_settings else "£"
+
+    @classmethod
+    def clear_cache(cls):
+        cache.delete(SITE_SETTINGS_CACHE_KEY)
+
     def save(self, *args, **kwargs):
         # Enforce singleton
         if not self.pk and SiteSettings.objects.exists():
@@ -0,0 +1,7 @@
+# pages/signals.py
+from .models import SiteSettings
+
+
+def clear_site_settings_cache(sender, **kwargs):
+    """Saved/deleted SiteSettings -> drop the cached copy."""
+    SiteSettings.clear_cache()
@@ -5,7 +5,25 @@ from .models import (
     SiteSettings,
 )
 from blog.models import Post
-from shop.models import Product
+from content.cache import (
+    CONTENT_FRESH_FOR,
+    CONTENT_STALE_FOR,
+    NAMESPACE,
+    container_blocks,
+    container_hero,
+)
+from ebuilder.swr import stale_while_revalidate
+from shop.catalog_index import get_index
+
+
+@stale_while_revalidate(CONTENT_FRESH_FOR, CONTENT_STALE_FOR, namespace=NAMESPACE)
+def _home_page():
+    return Page.objects.filter(template="home", published=True).first()
+
+
+@stale_while_revalidate(CONTENT_FRESH_FOR, CONTENT_STALE_FOR, namespace=NAMESPACE)
+def _latest_posts():
+    return list(Post.objects.filter(status="published").order_by("-publish_date")[:3])
 
 
 def _render_page(request, template_name):
@@ -55,57 +73,32 @@ def home_view(request):
     if settings_obj.homepage_mode == "SHOP":
         return redirect("shop:product_list")
 
-    # Try to get homepage, show welcome page if none exists
-    try:
-        page = Page.objects.get(template="home", published=True)
-    except Page.DoesNotExist:
+    # Homepage, its blocks and the latest posts are cached (content/cache.py)
+    page = _home_page()
+    if page is None:
         return render(request, "pages/welcome.html", {"settings": settings_obj})
 
-    # Collect all content blocks
-    sections = list(page.content_container.sections.filter(published=True))
-    three_columns = list(
-        page.content_container.three_column_blocks.filter(published=True)
-    )
-    galleries = list(page.content_container.gallery_blocks.filter(published=True))
-    faq_blocks = list(page.content_container.faq_blocks.filter(published=True))
-
-    newsletter_blocks = list(
-        page.content_container.newsletter_blocks.filter(published=True)
-    )
-
-    content_blocks = sorted(
-        sections + three_columns + galleries + faq_blocks + newsletter_blocks,
-        key=lambda block: block.order,
-    )
+    content_blocks = []
+    hero = None
+    if page.content_container_id:
+        content_blocks = container_blocks(
+            page.content_container_id,
+            "sections",
+            "three_column_blocks",
+            "gallery_blocks",
+            "faq_blocks",
+            "newsletter_blocks",
+        )
+        hero = container_hero(page.content_container_id)
+    hero_banner = hero if hero and hero.banner_published else None
 
     # Optional blog posts
-    blog_posts = None
-    if settings_obj.show_blog_on_homepage:
-        blog_posts = Post.objects.filter(status="published").order_by("-publish_date")[
-            :3
-        ]
+    blog_posts = _latest_posts() if settings_obj.show_blog_on_homepage else None
 
     # Optional featured products
     featured_products = None
     if settings_obj.show_shop_on_homepage:
-        featured_products = Product.objects.filter(
-            is_active=True,
-            status="publish",
-            featured=True,
-        ).order_by("order", "-created")[:4]
-
-    hero = None
-    hero_banner = None
-
-    if page.content_container:
-        hero = (
-            page.content_container.hero_blocks.filter(published=True)
-            .order_by("order")
-            .first()
-        )
-
-        if hero and hero.banner_published:
-            hero_banner = hero
+        featured_products = get_index().featured(limit=4)
 
     context = {
         "page": page,
@@ -1,14 +1,19 @@
 # shop/admin.py
 from django.contrib import admin
 from django.utils.html import format_html
-from django.core.exceptions import ValidationError
-from django.core.validators import URLValidator
 from django.contrib.admin.widgets import AdminSplitDateTime
-import requests
+from ebuilder.paginator import EstimatedCountPaginator
+from ebuilder.thumbnails import thumbnail_url
 from pages.models import SiteSettings
 
+from .exports import export_response
+from .media_checks import PRODUCT_MEDIA_FIELDS, check_urls
+from .rollups import sales_summary
 from .models import (
     Category,
+    DailySales,
+    Entitlement,
+    MediaURLCheck,
     Product,
     ProductDownload,
     ProductImage,
@@ -54,6 +59,25 @@ class ProductAdminForm(forms.ModelForm):
             "long_description": RichTextWidget(),
         }
 
+    def clean(self):
+        """
+        Check changed external image/preview URLs point at the right kind of
+        file. Both are probed at once, with a timeout, and recent results
+        are reused (see shop/media_checks.py).
+        """
+        cleaned_data = super().clean()
+        fields = [
+            name
+            for name in PRODUCT_MEDIA_FIELDS
+            if name in self.changed_data and cleaned_data.get(name)
+        ]
+        checks = check_urls([cleaned_data[name] for name in fields])
+        for name in fields:
+            message = PRODUCT_MEDIA_FIELDS[name](checks[cleaned_data[name]])
+            if message:
+                self.add_error(name, message)
+        return cleaned_data
+
 
 class ShopSettingsForm(forms.ModelForm):
     # Override encrypted fields to use PasswordInput with proper rendering
@@ -167,6 +191,7 @@ class ProductAdmin(admin.ModelAdmin):
         "order",
     ]
     list_filter = ["status", "category", "featured", "created"]
+    list_select_related = ["category"]
     search_fields = ["title", "description", "public_id"]
     prepopulated_fields = {"slug": ("title",)}
     readonly_fields = ["public_id", "purchase_count", "display_preview"]
@@ -232,10 +257,9 @@ class ProductAdmin(admin.ModelAdmin):
     )
 
     def get_currency_symbol(self):
-        """Get currency symbol from SiteSettings"""
+        """Get currency symbol from (cached) SiteSettings"""
         try:
-            settings = SiteSettings.objects.first()
-            return settings.currency_symbol if settings else "£"
+            return SiteSettings.get_currency_symbol()
         except Exception:
             return "£"
 
@@ -250,10 +274,11 @@ class ProductAdmin(admin.ModelAdmin):
         return "-"
 
     def display_thumbnail(self, obj):
-        image_url = obj.get_image_url()
+        # External images can't be resized; uploads get a 100px rendition
+        image_url = obj.external_image_url or thumbnail_url(obj.preview_image)
         if image_url:
             return format_html(
-                '<img src="{}" width="50" class="admin-thumbnail" style="border-radius: 3px;" />',
+                '<img src="{}" width="50" loading="lazy" class="admin-thumbnail" style="border-radius: 3px;" />',
                 image_url,
             )
         return "-"
@@ -273,91 +298,84 @@ class ProductAdmin(admin.ModelAdmin):
 
     display_preview.short_description = "Preview"
 
-    def clean_external_preview_url(self, url):
-        if not url:
-            return url
-
-        validator = URLValidator()
-        try:
-            validator(url)
-        except ValidationError:
-            raise ValidationError("Invalid URL format")
-
-        try:
-            response = requests.head(url, allow_redirects=True)
-            content_type = response.headers.get("content-type", "").lower()
-
-            if not content_type == "application/pdf":
-                raise ValidationError("URL must point to a PDF file")
-
-        except requests.RequestException:
-            raise ValidationError("Could not validate preview URL")
-
-        return url
-
-    def save_model(self, request, obj, form, change):
-        if "external_image_url" in form.changed_data:
-            obj.external_image_url = self.clean_external_image_url(
-                obj.external_image_url
-            )
-        if "external_preview_url" in form.changed_data:
-            obj.external_preview_url = self.clean_external_preview_url(
-                obj.external_preview_url
-            )
-        super().save_model(request, obj, form, change)
-
-    def clean_external_image_url(self, url):
-        if not url:
-            return url
-
-        validator = URLValidator()
-        try:
-            validator(url)
-        except ValidationError:
-            raise ValidationError("Invalid URL format")
-
-        try:
-            response = requests.head(url, allow_redirects=True)
-            content_type = response.headers.get("content-type", "").lower()
-
-            if not content_type.startswith("image/"):
-                raise ValidationError("URL must point to an image file")
-
-            if not any(
-                content_type.endswith(ext) for ext in ["/jpeg", "/jpg", "/png", "/webp"]
-            ):
-                raise ValidationError("Only JPG and PNG images are allowed")
-
-        except requests.RequestException:
-            raise ValidationError("Could not validate image URL")
-
-        return url
-
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
-    raw_id_fields = ["product"]
+    raw_id_fields = ["product", "purchased_download"]
     fields = [
         "product",
+        "purchased_download",
         "quantity",
         "price_paid_pence",
-        "downloads_remaining",
+        "download_count",
+        "downloads_left",
     ]
+    readonly_fields = ["downloads_left"]
     ordering = ["id"]
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product")
+
+
+def _export_action(name, fmt, description, lookup="pk"):
+    """
+    Admin action streaming an export of the selected orders (or of their
+    items / download logs via lookup). "Select all" exports every order
+    matching the current filters without loading them into memory.
+    """
+
+    def action(modeladmin, request, queryset):
+        return export_response(name, fmt, filters={f"{lookup}__in": queryset})
+
+    action.__name__ = f"export_{name}_{fmt}"
+    return admin.action(description=description)(action)
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ["order_id", "user", "email", "paid", "created", "get_customer_name"]
     list_filter = ["paid", "created", "status"]
-    search_fields = [
-        "order_id",
-        "user__username",
-        "email",
-    ]
+    list_select_related = ["user"]
+    # Substring search for anything else; see get_search_results
+    search_fields = ["order_id", "email"]
     inlines = [OrderItemInline]
     readonly_fields = ["order_id", "payment_intent_id"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        _export_action("orders", "csv", "Export selected orders (CSV)"),
+        _export_action("orders", "jsonl", "Export selected orders (JSON Lines)"),
+        _export_action(
+            "order_items", "csv", "Export items of selected orders (CSV)", "order"
+        ),
+        _export_action(
+            "download_logs",
+            "csv",
+            "Export download logs of selected orders (CSV)",
+            "order_item__order",
+        ),
+    ]
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Whole order ids, payment intents and email addresses are looked up
+        with indexed equality instead of a substring scan of every order.
+        Partial ones ("@gmail.com", "ORD-2025") match nothing that way and
+        fall back to the substring search.
+        """
+        term = search_term.strip()
+        exact = None
+        if " " not in term:
+            if term.upper().startswith("ORD-"):
+                exact = queryset.filter(order_id=term.upper())
+            elif term.startswith("pi_"):
+                exact = queryset.filter(payment_intent_id=term)
+            elif "@" in term:
+                exact = queryset.filter(email__in={term, term.lower()})
+        if exact is not None and exact.exists():
+            return exact, False
+        return super().get_search_results(request, queryset, search_term)
 
     def get_customer_name(self, obj):
         if obj.user:
@@ -366,7 +384,7 @@ class OrderAdmin(admin.ModelAdmin):
             elif obj.user.first_name:
                 return obj.user.first_name
             else:
-                return obj.user.username
+                return obj.user.email
 
         return "No user assigned"
 
@@ -381,7 +399,100 @@ class OrderAdmin(admin.ModelAdmin):
     )
 
 
-admin.site.register(Purchase)
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """
+    Sales dashboard: 12-month summaries above the daily rows. Everything
+    here reads the rollup table, never the order history.
+    """
+
+    change_list_template = "admin/shop/dailysales/change_list.html"
+    list_display = [
+        "date",
+        "product",
+        "category",
+        "get_revenue",
+        "units",
+        "orders",
+        "downloads",
+    ]
+    list_filter = ["category"]
+    list_select_related = ["product", "category"]
+    date_hierarchy = "date"
+    search_fields = ["product__title"]
+
+    def get_revenue(self, obj):
+        symbol = SiteSettings.get_currency_symbol()
+        return f"{symbol}{obj.revenue_pence / 100:.2f}"
+
+    get_revenue.short_description = "Revenue"
+    get_revenue.admin_order_field = "revenue_pence"
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context["summary"] = sales_summary()
+        return super().changelist_view(request, extra_context)
+
+    # Maintained by shop/rollups.py; rebuild_sales_rollups recomputes it
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(MediaURLCheck)
+class MediaURLCheckAdmin(admin.ModelAdmin):
+    list_display = ["url", "ok", "status_code", "content_type", "checked_at"]
+    list_filter = ["ok", "content_type"]
+    search_fields = ["url"]
+    readonly_fields = [
+        "url",
+        "ok",
+        "status_code",
+        "content_type",
+        "content_length",
+        "error",
+        "checked_at",
+    ]
+
+
+@admin.register(Entitlement)
+class EntitlementAdmin(admin.ModelAdmin):
+    """
+    Granted when orders complete. Edit downloads_used / download_limit to
+    give a customer more downloads.
+    """
+
+    list_display = [
+        "user",
+        "product",
+        "download",
+        "downloads_used",
+        "download_limit",
+        "reviewed",
+        "granted_at",
+    ]
+    list_filter = ["reviewed"]
+    list_select_related = ["user", "product", "download"]
+    search_fields = ["user__email", "product__title"]
+    raw_id_fields = ["user", "product", "order_item", "download"]
+    readonly_fields = ["user", "product", "order_item", "download", "granted_at"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Purchase)
+class PurchaseAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "purchased_at"]
+    list_select_related = ["user", "product"]
+    raw_id_fields = ["user", "product"]
 
 
 class ProductReviewAdminForm(forms.ModelForm):
@@ -416,7 +527,11 @@ class ProductReviewAdmin(admin.ModelAdmin):
 
     list_display = ["product", "user", "rating", "verified_purchase", "created"]
     list_filter = ["rating", "verified_purchase", "created"]
-    search_fields = ["product__title", "user__username", "comment"]
+    list_select_related = ["product", "user"]
+    search_fields = ["product__title", "user__email", "comment"]
+    raw_id_fields = ["product", "user"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (
@@ -1,5 +1,5 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class ShopConfig(AppConfig):
@@ -7,6 +7,40 @@ class ShopConfig(AppConfig):
     name = "shop"
 
     def ready(self):
-        from .signals import create_shop_settings
+        from .models import (
+            Category,
+            DownloadLog,
+            Order,
+            Product,
+            ProductReview,
+            ShopSettings,
+            WishList,
+        )
+        from .signals import (
+            bump_catalog,
+            bump_user_state,
+            clear_config_cache,
+            create_shop_settings,
+            mark_entitlements_reviewed,
+            order_completed,
+            sync_entitlement_limits,
+            unmark_entitlements_reviewed,
+            update_download_rollups,
+            update_recommendations,
+            update_sales_rollups,
+        )
 
         post_migrate.connect(create_shop_settings, sender=self)
+        post_save.connect(clear_config_cache, sender=ShopSettings)
+        post_delete.connect(clear_config_cache, sender=ShopSettings)
+        order_completed.connect(update_sales_rollups, sender=Order)
+        order_completed.connect(update_recommendations, sender=Order)
+        post_save.connect(update_download_rollups, sender=DownloadLog)
+        post_save.connect(mark_entitlements_reviewed, sender=ProductReview)
+        post_delete.connect(unmark_entitlements_reviewed, sender=ProductReview)
+        post_save.connect(sync_entitlement_limits, sender=Product)
+        post_save.connect(bump_user_state, sender=WishList)
+        post_delete.connect(bump_user_state, sender=WishList)
+        for model in (Product, Category, ProductReview):
+            post_save.connect(bump_catalog, sender=model)
+            post_delete.connect(bump_catalog, sender=model)
@@ -0,0 +1,80 @@
+# shop/card_cache.py
+"""
+Rendered product cards, cached per product version.
+
+Grids render through {% product_cards products "template" %}
+(shop/templatetags/product_cards.py): one cache.get_many() for the whole
+page, then only the missing cards are rendered and stored with one
+set_many(). A card's key includes what can change its HTML:
+
+- the card template
+- the product's id and `updated` time (any admin save)
+- its review count and rating (reviews don't touch `updated`)
+- the SiteSettings `updated` time (currency symbol)
+
+so stale cards are never served - changed ones just stop being looked up
+and expire after CARD_TIMEOUT.
+
+Cards are rendered with nothing but {"product": product}, so the HTML is
+the same for every visitor. Per-customer badges go where a card template
+puts STATE_SLOT, filled from the cached shop.user_state.
+"""
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from pages.models import SiteSettings
+
+CARD_TIMEOUT = 60 * 60 * 24
+STATE_SLOT = "<!--card-state-->"
+STATE_TEMPLATE = "shop/includes/product_card_state.html"
+
+
+def _settings_version():
+    site_settings = SiteSettings.get_cached()
+    return site_settings.updated.timestamp() if site_settings else 0
+
+
+def card_key(product, template_name, settings_version):
+    return (
+        f"shop:card:{template_name}:{product.pk}:{product.updated.timestamp()}:"
+        f"{product.total_reviews}:{product.average_rating}:{settings_version}"
+    )
+
+
+def render_cards(products, template_name, user_state=None):
+    """The cards' HTML, in order, rendering only those not cached."""
+    products = list(products)
+    settings_version = _settings_version()
+    keys = [card_key(p, template_name, settings_version) for p in products]
+    cards = cache.get_many(keys)
+
+    missing = {
+        key: render_to_string(template_name, {"product": product})
+        for key, product in zip(keys, products)
+        if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+        cards.update(missing)
+
+    html = [cards[key] for key in keys]
+    if user_state is None:
+        return html
+
+    # At most four badge combinations - render each once
+    badges = {}
+    for i, product in enumerate(products):
+        if STATE_SLOT not in html[i]:
+            continue
+        state = (product.id in user_state.purchased, product.id in user_state.wishlisted)
+        if state not in badges:
+            badges[state] = (
+                render_to_string(
+                    STATE_TEMPLATE, {"purchased": state[0], "wishlisted": state[1]}
+                )
+                if any(state)
+                else ""
+            )
+        html[i] = html[i].replace(STATE_SLOT, badges[state])
+    return html
@@ -1,16 +1,142 @@
 # shop/cart.py
+import hashlib
+import json
+import logging
 from decimal import Decimal
+
 from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+
 from .models import Product, ProductDownload
 
+logger = logging.getLogger("shop")
+
+CART_COOKIE_SALT = "shop.cart"
+
+
+class CartFullError(Exception):
+    """Raised when the cart no longer fits in its storage backend."""
+
+    pass
+
+
+class SessionCartStorage:
+    """
+    Default storage: the cart lives in the (DB-backed) session.
+    The session is only written once the cart is actually changed, so
+    anonymous visitors who never add anything don't create session rows.
+    """
 
-class Cart:
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+
+    def load(self):
+        return self.session.get(settings.CART_SESSION_ID) or {}
+
+    def save(self, cart):
+        self.session[settings.CART_SESSION_ID] = cart
+        self.session.modified = True
+
+    def clear(self):
+        if settings.CART_SESSION_ID in self.session:
+            del self.session[settings.CART_SESSION_ID]
+            self.session.modified = True
+
+
+class SignedCookieCartStorage:
+    """
+    Keeps a compact cart in a signed, size-bounded cookie so cart changes
+    never touch the session table.
+
+    The cookie holds a list of [product_id, download_id, quantity, price_pence]
+    rows. Prices are only used for display - the checkout re-validates
+    everything against the database (see Cart.revalidate).
+
+    The cookie itself is written by shop.middleware.CartCookieMiddleware,
+    which picks up the pending value stored on the request.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        if hasattr(self.request, "_cart_cookie"):
+            return self.request._cart_cookie
+
+        cart = {}
+        raw = self.request.COOKIES.get(settings.CART_COOKIE_NAME)
+        if raw:
+            try:
+                rows = signing.loads(
+                    raw,
+                    salt=CART_COOKIE_SALT,
+                    max_age=settings.CART_COOKIE_MAX_AGE,
+                )
+                cart = self._unpack(rows)
+            except (signing.BadSignature, ValueError, TypeError):
+                logger.warning("Discarding invalid cart cookie")
+
+        self.request._cart_cookie = cart
+        return cart
+
+    def save(self, cart):
+        value = signing.dumps(self._pack(cart), salt=CART_COOKIE_SALT, compress=True)
+        if len(value) > settings.CART_COOKIE_MAX_BYTES:
+            raise CartFullError("Cart is too large to store.")
+
+        self.request._cart_cookie = cart
+        self.request._cart_cookie_value = value
+
+    def clear(self):
+        self.request._cart_cookie = {}
+        self.request._cart_cookie_value = None
+
+    @staticmethod
+    def _pack(cart):
+        return [
+            [
+                item["product_id"],
+                item.get("download_id") or 0,
+                item["quantity"],
+                int(Decimal(str(item["price"])) * 100),
+            ]
+            for item in cart.values()
+        ]
+
+    @staticmethod
+    def _unpack(rows):
+        cart = {}
+        for product_id, download_id, quantity, price_pence in rows:
+            product_id = int(product_id)
+            download_id = int(download_id) or None
+            cart[Cart._get_cart_key(product_id, download_id)] = {
+                "product_id": product_id,
+                "download_id": download_id,
+                "quantity": int(quantity),
+                "price": str(Decimal(int(price_pence)) / 100),
+            }
+        return cart
+
+
+CART_STORAGES = {
+    "session": SessionCartStorage,
+    "cookie": SignedCookieCartStorage,
+}
+
+
+def get_cart_storage_class():
+    """Resolve settings.CART_STORAGE ('session', 'cookie' or a dotted path)."""
+    name = getattr(settings, "CART_STORAGE", "session")
+    if name in CART_STORAGES:
+        return CART_STORAGES[name]
+    return import_string(name)
+
+
+class Cart:
+    def __init__(self, request):
+        self.storage = get_cart_storage_class()(request)
+        self.cart = self.storage.load()
 
     def __iter__(self):
         """
@@ -51,7 +177,8 @@ class Cart:
     def __len__(self):
         return sum(item["quantity"] for item in self.cart.values())
 
-    def _get_cart_key(self, product_id, download_id=None):
+    @staticmethod
+    def _get_cart_key(product_id, download_id=None):
         """Generate a unique key for product + download combination."""
         if download_id:
             return f"{product_id}_{download_id}"
@@ -60,13 +187,15 @@ class Cart:
     def add(self, product, quantity=1, override_quantity=False, download_id=None):
         """
         Add a product to the cart with optional specific download variant.
+        Raises CartFullError if the storage backend can't hold the new cart.
         """
         cart_key = self._get_cart_key(product.id, download_id)
+        previous = self.cart.get(cart_key, {}).copy()
 
         if cart_key not in self.cart:
             self.cart[cart_key] = {
                 "product_id": product.id,
-                "download_id": download_id,
+                "download_id": int(download_id) if download_id else None,
                 "quantity": 0,
                 "price": str(product.current_price),
             }
@@ -76,10 +205,17 @@ class Cart:
         else:
             self.cart[cart_key]["quantity"] += quantity
 
-        self.save()
+        try:
+            self.save()
+        except CartFullError:
+            if previous:
+                self.cart[cart_key] = previous
+            else:
+                del self.cart[cart_key]
+            raise
 
     def save(self):
-        self.session.modified = True
+        self.storage.save(self.cart)
 
     def remove(self, product, download_id=None):
         """Remove a product from the cart."""
@@ -101,7 +237,60 @@ class Cart:
             for item in self.cart.values()
         )
 
+    def get_fingerprint(self):
+        """Stable hash of the cart contents (items, quantities and prices)."""
+        rows = sorted(
+            (key, item["quantity"], str(item["price"]))
+            for key, item in self.cart.items()
+        )
+        return hashlib.sha256(json.dumps(rows).encode()).hexdigest()
+
+    def revalidate(self):
+        """
+        Re-check the cart against the database before taking payment.
+
+        Drops products that are no longer purchasable and downloads that no
+        longer belong to their product, and re-prices everything at the
+        product's current price. Returns True if the cart was changed.
+        """
+        products = Product.objects.filter(
+            id__in=[item["product_id"] for item in self.cart.values()],
+            is_active=True,
+            status="publish",
+        ).only("id", "price_pence", "sale_price_pence")
+        products_dict = {p.id: p for p in products}
+
+        valid_downloads = set(
+            ProductDownload.objects.filter(product_id__in=products_dict).values_list(
+                "id", "product_id"
+            )
+        )
+
+        changed = False
+        for key, item in list(self.cart.items()):
+            product = products_dict.get(int(item["product_id"]))
+            download_id = item.get("download_id")
+            if (
+                product is None
+                or item["quantity"] < 1
+                or (
+                    download_id
+                    and (int(download_id), product.id) not in valid_downloads
+                )
+            ):
+                del self.cart[key]
+                changed = True
+                continue
+
+            if Decimal(str(item["price"])) != product.current_price:
+                item["price"] = str(product.current_price)
+                changed = True
+
+        if changed:
+            self.save()
+        return changed
+
     def clear(self):
-        """Remove cart from session"""
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
+        """Remove cart from storage"""
+        self.cart = {}
+        self.storage.clear()
@@ -0,0 +1,176 @@
+# shop/catalog_index.py
+"""
+In-memory index of the listed catalog, one per worker process.
+
+The shop's listing pages (shop list, category pages, category hub, the
+homepage's featured products, related products) are served from a
+CatalogIndex instead of the database: product card fields, listing order,
+category membership and featured flags, built with one query.
+
+Workers share a version stamp: CATALOG_VERSION_FILE, rewritten by bump()
+whenever a product, category or review changes (signals in
+shop/signals.py). get_index() reads the stamp on every call - a few
+microseconds - and rebuilds when it changed; the new index replaces the
+old one in a single assignment, so requests never see a half-built index.
+wsgi.py/asgi.py build it as each worker starts.
+
+Products in the index are shared between requests: treat them as
+read-only. Queryset .update() calls bypass the signals - call bump()
+after them (generate_load_data does).
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Avg, Count
+
+from .models import Category, Product
+
+logger = logging.getLogger("shop")
+
+LISTED_STATUSES = ("publish", "soon", "full")
+
+# Everything the product cards and listing filters use; anything else
+# would be loaded per product on access
+CARD_FIELDS = [
+    "id",
+    "title",
+    "slug",
+    "description",
+    "category_id",
+    "status",
+    "external_image_url",
+    "preview_image",
+    "price_pence",
+    "sale_price_pence",
+    "featured",
+    "order",
+    "created",
+    "updated",
+]
+
+
+def card_queryset():
+    """Every listed product's card fields and rating, in listing order."""
+    return (
+        Product.objects.filter(is_active=True, status__in=LISTED_STATUSES)
+        .only(*CARD_FIELDS)
+        .annotate(review_count=Count("reviews"), rating_avg=Avg("reviews__rating"))
+        .order_by("order", "-created")
+    )
+
+
+class CatalogIndex:
+    def __init__(self, products, categories, version=None):
+        self.version = version
+        # In listing order: order, then newest first
+        self.products = tuple(products)
+        self.by_id = {product.id: product for product in self.products}
+        self.by_category = {}
+        for product in self.products:
+            self.by_category.setdefault(product.category_id, []).append(product)
+        self.by_category = {
+            category_id: tuple(products)
+            for category_id, products in self.by_category.items()
+        }
+        self._search_text = {
+            product.id: f"{product.title}\n{product.description}".casefold()
+            for product in self.products
+        }
+
+        self.categories = tuple(categories)
+        self.categories_by_slug = {category.slug: category for category in categories}
+        for category in self.categories:
+            category.product_count = len(self.by_category.get(category.id, ()))
+
+    @classmethod
+    def build(cls, version=None):
+        return cls(card_queryset(), Category.objects.order_by("name"), version)
+
+    def listing(self, category_id=None, featured=False, query="", statuses=None):
+        """Listed products in listing order, filtered in memory."""
+        products = (
+            self.products
+            if category_id is None
+            else self.by_category.get(category_id, ())
+        )
+        query = query.casefold()
+        return [
+            product
+            for product in products
+            if (not featured or product.featured)
+            and (statuses is None or product.status in statuses)
+            and (not query or query in self._search_text[product.id])
+        ]
+
+    def featured(self, limit=4):
+        """The homepage's featured products (published only)."""
+        return self.listing(featured=True, statuses=("publish",))[:limit]
+
+    def get_many(self, ids):
+        """Listed products for these ids, in the given order."""
+        return [self.by_id[pk] for pk in ids if pk in self.by_id]
+
+    def category(self, slug):
+        return self.categories_by_slug.get(slug)
+
+    def listed_categories(self):
+        """Categories with at least one listed product, by name."""
+        return [category for category in self.categories if category.product_count]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _version_path():
+    return Path(settings.CATALOG_VERSION_FILE)
+
+
+def current_version():
+    try:
+        return _version_path().read_text()
+    except OSError:
+        return ""
+
+
+def bump():
+    """The catalog changed - every worker rebuilds on its next request."""
+    path = _version_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(str(time.time_ns()))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not bump the catalog version: {e}")
+
+
+def get_index():
+    """This process's CatalogIndex, rebuilt if the catalog changed."""
+    global _index
+    version = current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            started = time.perf_counter()
+            _index = CatalogIndex.build(version)
+            logger.info(
+                f"Built catalog index: {len(_index.products)} products "
+                f"in {time.perf_counter() - started:.3f}s"
+            )
+        return _index
+
+
+def warm():
+    """Build the index as a worker starts (skipped if the DB isn't ready)."""
+    try:
+        get_index()
+    except Exception as e:
+        logger.warning(f"Catalog index not built at startup: {e}")
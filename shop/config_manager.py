@@ -6,6 +6,7 @@ Checks database (ShopSettings) first, falls back to environment variables.
 
 import os
 import logging
+import time
 from typing import Any
 
 from django.conf import settings
@@ -17,6 +18,12 @@ logger = logging.getLogger(__name__)
 CONFIG_CACHE_KEY = "ebuilder_config"
 CONFIG_CACHE_TIMEOUT = 300  # 5 minutes
 
+# Decrypted secrets never go in the shared cache (a file on disk with the
+# default backend); each process keeps its own copy, reloaded whenever the
+# cached config's version changes.
+SECRET_KEYS = ("stripe_secret_key", "stripe_webhook_secret", "email_host_password")
+_secrets = (None, {})
+
 
 class ConfigManager:
     """
@@ -56,7 +63,7 @@ class ConfigManager:
 
     @classmethod
     def _get_db_settings(cls):
-        """Get ShopSettings instance, with caching."""
+        """Get ShopSettings instance (None if unavailable)."""
         from shop.models import ShopSettings
 
         try:
@@ -92,6 +99,46 @@ class ConfigManager:
 
         return value
 
+    @classmethod
+    def _load(cls, use_cache: bool = True) -> dict:
+        """
+        Resolve every setting (one ShopSettings query) and cache the result.
+        The cache is cleared whenever ShopSettings is saved.
+        """
+        global _secrets
+        config = cache.get(CONFIG_CACHE_KEY) if use_cache else None
+        db_settings = None
+        if config is None:
+            db_settings = cls._get_db_settings()
+            config = {
+                key: cls._resolve(key, db_settings)
+                for key in cls.DEFAULTS
+                if key not in SECRET_KEYS
+            }
+            config["is_demo_site"] = bool(db_settings and db_settings.is_demo_site)
+            config["version"] = time.time_ns()
+            cache.set(CONFIG_CACHE_KEY, config, CONFIG_CACHE_TIMEOUT)
+
+        version, secrets = _secrets
+        if version != config["version"]:
+            if db_settings is None:
+                db_settings = cls._get_db_settings()
+            secrets = {key: cls._resolve(key, db_settings) for key in SECRET_KEYS}
+            _secrets = (config["version"], secrets)
+        return {**config, **secrets}
+
+    @classmethod
+    def _resolve(cls, key: str, db_settings) -> Any:
+        """Priority: Database > Environment > Default"""
+        if db_settings:
+            # Check if the field exists and has a value
+            db_value = getattr(db_settings, key, None)
+            if db_value not in (None, ""):
+                return db_value
+
+        # Fall back to environment
+        return cls._get_from_env(key, cls.DEFAULTS.get(key))
+
     @classmethod
     def get(cls, key: str, use_cache: bool = True) -> Any:
         """
@@ -105,74 +152,30 @@ class ConfigManager:
         Returns:
             Configuration value
         """
-        default = cls.DEFAULTS.get(key)
-
-        # Try database first
-        db_settings = cls._get_db_settings()
-        if db_settings:
-            # Check if the field exists and has a value
-            db_value = getattr(db_settings, key, None)
-            if db_value not in (None, ""):
-                return db_value
-
-        # Fall back to environment
-        env_value = cls._get_from_env(key, default)
-        return env_value
+        return cls._load(use_cache).get(key, cls.DEFAULTS.get(key))
 
     @classmethod
-    def get_stripe_config(cls):
+    def get_stripe_config(cls, use_cache: bool = True):
         """
         Returns Stripe configuration from database or .env.
         Returns None if in demo mode (regardless of keys) or if no keys configured.
         """
-        from shop.models import ShopSettings
+        config = cls._load(use_cache)
 
-        try:
-            shop_settings = ShopSettings.objects.first()
-
-            # CRITICAL: If demo mode is ON, ALWAYS block payments (even if keys exist)
-            if shop_settings and shop_settings.is_demo_site:
-                return None
-
-            # Not in demo mode, proceed with normal config
-            public_key = (
-                shop_settings.stripe_public_key
-                if shop_settings and shop_settings.stripe_public_key
-                else os.getenv("STRIPE_PUBLIC_KEY", "")
-            )
-            secret_key = (
-                shop_settings.stripe_secret_key
-                if shop_settings and shop_settings.stripe_secret_key
-                else os.getenv("STRIPE_SECRET_KEY", "")
-            )
-            webhook_secret = (
-                shop_settings.stripe_webhook_secret
-                if shop_settings and shop_settings.stripe_webhook_secret
-                else os.getenv("STRIPE_WEBHOOK_SECRET", "")
-            )
-
-            # Return None if no credentials available
-            if not public_key or not secret_key:
-                return None
-
-            return {
-                "public_key": public_key,
-                "secret_key": secret_key,
-                "webhook_secret": webhook_secret,
-            }
-        except Exception:
-            # Fallback to .env if database unavailable
-            public_key = os.getenv("STRIPE_PUBLIC_KEY", "")
-            secret_key = os.getenv("STRIPE_SECRET_KEY", "")
-
-            if not public_key or not secret_key:
-                return None
-
-            return {
-                "public_key": public_key,
-                "secret_key": secret_key,
-                "webhook_secret": os.getenv("STRIPE_WEBHOOK_SECRET", ""),
-            }
+        # CRITICAL: If demo mode is ON, ALWAYS block payments (even if keys exist)
+        if config["is_demo_site"]:
+            return None
+
+        # Return None if no credentials available
+        if not config["stripe_public_key"] or not config["stripe_secret_key"]:
+            return None
+
+        return {
+            "public_key": config["stripe_public_key"],
+            "secret_key": config["stripe_secret_key"],
+            "webhook_secret": config["stripe_webhook_secret"],
+            "live_mode": config["stripe_live_mode"],
+        }
 
     @classmethod
     def get_email_config(cls) -> dict:
@@ -189,8 +192,7 @@ class ConfigManager:
     @classmethod
     def is_stripe_configured(cls) -> bool:
         """Check if Stripe is properly configured."""
-        config = cls.get_stripe_config()
-        return bool(config["public_key"] and config["secret_key"])
+        return cls.get_stripe_config() is not None
 
     @classmethod
     def is_email_configured(cls) -> bool:
@@ -1,6 +1,14 @@
 # shop/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
 from .cart import Cart
+from .user_state import get_user_state
 
 
 def cart(request):
     return {"cart": Cart(request)}
+
+
+def user_state(request):
+    """Wishlisted/purchased/reviewed product ids; loaded on first use."""
+    return {"user_state": SimpleLazyObject(lambda: get_user_state(request.user))}
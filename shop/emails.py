@@ -1,9 +1,10 @@
 # shop/emails.py
-# shop/emails.py
+from asgiref.sync import sync_to_async
 from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
+from ebuilder.metrics import timed
 from pages.models import SiteSettings
 from .config_manager import ConfigManager
 import logging
@@ -79,59 +80,115 @@ def get_email_context():
         }
 
 
-def send_order_confirmation_email(order):
-    """Send order confirmation email to customer."""
-    try:
-        logger.info(f"Preparing order confirmation email for order {order.order_id}")
-
-        # Get base context with site settings
-        context = get_email_context()
-
-        items_data = [
-            {
-                "name": item.product.title,
-                "price": (item.price_paid_pence * item.quantity) / 100,
-                "quantity": item.quantity,
-                "downloads_remaining": item.downloads_remaining,
-            }
-            for item in order.items.all()
-        ]
-
-        # Add order-specific context
-        context.update(
-            {
-                "order_id": order.order_id,
-                "first_name": order.user.first_name if order.user else "",
-                "email": order.email,
-                "items": items_data,
-                "total": order.total_price,
-                "user_name": order.user.get_full_name() if order.user else None,
-                "date_created": order.created.strftime("%Y-%m-%d %H:%M:%S"),
-                # Build absolute login URL
-                "login_url": f"{context['site_url']}/accounts/login/",
-                "dashboard_url": f"{context['site_url']}/accounts/dashboard/",
-            }
-        )
+def send_timed(msg):
+    """Send an email, recording the SMTP round-trip in /metrics."""
+    with timed("smtp", "send"):
+        return msg.send()
 
-        logger.info(f"Rendering template for order {order.order_id}")
 
-        html_content = render_to_string(
-            "account/email/order_confirmation.html", context
-        )
-        text_content = strip_tags(html_content)
+def build_order_confirmation_email(order):
+    """Render the order confirmation email for the customer (not sent)."""
+    logger.info(f"Preparing order confirmation email for order {order.order_id}")
 
-        subject = f"Order Confirmation #{order.order_id}"
-        from_email = get_from_email()
-        recipient_list = [order.email]
+    # Get base context with site settings
+    context = get_email_context()
 
-        logger.info(f"Sending email from {from_email} to {recipient_list}")
+    items_data = [
+        {
+            "name": item.product.title,
+            "price": (item.price_paid_pence * item.quantity) / 100,
+            "quantity": item.quantity,
+            "downloads_remaining": item.downloads_left,
+        }
+        for item in order.items.select_related("product")
+    ]
+
+    # Add order-specific context
+    context.update(
+        {
+            "order_id": order.order_id,
+            "first_name": order.user.first_name if order.user else "",
+            "email": order.email,
+            "items": items_data,
+            "total": order.total_price,
+            "user_name": order.user.get_full_name() if order.user else None,
+            "date_created": order.created.strftime("%Y-%m-%d %H:%M:%S"),
+            # Build absolute login URL
+            "login_url": f"{context['site_url']}/accounts/login/",
+            "dashboard_url": f"{context['site_url']}/accounts/dashboard/",
+        }
+    )
 
-        connection = get_email_connection()
-        msg = EmailMultiAlternatives(
-            subject, text_content, from_email, recipient_list, connection=connection
-        )
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
+    logger.info(f"Rendering template for order {order.order_id}")
+
+    html_content = render_to_string("account/email/order_confirmation.html", context)
+    text_content = strip_tags(html_content)
+
+    subject = f"Order Confirmation #{order.order_id}"
+    from_email = get_from_email()
+    recipient_list = [order.email]
+
+    connection = get_email_connection()
+    msg = EmailMultiAlternatives(
+        subject, text_content, from_email, recipient_list, connection=connection
+    )
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def build_admin_new_order_email(order):
+    """Render the new order notification email for the admin (not sent)."""
+    logger.info(f"Preparing admin notification email for order {order.order_id}")
+
+    # Get base context with site settings
+    context = get_email_context()
+
+    items_data = [
+        {
+            "name": item.product.title,
+            "price": (item.price_paid_pence * item.quantity) / 100,
+            "quantity": item.quantity,
+        }
+        for item in order.items.select_related("product")
+    ]
+
+    # Add order-specific context
+    context.update(
+        {
+            "order_id": order.order_id,
+            "customer_email": order.email,
+            "customer_name": order.user.get_full_name() if order.user else "Guest",
+            "items": items_data,
+            "total": order.total_price,
+            "date_created": order.created.strftime("%Y-%m-%d %H:%M:%S"),
+            # Admin link to order
+            "admin_url": f"{context['site_url']}/admin/shop/order/{order.id}/change/",
+        }
+    )
+
+    logger.info(f"Rendering admin template for order {order.order_id}")
+
+    html_content = render_to_string("account/email/admin_new_order.html", context)
+    text_content = strip_tags(html_content)
+
+    subject = f"New Order #{order.order_id}"
+    from_email = get_from_email()
+    admin_email = getattr(settings, "ADMIN_EMAIL", settings.DEFAULT_FROM_EMAIL)
+
+    connection = get_email_connection()
+    msg = EmailMultiAlternatives(
+        subject, text_content, from_email, [admin_email], connection=connection
+    )
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def send_order_confirmation_email(order):
+    """Send order confirmation email to customer."""
+    try:
+        msg = build_order_confirmation_email(order)
+        logger.info(f"Sending email from {msg.from_email} to {msg.to}")
+        send_timed(msg)
 
         logger.info(
             f"Order confirmation email sent successfully for order {order.order_id} to {order.email}"
@@ -148,51 +205,9 @@ def send_order_confirmation_email(order):
 def send_admin_new_order_email(order):
     """Send notification email to admin when a new order is placed."""
     try:
-        logger.info(f"Preparing admin notification email for order {order.order_id}")
-
-        # Get base context with site settings
-        context = get_email_context()
-
-        items_data = [
-            {
-                "name": item.product.title,
-                "price": (item.price_paid_pence * item.quantity) / 100,
-                "quantity": item.quantity,
-            }
-            for item in order.items.all()
-        ]
-
-        # Add order-specific context
-        context.update(
-            {
-                "order_id": order.order_id,
-                "customer_email": order.email,
-                "customer_name": order.user.get_full_name() if order.user else "Guest",
-                "items": items_data,
-                "total": order.total_price,
-                "date_created": order.created.strftime("%Y-%m-%d %H:%M:%S"),
-                # Admin link to order
-                "admin_url": f"{context['site_url']}/admin/shop/order/{order.id}/change/",
-            }
-        )
-
-        logger.info(f"Rendering admin template for order {order.order_id}")
-
-        html_content = render_to_string("account/email/admin_new_order.html", context)
-        text_content = strip_tags(html_content)
-
-        subject = f"New Order #{order.order_id}"
-        from_email = get_from_email()
-        admin_email = getattr(settings, "ADMIN_EMAIL", settings.DEFAULT_FROM_EMAIL)
-
-        logger.info(f"Sending admin email from {from_email} to {admin_email}")
-
-        connection = get_email_connection()
-        msg = EmailMultiAlternatives(
-            subject, text_content, from_email, [admin_email], connection=connection
-        )
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
+        msg = build_admin_new_order_email(order)
+        logger.info(f"Sending admin email from {msg.from_email} to {msg.to}")
+        send_timed(msg)
 
         logger.info(f"Admin notification sent for order {order.order_id}")
 
@@ -202,3 +217,37 @@ def send_admin_new_order_email(order):
             exc_info=True,
         )
         raise
+
+
+def send_order_emails(order):
+    """
+    Send the customer confirmation and admin notification for a completed
+    order. Failures are logged, never raised - the order itself is done.
+    """
+    try:
+        send_order_confirmation_email(order)
+        send_admin_new_order_email(order)
+    except Exception as e:
+        logger.error(f"Error sending emails for order {order.order_id}: {str(e)}")
+
+
+async def send_order_emails_async(order):
+    """
+    Async version of send_order_emails for ASGI views.
+
+    Rendering (database + templates) runs in the request's sync thread; the
+    SMTP conversations run in worker threads so a slow mail server never
+    blocks the event loop.
+    """
+    try:
+        build = sync_to_async(
+            lambda: [
+                build_order_confirmation_email(order),
+                build_admin_new_order_email(order),
+            ]
+        )
+        for msg in await build():
+            await sync_to_async(send_timed, thread_sensitive=False)(msg)
+            logger.info(f"Sent '{msg.subject}' to {msg.to}")
+    except Exception as e:
+        logger.error(f"Error sending emails for order {order.order_id}: {str(e)}")
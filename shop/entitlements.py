@@ -0,0 +1,116 @@
+# shop/entitlements.py
+"""
+Entitlements: the denormalised record of what each customer owns.
+
+- grant() runs when an order completes (shop.orders.complete_order)
+- secure_download bumps downloads_used alongside OrderItem.download_count
+- reviews flip `reviewed` (signals in shop/signals.py), and a product's
+  download_limit is copied to its entitlements when it changes
+- grants and rebuilds invalidate the owners' cached shop.user_state once
+  they commit
+- rebuild() recreates everything from completed orders - run it after
+  editing orders by hand or bulk-importing them
+"""
+
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import user_state
+from .models import Entitlement, OrderItem, ProductReview
+
+logger = logging.getLogger("shop")
+
+
+def grant(order):
+    """Create the entitlements for a newly completed order's items."""
+    if not order.user_id:
+        return []
+    items = list(order.items.select_related("product"))
+    reviewed = set(
+        ProductReview.objects.filter(
+            user_id=order.user_id, product_id__in=[item.product_id for item in items]
+        ).values_list("product_id", flat=True)
+    )
+    now = timezone.now()
+    granted = Entitlement.objects.bulk_create(
+        [
+            Entitlement(
+                user_id=order.user_id,
+                product_id=item.product_id,
+                order_item=item,
+                download_id=item.purchased_download_id,
+                downloads_used=item.download_count,
+                download_limit=item.product.download_limit,
+                reviewed=item.product_id in reviewed,
+                granted_at=now,
+            )
+            for item in items
+        ],
+        ignore_conflicts=True,  # already granted (order completed twice)
+    )
+    # Not before commit: a concurrent request would cache the old purchases
+    transaction.on_commit(partial(user_state.bump, order.user_id))
+    return granted
+
+
+def set_reviewed(user_id, product_id, reviewed=True):
+    Entitlement.objects.filter(user_id=user_id, product_id=product_id).update(
+        reviewed=reviewed
+    )
+
+
+def sync_download_limit(product):
+    Entitlement.objects.filter(product=product).exclude(
+        download_limit=product.download_limit
+    ).update(download_limit=product.download_limit)
+
+
+def rebuild(batch_size=2000):
+    """Recreate every entitlement from completed orders. Returns the count."""
+    items = (
+        OrderItem.objects.filter(order__status="completed", order__user__isnull=False)
+        .values(
+            "id",
+            "product_id",
+            "purchased_download_id",
+            "download_count",
+            "order__user_id",
+            "order__created",
+            "product__download_limit",
+        )
+        .order_by("pk")
+    )
+    count = 0
+    with transaction.atomic():
+        Entitlement.objects.all().delete()
+        batch = []
+        for item in items.iterator(chunk_size=batch_size):
+            batch.append(
+                Entitlement(
+                    user_id=item["order__user_id"],
+                    product_id=item["product_id"],
+                    order_item_id=item["id"],
+                    download_id=item["purchased_download_id"],
+                    downloads_used=item["download_count"],
+                    download_limit=item["product__download_limit"],
+                    granted_at=item["order__created"],
+                )
+            )
+            if len(batch) >= batch_size:
+                count += len(Entitlement.objects.bulk_create(batch))
+                batch = []
+        count += len(Entitlement.objects.bulk_create(batch))
+        Entitlement.objects.filter(
+            Exists(
+                ProductReview.objects.filter(
+                    user=OuterRef("user"), product=OuterRef("product")
+                )
+            )
+        ).update(reviewed=True)
+    transaction.on_commit(user_state.bump_all)
+    logger.info(f"Rebuilt {count} entitlements")
+    return count
@@ -0,0 +1,52 @@
+# shop/loaders.py
+"""
+Single-pass loaders for the storefront's heavier pages.
+
+load_product_detail() fetches everything the product page and its
+components render in a fixed number of queries, however many images,
+downloads or reviews the product has:
+
+1. the product with its category, review count and average rating
+2. images (prefetch)
+3. downloads (prefetch)
+4. one page of reviews with their authors
+
+Product.average_rating, total_reviews and has_downloads use the
+annotations and prefetches when present, so the templates need no
+changes to benefit. shop.tests.ProductDetailTests pins the total for the
+whole request.
+"""
+
+from django.core.paginator import Paginator
+from django.db.models import Avg, Count
+from django.http import Http404
+
+from .catalog_index import LISTED_STATUSES
+from .models import Product
+
+REVIEWS_PER_PAGE = 10
+
+
+def load_product_detail(slug, review_page=None):
+    """
+    The listed product for `slug` and a page of its reviews (newest first).
+    Raises Http404 if there is no such product.
+    """
+    product = (
+        Product.objects.filter(slug=slug, is_active=True, status__in=LISTED_STATUSES)
+        .select_related("category")
+        .annotate(review_count=Count("reviews"), rating_avg=Avg("reviews__rating"))
+        .prefetch_related("images", "downloads")
+        .first()
+    )
+    if product is None:
+        raise Http404("No product matches the given query.")
+
+    paginator = Paginator(
+        product.reviews.select_related("user").order_by("-created", "-pk"),
+        REVIEWS_PER_PAGE,
+    )
+    # Already counted above - saves the paginator its own COUNT query
+    paginator.count = product.review_count
+    reviews = paginator.get_page(review_page)
+    return product, reviews
@@ -0,0 +1,456 @@
+"""
+Management command to benchmark the key storefront and checkout views.
+Usage:
+    python manage.py bench [--iterations 30] [--products 200] [--output bench.json]
+    python manage.py bench --baseline bench.json [--max-slowdown 25]
+
+Builds a throwaway test database (your real data is never touched), seeds it
+with ebuilder.loadgen plus a customer with purchases, and drives each view
+through the Django test client.
+Every scenario records p50/p95 latency, SQL query count and the peak memory
+allocated while serving one request. Stripe and SMTP are stubbed, so the
+webhook scenario measures only our own work.
+
+--output writes the results as JSON ("-" prints them instead of the table).
+--baseline compares against an earlier JSON result and fails if a scenario
+got more than --max-slowdown percent slower at p95, or runs more queries.
+"""
+
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import django
+import stripe
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from blog.models import Post
+from ebuilder.loadgen import LoadDataGenerator
+from infopages.models import InfoPage
+from pages.models import Page
+from shop.entitlements import rebuild as rebuild_entitlements
+from shop.models import (
+    DownloadLog,
+    Entitlement,
+    Order,
+    OrderItem,
+    Product,
+    ProductDownload,
+)
+
+# No SMTP host -> the test environment's in-memory email backend
+NO_SMTP = dict.fromkeys(
+    ["host", "port", "use_tls", "username", "password", "from_address"]
+)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Scenario:
+    def __init__(self, name, client, path, method="get", data=None, before=None):
+        self.name = name
+        self.client = client
+        self.path = path
+        self.method = method
+        self.data = data
+        self.before = before
+
+    def request(self):
+        if self.method == "post":
+            response = self.client.post(
+                self.path, self.data, content_type="application/json"
+            )
+        else:
+            response = self.client.get(self.path)
+        if response.streaming:
+            b"".join(response.streaming_content)
+            response.close()
+        return response
+
+
+class Command(BaseCommand):
+    help = "Benchmark the storefront and checkout views (latency, queries, memory)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=30,
+            help="Timed requests per scenario (default: 30)",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Untimed requests per scenario first (default: 3)",
+        )
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=200,
+            help="Synthetic products to seed (default: 200)",
+        )
+        parser.add_argument(
+            "--posts",
+            type=int,
+            default=100,
+            help="Synthetic blog posts to seed (default: 100)",
+        )
+        parser.add_argument(
+            "--orders",
+            type=int,
+            default=20,
+            help="Completed orders for the benchmark customer (default: 20)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=1, help="Random seed (default: 1)"
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            metavar="SCENARIO",
+            help="Run only this scenario (repeatable)",
+        )
+        parser.add_argument(
+            "--output",
+            help='Write results as JSON to this file ("-" for stdout)',
+        )
+        parser.add_argument(
+            "--baseline",
+            help="JSON results from an earlier run to compare against",
+        )
+        parser.add_argument(
+            "--max-slowdown",
+            type=float,
+            default=25.0,
+            help="Allowed p95 slowdown vs the baseline, in percent (default: 25)",
+        )
+        parser.add_argument(
+            "--max-extra-queries",
+            type=int,
+            default=0,
+            help="Allowed extra queries per request vs the baseline (default: 0)",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline: {e}")
+
+        quiet = options["output"] == "-"
+        results = self._run(options, quiet)
+
+        if options["output"] and not quiet:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"\nResults written to {options['output']}")
+        elif quiet:
+            self.stdout.write(json.dumps(results, indent=2))
+
+        if baseline:
+            self._compare(results, baseline, options)
+
+    def _run(self, options, quiet):
+        # Measure with DEBUG off, as in production
+        setup_test_environment(debug=False)
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        media = tempfile.TemporaryDirectory()
+        # ProductDownload files live in SecureStorage, whose location is fixed
+        # at import time - point it at a scratch directory for the run
+        file_field = ProductDownload._meta.get_field("file")
+        real_storage = file_field.storage
+        file_field.storage = FileSystemStorage(location=media.name)
+        try:
+            # The query inspector samples 1% in production; keep it out of
+            # the numbers here
+            with override_settings(QUERY_INSPECTOR_SAMPLE_RATE=0), mock.patch(
+                "shop.emails.ConfigManager.get_email_config", return_value=NO_SMTP
+            ), mock.patch(
+                "shop.webhooks.stripe.Webhook.construct_event",
+                side_effect=lambda *args: self._webhook_event,
+            ):
+                fixtures = self._seed(options)
+                scenarios = self._scenarios(fixtures)
+                if options["only"]:
+                    unknown = set(options["only"]) - {s.name for s in scenarios}
+                    if unknown:
+                        raise CommandError(
+                            f"Unknown scenario(s): {', '.join(sorted(unknown))}"
+                        )
+                    scenarios = [s for s in scenarios if s.name in options["only"]]
+
+                if not quiet:
+                    self.stdout.write(
+                        f"\n{'scenario':<22} {'p50 ms':>8} {'p95 ms':>8} "
+                        f"{'queries':>8} {'peak KB':>9}"
+                    )
+                results = {}
+                for scenario in scenarios:
+                    results[scenario.name] = self._measure(scenario, options)
+                    if not quiet:
+                        self._report(scenario.name, results[scenario.name])
+        finally:
+            file_field.storage = real_storage
+            media.cleanup()
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        return {
+            "meta": {
+                "iterations": options["iterations"],
+                "products": options["products"],
+                "posts": options["posts"],
+                "orders": options["orders"],
+                "seed": options["seed"],
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+            },
+            "scenarios": results,
+        }
+
+    # Data
+
+    def _seed(self, options):
+        LoadDataGenerator(seed=options["seed"]).generate(
+            products=options["products"],
+            posts=options["posts"],
+            pages=20,
+            users=200,
+            orders=2000,
+            reviews=400,
+            wishlists=500,
+        )
+        rng = random.Random(options["seed"])
+        products = list(Product.objects.filter(status="publish").order_by("pk"))
+        Page.objects.create(title="Home", slug="home", template="home")
+
+        download = products[0].downloads.first()
+        download.file.save("bench-download.bin", ContentFile(os.urandom(256 * 1024)))
+
+        customer = get_user_model().objects.create_user(email="bench@example.com")
+        orders = Order.objects.bulk_create(
+            Order(
+                order_id=f"ORD-BENCH{i:06d}",
+                user=customer,
+                email=customer.email,
+                status="completed",
+                paid=True,
+                payment_intent_id=f"pi_bench_done_{i}",
+            )
+            for i in range(options["orders"])
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order, product=product, price_paid_pence=product.price_pence
+            )
+            for order in orders
+            for product in rng.sample(products, min(3, len(products)))
+        )
+        download_item = OrderItem.objects.create(
+            order=orders[0] if orders else Order.objects.create(user=customer),
+            product=products[0],
+            purchased_download=download,
+            price_paid_pence=products[0].price_pence,
+        )
+        rebuild_entitlements()
+
+        return {
+            "customer": customer,
+            "products": products,
+            "category": products[0].category,
+            "post": Post.objects.filter(status="published").order_by("pk").first(),
+            "doc": InfoPage.objects.filter(page_type="doc").order_by("pk").first(),
+            "download": download,
+            "download_item": download_item,
+        }
+
+    def _scenarios(self, fixtures):
+        products = fixtures["products"]
+        anonymous = Client()
+        customer = Client()
+        customer.force_login(fixtures["customer"])
+        for product in products[:3]:
+            customer.post(reverse("shop:cart_add", args=[product.id]))
+
+        download_item = fixtures["download_item"]
+
+        def reset_downloads():
+            DownloadLog.objects.filter(order_item=download_item).delete()
+            OrderItem.objects.filter(pk=download_item.pk).update(download_count=0)
+            Entitlement.objects.filter(order_item=download_item).update(
+                downloads_used=0
+            )
+
+        def pending_order():
+            # Every delivery completes a fresh pending order
+            intent_id = f"pi_bench_{Order.objects.count()}"
+            order = Order.objects.create(
+                user=fixtures["customer"],
+                email=fixtures["customer"].email,
+                payment_intent_id=intent_id,
+            )
+            OrderItem.objects.create(
+                order=order, product=products[1], price_paid_pence=1000
+            )
+            self._webhook_event = {
+                "type": "payment_intent.succeeded",
+                "data": {
+                    "object": stripe.PaymentIntent.construct_from(
+                        {"id": intent_id, "object": "payment_intent"}, None
+                    )
+                },
+            }
+
+        word = products[0].title.split()[0]
+        return [
+            Scenario("home_view", anonymous, reverse("pages:home")),
+            Scenario("product_list", anonymous, reverse("shop:product_list")),
+            Scenario(
+                "product_search",
+                anonymous,
+                f"{reverse('shop:product_list')}?q={word}"
+                f"&category={fixtures['category'].slug}",
+            ),
+            Scenario("product_detail", anonymous, products[0].get_absolute_url()),
+            Scenario("blog_list", anonymous, reverse("blog:list")),
+            Scenario(
+                "post_detail",
+                anonymous,
+                reverse("blog:detail", args=[fixtures["post"].slug]),
+            ),
+            Scenario("info_page", anonymous, fixtures["doc"].get_absolute_url()),
+            Scenario("cart_detail", customer, reverse("shop:cart_detail")),
+            Scenario("purchases", customer, reverse("shop:purchases")),
+            Scenario(
+                "secure_download",
+                customer,
+                reverse(
+                    "shop:secure_download",
+                    args=[download_item.id, fixtures["download"].id],
+                ),
+                before=reset_downloads,
+            ),
+            Scenario(
+                "stripe_webhook",
+                Client(),
+                reverse("shop:stripe_webhook"),
+                method="post",
+                data={},
+                before=pending_order,
+            ),
+        ]
+
+    # Measuring
+
+    def _call(self, scenario):
+        """Serve one request; the scenario's setup runs first, untimed."""
+        if scenario.before:
+            scenario.before()
+        start = time.perf_counter()
+        response = scenario.request()
+        return response, time.perf_counter() - start
+
+    def _measure(self, scenario, options):
+        for _ in range(options["warmup"]):
+            self._call(scenario)
+
+        timings = []
+        for _ in range(max(options["iterations"], 1)):
+            response, elapsed = self._call(scenario)
+            timings.append(elapsed)
+        if response.status_code != 200:
+            raise CommandError(
+                f"{scenario.name}: {scenario.path} returned "
+                f"{response.status_code}, expected 200"
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            self._call(scenario)
+        # Read it now: the next request clears the connection's query log
+        query_count = len(queries)
+
+        tracemalloc.start()
+        try:
+            self._call(scenario)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "p50_ms": round(percentile(timings, 50) * 1000, 2),
+            "p95_ms": round(percentile(timings, 95) * 1000, 2),
+            "mean_ms": round(sum(timings) / len(timings) * 1000, 2),
+            "queries": query_count,
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def _report(self, name, result):
+        self.stdout.write(
+            f"{name:<22} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['queries']:>8} {result['peak_kb']:>9.1f}"
+        )
+
+    def _compare(self, results, baseline, options):
+        self.stdout.write("\nCompared with baseline:")
+        regressions = []
+        for name, result in results["scenarios"].items():
+            old = baseline.get("scenarios", {}).get(name)
+            if not old:
+                self.stdout.write(f"  {name:<22} (not in baseline)")
+                continue
+
+            change = (
+                (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+                if old["p95_ms"]
+                else 0.0
+            )
+            extra_queries = result["queries"] - old["queries"]
+            problems = []
+            if change > options["max_slowdown"]:
+                problems.append(f"p95 {change:+.0f}%")
+            if extra_queries > options["max_extra_queries"]:
+                problems.append(f"{extra_queries:+d} queries")
+
+            line = (
+                f"  {name:<22} p95 {old['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms "
+                f"({change:+.0f}%), queries {old['queries']} -> {result['queries']}"
+            )
+            if problems:
+                regressions.append(f"{name} ({', '.join(problems)})")
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} scenario(s) regressed: {'; '.join(regressions)}"
+            )
+        self.stdout.write(self.style.SUCCESS("\n✓ No regressions against baseline"))
@@ -0,0 +1,151 @@
+"""
+Management command to benchmark concurrent SQLite write throughput.
+Usage: python manage.py benchmark_sqlite_writes [--workers 3] [--writes 200]
+
+Runs the same read-then-write transaction (read a counter, bump it, insert a
+log row - the shape of a download or order write) from several concurrent
+workers against a scratch database, once with SQLite's defaults and once with
+the production profile from ebuilder.db. Your real database is never touched.
+"""
+
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from ebuilder.db import SQLITE_PRAGMAS, is_locked_error
+
+PROFILES = {
+    # What Django gives you out of the box: rollback journal, full fsync,
+    # 5s timeout and deferred transactions.
+    "default": {"pragmas": [], "timeout": 5, "begin": "BEGIN"},
+    # ebuilder's production profile (see DATABASES in settings.py)
+    "tuned": {"pragmas": SQLITE_PRAGMAS, "timeout": 20, "begin": "BEGIN IMMEDIATE"},
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent SQLite write throughput (default vs tuned profile)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=3,
+            help="Number of concurrent writers (default: 3, like gunicorn)",
+        )
+        parser.add_argument(
+            "--writes",
+            type=int,
+            default=200,
+            help="Write transactions per worker (default: 200)",
+        )
+        parser.add_argument(
+            "--profile",
+            choices=["both", *PROFILES],
+            default="both",
+            help="Which profile to run (default: both)",
+        )
+
+    def handle(self, *args, **options):
+        profiles = (
+            list(PROFILES) if options["profile"] == "both" else [options["profile"]]
+        )
+
+        self.stdout.write(
+            f"\nBenchmarking {options['workers']} workers x "
+            f"{options['writes']} write transactions\n"
+        )
+
+        results = {}
+        for name in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                results[name] = self._run_profile(
+                    Path(tmp) / "bench.sqlite3",
+                    PROFILES[name],
+                    options["workers"],
+                    options["writes"],
+                )
+            self._report(name, results[name])
+
+        if len(results) == 2 and results["default"]["rate"]:
+            speedup = results["tuned"]["rate"] / results["default"]["rate"]
+            self.stdout.write(
+                self.style.SUCCESS(f"\nTuned profile: {speedup:.1f}x write throughput")
+            )
+        self.stdout.write("")
+
+    def _connect(self, path, profile):
+        conn = sqlite3.connect(path, timeout=profile["timeout"], isolation_level=None)
+        for pragma in profile["pragmas"]:
+            conn.execute(pragma)
+        return conn
+
+    def _run_profile(self, path, profile, workers, writes):
+        conn = self._connect(path, profile)
+        conn.executescript("""
+            CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                worker INTEGER NOT NULL,
+                created REAL NOT NULL
+            );
+            INSERT INTO counter (id, value) VALUES (1, 0);
+            """)
+        conn.close()
+
+        committed = [0] * workers
+        locked = [0] * workers
+        start_barrier = threading.Barrier(workers)
+
+        def worker(index):
+            conn = self._connect(path, profile)
+            start_barrier.wait()
+            for _ in range(writes):
+                try:
+                    conn.execute(profile["begin"])
+                    (value,) = conn.execute(
+                        "SELECT value FROM counter WHERE id = 1"
+                    ).fetchone()
+                    conn.execute(
+                        "UPDATE counter SET value = ? WHERE id = 1", (value + 1,)
+                    )
+                    conn.execute(
+                        "INSERT INTO log (worker, created) VALUES (?, ?)",
+                        (index, time.time()),
+                    )
+                    conn.execute("COMMIT")
+                    committed[index] += 1
+                except sqlite3.OperationalError as exc:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    if not is_locked_error(exc):
+                        raise
+                    locked[index] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "committed": sum(committed),
+            "locked": sum(locked),
+            "elapsed": elapsed,
+            "rate": sum(committed) / elapsed if elapsed else 0,
+        }
+
+    def _report(self, name, result):
+        self.stdout.write(f"\n[{name}]")
+        self.stdout.write(f"  Committed:       {result['committed']}")
+        style = self.style.ERROR if result["locked"] else self.style.SUCCESS
+        self.stdout.write(style(f"  Locked errors:   {result['locked']}"))
+        self.stdout.write(f"  Elapsed:         {result['elapsed']:.2f}s")
+        self.stdout.write(f"  Throughput:      {result['rate']:.0f} writes/s")
@@ -0,0 +1,45 @@
+"""
+Management command to compact old download logs.
+Usage: python manage.py compact_download_logs [--days 90] [--batch-size 5000]
+
+DownloadLog gets one row per download, forever. This rolls logs older
+than --days (default DOWNLOAD_LOG_RETENTION_DAYS) into daily per-order-item
+DownloadLogSummary rows and deletes them in batches, keeping the table the
+download view checks small. Sales rollups and exports read both, so no
+totals change. Meant to run daily, e.g. from cron:
+docker compose exec -T web python manage.py compact_download_logs
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop.rollups import compact_download_logs
+
+
+class Command(BaseCommand):
+    help = "Roll old download logs into daily summaries and delete them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.DOWNLOAD_LOG_RETENTION_DAYS,
+            help="Keep raw logs for this many days "
+            f"(default: {settings.DOWNLOAD_LOG_RETENTION_DAYS})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Logs compacted per transaction (default: 5000)",
+        )
+
+    def handle(self, *args, **options):
+        compacted = compact_download_logs(
+            days=max(options["days"], 0), batch_size=max(options["batch_size"], 1)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Compacted {compacted} download logs older than {options['days']} days"
+            )
+        )
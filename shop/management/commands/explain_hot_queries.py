@@ -0,0 +1,48 @@
+"""
+Management command to check the query plans of the storefront's hot queries.
+Usage: python manage.py explain_hot_queries [--only product_list ...] [--verbose]
+
+EXPLAINs every query registered in ebuilder/queryplans.py against the
+current database and fails if any would need a full table scan - run it
+after changing a view's filters or a model's indexes (migrate first).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ebuilder.queryplans import check_plans, hot_query_names
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot querysets and fail on full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=hot_query_names(),
+            help="Check only these queries",
+        )
+        parser.add_argument(
+            "--verbose", action="store_true", help="Print every query's plan"
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, plan, scans in check_plans(options["only"]):
+            if scans:
+                failed.append(name)
+                self.stdout.write(
+                    self.style.ERROR(f"  ✗ {name}: full scan of {', '.join(scans)}")
+                )
+            else:
+                self.stdout.write(f"  ✓ {name}")
+            if scans or options["verbose"]:
+                for line in plan:
+                    self.stdout.write(f"      {line}")
+
+        if failed:
+            raise CommandError(
+                f"{len(failed)} hot queries fall back to a full scan: "
+                f"{', '.join(failed)}"
+            )
+        self.stdout.write(self.style.SUCCESS("\n✓ All hot queries use an index"))
@@ -0,0 +1,63 @@
+"""
+Management command to export orders, order items or download logs.
+Usage: python manage.py export_sales orders|order_items|download_logs
+       [--format csv|jsonl] [--since YYYY-MM-DD] [--until YYYY-MM-DD]
+       [--output FILE]
+
+Rows are streamed from the database in chunks and written as they arrive,
+so a full-history export runs in constant memory. --since/--until are
+inclusive and apply to the order date (download date for download_logs).
+Writes to stdout unless --output is given.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.exports import EXPORTS, FORMATS, export_lines
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}' (expected YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Stream an export of orders, order items or download logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(EXPORTS))
+        parser.add_argument(
+            "--format", choices=list(FORMATS), default="csv", help="default: csv"
+        )
+        parser.add_argument("--since", help="First day to include (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Last day to include (YYYY-MM-DD)")
+        parser.add_argument("--output", help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        since = options["since"] and _date(options["since"])
+        until = options["until"] and _date(options["until"])
+        if since and until and since > until:
+            raise CommandError("--since must not be after --until")
+
+        lines = export_lines(
+            options["dataset"], options["format"], start=since, end=until
+        )
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        rows = -1 if options["format"] == "csv" else 0  # CSV header
+        with open(options["output"], "w", newline="", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line)
+                rows += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Exported {max(rows, 0)} {options['dataset']} rows to "
+                f"{options['output']}"
+            )
+        )
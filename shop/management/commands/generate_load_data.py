@@ -0,0 +1,99 @@
+"""
+Management command to fill the database with synthetic load-test data.
+Usage:
+    python manage.py generate_load_data [--orders 100000] [--users 20000]
+    python manage.py generate_load_data --replace   # clear, then generate
+    python manage.py generate_load_data --clear     # only remove generated data
+
+Creates categories, products (with downloads and images), customers, orders
+with items and download logs, reviews, wishlists, blog posts and info pages
+with realistic skew (see ebuilder/loadgen.py). The same --seed always gives
+the same data. Generated rows are tagged so --clear removes exactly them.
+
+Meant for development and staging databases - never run it in production.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ebuilder.loadgen import DEFAULT_COUNTS, LoadDataGenerator
+from shop import catalog_index
+from shop.entitlements import rebuild as rebuild_entitlements
+from shop.recommendations import rebuild as rebuild_recommendations
+from shop.rollups import rebuild as rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = "Generate a production-sized synthetic dataset for load testing"
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_COUNTS.items():
+            parser.add_argument(
+                f"--{name}",
+                type=int,
+                default=default,
+                help=f"Number of {name} to create (default: {default})",
+            )
+        parser.add_argument(
+            "--seed", type=int, default=42, help="Random seed (default: 42)"
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Spread orders and content over this many days (default: 365)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows per bulk insert (default: 5000)",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove previously generated data and stop",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Remove previously generated data, then generate",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"] or options["replace"]:
+            LoadDataGenerator.clear()
+            self.stdout.write(self.style.SUCCESS("✓ Removed generated data"))
+            if options["clear"]:
+                return
+        elif LoadDataGenerator.exists():
+            raise CommandError(
+                "Generated data already exists. Use --replace to regenerate it."
+            )
+
+        counts = {name: options[name] for name in DEFAULT_COUNTS}
+
+        generator = LoadDataGenerator(
+            seed=options["seed"],
+            days=options["days"],
+            chunk_size=options["chunk_size"],
+            log=self.stdout.write,
+        )
+        started = time.perf_counter()
+        written = generator.generate(**counts)
+        # Bulk inserts bypass complete_order and the signals that keep the
+        # sales rollups, entitlements, recommendations and catalog indexes current
+        rebuild_sales_rollups()
+        rebuild_entitlements()
+        rebuild_recommendations()
+        catalog_index.bump()
+        elapsed = time.perf_counter() - started
+
+        for name, count in written.items():
+            self.stdout.write(f"  {name:<16} {count:>10}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✓ Generated {sum(written.values())} rows in {elapsed:.1f}s"
+            )
+        )
@@ -0,0 +1,189 @@
+"""
+Management command to copy an eBuilder SQLite database into PostgreSQL.
+Usage:
+    DATABASE_URL=postgresql://... python manage.py migrate
+    DATABASE_URL=postgresql://... python manage.py migrate_sqlite_to_postgres
+
+Streams every table from the SQLite file into the (already migrated)
+PostgreSQL database configured as 'default': models are copied in
+foreign-key-safe order, read with chunked iterators and written with chunked
+bulk inserts, then the PostgreSQL sequences are reset past the copied ids.
+
+Encrypted settings are decrypted and re-encrypted on the way through, so the
+same ENCRYPTION_KEY must be configured.
+"""
+
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+from ebuilder.db import preserve_timestamps
+
+SOURCE_ALIAS = "sqlite_source"
+
+
+def fk_safe_order(models):
+    """Order models so every model comes after the models it references."""
+    remaining = {model: set() for model in models}
+    for model in models:
+        for field in model._meta.concrete_fields:
+            related = field.related_model
+            if field.remote_field and related is not model and related in remaining:
+                remaining[model].add(related)
+
+    ordered = []
+    while remaining:
+        ready = [m for m, deps in remaining.items() if not deps]
+        if not ready:
+            # Reference cycle - FK constraints are deferred until commit on
+            # PostgreSQL, so any order works for what's left.
+            ready = list(remaining)
+        ready.sort(key=lambda m: m._meta.label)
+        for model in ready:
+            ordered.append(model)
+            del remaining[model]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return ordered
+
+
+class Command(BaseCommand):
+    help = "Copy all data from the SQLite database into the PostgreSQL database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=str(settings.SQLITE_PATH),
+            help=f"SQLite database file to copy from (default: {settings.SQLITE_PATH})",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Target PostgreSQL database alias (default: default)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows per read chunk and bulk insert (default: 2000)",
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="Do not ask for confirmation before replacing target data",
+        )
+
+    def handle(self, *args, **options):
+        # Validate the source first: a mistyped path must never get as far
+        # as flushing the target
+        self._add_source_connection(options["source"])
+        source = connections[SOURCE_ALIAS]
+
+        target_alias = options["database"]
+        target = connections[target_alias]
+        if target.vendor != "postgresql":
+            raise CommandError(
+                f"Database '{target_alias}' is {target.vendor}, not PostgreSQL. "
+                "Set DATABASE_URL=postgresql://... first."
+            )
+
+        self._check_migrations(source, target)
+
+        models = fk_safe_order(
+            [
+                model
+                for model in apps.get_models(include_auto_created=True)
+                if model._meta.managed
+                and not model._meta.proxy
+                and router.allow_migrate_model(target_alias, model)
+            ]
+        )
+
+        if options["interactive"]:
+            confirm = input(
+                f"This will REPLACE all data in the PostgreSQL database "
+                f"'{target.settings_dict['NAME']}' with {options['source']}.\n"
+                "Type 'yes' to continue: "
+            )
+            if confirm != "yes":
+                raise CommandError("Migration cancelled.")
+
+        chunk_size = options["chunk_size"]
+        with transaction.atomic(using=target_alias):
+            self._flush(target, models)
+
+            for model in models:
+                copied = self._copy_model(model, target_alias, chunk_size)
+                self.stdout.write(f"  {model._meta.label:<40} {copied:>10} rows")
+
+            with target.cursor() as cursor:
+                for sql in target.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(sql)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"\n✓ Copied {len(models)} tables to PostgreSQL")
+        )
+
+    def _add_source_connection(self, path):
+        # sqlite3 would silently create an empty database at a wrong path
+        if not Path(path).is_file():
+            raise CommandError(f"SQLite database {path} does not exist")
+        databases = {
+            **connections.settings,
+            SOURCE_ALIAS: {"ENGINE": "django.db.backends.sqlite3", "NAME": path},
+        }
+        connections.settings[SOURCE_ALIAS] = connections.configure_settings(databases)[
+            SOURCE_ALIAS
+        ]
+        try:
+            connections[SOURCE_ALIAS].ensure_connection()
+        except Exception as e:
+            raise CommandError(f"Could not open SQLite database {path}: {e}")
+
+    def _check_migrations(self, source, target):
+        source_applied = set(MigrationRecorder(source).applied_migrations())
+        if not source_applied:
+            raise CommandError(
+                f"{source.settings_dict['NAME']} has no applied migrations - "
+                "is it an eBuilder database?"
+            )
+        target_applied = set(MigrationRecorder(target).applied_migrations())
+        missing = source_applied - target_applied
+        if missing:
+            raise CommandError(
+                f"{len(missing)} migrations applied to SQLite are missing on "
+                "PostgreSQL. Run 'python manage.py migrate' against PostgreSQL first."
+            )
+
+    def _flush(self, target, models):
+        """Empty the target tables (post_migrate creates some default rows)."""
+        tables = [model._meta.db_table for model in models]
+        sql_list = target.ops.sql_flush(
+            no_style(), tables, reset_sequences=False, allow_cascade=True
+        )
+        target.ops.execute_sql_flush(sql_list)
+
+    def _copy_model(self, model, target_alias, chunk_size):
+        rows = model._base_manager.using(SOURCE_ALIAS).order_by("pk")
+        manager = model._base_manager.using(target_alias)
+
+        copied = 0
+        batch = []
+        with preserve_timestamps(model):
+            for obj in rows.iterator(chunk_size=chunk_size):
+                batch.append(obj)
+                if len(batch) >= chunk_size:
+                    manager.bulk_create(batch)
+                    copied += len(batch)
+                    batch = []
+            if batch:
+                manager.bulk_create(batch)
+                copied += len(batch)
+        return copied
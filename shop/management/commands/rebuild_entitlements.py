@@ -0,0 +1,21 @@
+"""
+Management command to recreate customer entitlements from completed orders.
+Usage: python manage.py rebuild_entitlements
+
+Entitlements are granted as orders complete and updated as customers
+download and review. Run this after editing or reassigning orders by hand,
+or after bulk imports that bypass complete_order (e.g. generate_load_data
+runs it itself). Download counts are taken from OrderItem.download_count.
+"""
+
+from django.core.management.base import BaseCommand
+
+from shop.entitlements import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recreate customer entitlements from completed orders"
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"✓ Rebuilt {count} entitlements"))
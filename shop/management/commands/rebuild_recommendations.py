@@ -0,0 +1,20 @@
+"""
+Management command to recompute the "customers also bought" graph.
+Usage: python manage.py rebuild_recommendations
+
+Completed orders refresh their own products' recommendations as they
+come in; run this nightly to fold in wishlist changes and to repair the
+graph after edits or bulk imports (generate_load_data runs it itself).
+"""
+
+from django.core.management.base import BaseCommand
+
+from shop.recommendations import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the "customers also bought" product recommendations'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"✓ Stored {count} recommendations"))
@@ -0,0 +1,40 @@
+"""
+Management command to recompute the daily sales rollups.
+Usage: python manage.py rebuild_sales_rollups [--since YYYY-MM-DD]
+       [--until YYYY-MM-DD]
+
+The rollups normally update themselves as orders complete and downloads
+happen. Run this once after upgrading (to backfill history), after bulk
+imports such as generate_load_data, or after editing orders by hand.
+Without --since/--until every day is rebuilt.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.rollups import rebuild
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}' (expected YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = "Recompute daily sales rollups from orders and download logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        since = options["since"] and _date(options["since"])
+        until = options["until"] and _date(options["until"])
+        if since and until and since > until:
+            raise CommandError("--since must not be after --until")
+
+        rows = rebuild(start=since, end=until)
+        self.stdout.write(self.style.SUCCESS(f"✓ Rebuilt {rows} daily sales rows"))
@@ -0,0 +1,82 @@
+"""
+Management command to re-verify external product media URLs.
+Usage: python manage.py verify_media_urls [--batch-size 50] [--force]
+
+Meant to run periodically (e.g. a daily cron job:
+docker compose exec -T web python manage.py verify_media_urls). Every
+external image/preview URL used by a product is checked in batches of
+concurrent probes; URLs with a passing check younger than
+MEDIA_CHECK_MAX_AGE_DAYS are skipped unless --force is given. Products
+whose media no longer validates are listed, and checks for URLs no product
+uses any more are deleted.
+"""
+
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from shop.media_checks import PRODUCT_MEDIA_FIELDS, check_urls
+from shop.models import MediaURLCheck, Product
+
+
+class Command(BaseCommand):
+    help = "Re-verify external product image/preview URLs in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="URLs probed concurrently per batch (default: 50)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Probe every URL, even those checked recently",
+        )
+
+    def handle(self, *args, **options):
+        # url -> [(product, field)]
+        usage = defaultdict(list)
+        products = Product.objects.filter(
+            ~Q(external_image_url="") & Q(external_image_url__isnull=False)
+            | ~Q(external_preview_url="") & Q(external_preview_url__isnull=False)
+        ).only("title", *PRODUCT_MEDIA_FIELDS)
+        for product in products.iterator():
+            for field in PRODUCT_MEDIA_FIELDS:
+                url = getattr(product, field)
+                if url:
+                    usage[url].append((product, field))
+
+        deleted, _ = MediaURLCheck.objects.exclude(url__in=list(usage)).delete()
+
+        urls = list(usage)
+        batch_size = max(options["batch_size"], 1)
+        broken = 0
+        for start in range(0, len(urls), batch_size):
+            checks = check_urls(urls[start : start + batch_size], options["force"])
+            for url, check in checks.items():
+                for product, field in usage[url]:
+                    message = PRODUCT_MEDIA_FIELDS[field](check)
+                    if message:
+                        broken += 1
+                        self.stdout.write(
+                            self.style.ERROR(
+                                f"  {product.title} ({field}): {message} - {url}"
+                            )
+                        )
+            self.stdout.write(
+                f"  checked {min(start + batch_size, len(urls))}/{len(urls)}"
+            )
+
+        if deleted:
+            self.stdout.write(f"Removed {deleted} checks for URLs no longer in use")
+        if broken:
+            self.stdout.write(
+                self.style.WARNING(f"\n{broken} product media URL(s) failed")
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"\n✓ All {len(urls)} external media URLs are valid")
+            )
@@ -0,0 +1,158 @@
+# shop/media_checks.py
+"""
+Validation of external product media URLs (external_image_url and
+external_preview_url).
+
+check_urls() is used by the product admin form and by the
+verify_media_urls command. It:
+
+- reuses the stored MediaURLCheck for URLs that passed within
+  MEDIA_CHECK_MAX_AGE_DAYS, so unchanged URLs aren't probed again
+- probes everything else concurrently, one HEAD each (hosts that refuse
+  HEAD get a one-byte ranged GET), each capped at MEDIA_CHECK_TIMEOUT
+  seconds in total - a slow host can't hang the admin
+- stores the results
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.utils import timezone
+
+from ebuilder.metrics import timed
+from .models import MediaURLCheck
+
+logger = logging.getLogger("shop")
+
+IMAGE_TYPES = ("image/jpeg", "image/jpg", "image/png", "image/webp")
+PREVIEW_TYPES = ("application/pdf",)
+
+MAX_CONCURRENCY = 10
+REFUSES_HEAD = (403, 405, 501)
+RESULT_FIELDS = ["ok", "status_code", "content_type", "content_length", "error"]
+
+
+def _content_length(response):
+    # A ranged GET reports the full size as "Content-Range: bytes 0-0/<size>"
+    total = response.headers.get("content-range", "").rpartition("/")[2]
+    value = total if response.status_code == 206 else None
+    value = value or response.headers.get("content-length")
+    return int(value) if value and value.isdigit() else None
+
+
+async def _fetch_headers(client, url):
+    response = await client.head(url)
+    if response.status_code in REFUSES_HEAD:
+        async with client.stream(
+            "GET", url, headers={"Range": "bytes=0-0"}
+        ) as response:
+            pass  # headers are all we need
+    return response
+
+
+async def _probe(client, semaphore, url):
+    result = dict.fromkeys(RESULT_FIELDS)
+    result.update(ok=False, content_type="", error="")
+    async with semaphore:
+        try:
+            with timed("media", "probe"):
+                response = await asyncio.wait_for(
+                    _fetch_headers(client, url), settings.MEDIA_CHECK_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            result["error"] = f"Timed out after {settings.MEDIA_CHECK_TIMEOUT}s"
+        except httpx.HTTPError as e:
+            result["error"] = (str(e) or type(e).__name__)[:255]
+        else:
+            content_type = response.headers.get("content-type", "")
+            result.update(
+                ok=response.is_success,
+                status_code=response.status_code,
+                content_type=content_type.split(";")[0].strip().lower()[:100],
+                content_length=_content_length(response),
+            )
+    if result["error"]:
+        logger.warning(f"Media URL check failed for {url}: {result['error']}")
+    return url, result
+
+
+async def probe_urls(urls):
+    """Probe every URL concurrently; returns {url: result dict}."""
+    async with httpx.AsyncClient(
+        timeout=settings.MEDIA_CHECK_TIMEOUT,
+        follow_redirects=True,
+        headers={"User-Agent": "eBuilder media check"},
+    ) as client:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        return dict(
+            await asyncio.gather(*(_probe(client, semaphore, url) for url in urls))
+        )
+
+
+def check_urls(urls, force=False):
+    """
+    Return {url: MediaURLCheck} for the given URLs, probing only those
+    without a recent passing check (or all of them with force=True).
+    """
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+
+    fresh_after = timezone.now() - timedelta(days=settings.MEDIA_CHECK_MAX_AGE_DAYS)
+    checks = {check.url: check for check in MediaURLCheck.objects.filter(url__in=urls)}
+    stale = [
+        url
+        for url in urls
+        if force
+        or url not in checks
+        or not checks[url].ok
+        or checks[url].checked_at < fresh_after
+    ]
+    if not stale:
+        return checks
+
+    results = async_to_sync(probe_urls)(stale)
+    now = timezone.now()
+    probed = [
+        MediaURLCheck(url=url, checked_at=now, **result)
+        for url, result in results.items()
+    ]
+    MediaURLCheck.objects.bulk_create(
+        probed,
+        update_conflicts=True,
+        unique_fields=["url"],
+        update_fields=[*RESULT_FIELDS, "checked_at"],
+    )
+    checks.update((check.url, check) for check in probed)
+    return checks
+
+
+def image_url_error(check):
+    """Why this check rules the URL out as a product image, or None."""
+    if check.error or not check.ok:
+        return "Could not validate image URL"
+    if not check.content_type.startswith("image/"):
+        return "URL must point to an image file"
+    if check.content_type not in IMAGE_TYPES:
+        return "Only JPG, PNG and WebP images are allowed"
+    return None
+
+
+def preview_url_error(check):
+    """Why this check rules the URL out as a preview file, or None."""
+    if check.error or not check.ok:
+        return "Could not validate preview URL"
+    if check.content_type not in PREVIEW_TYPES:
+        return "URL must point to a PDF file"
+    return None
+
+
+# Product field -> validator
+PRODUCT_MEDIA_FIELDS = {
+    "external_image_url": image_url_error,
+    "external_preview_url": preview_url_error,
+}
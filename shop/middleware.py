@@ -0,0 +1,29 @@
+# shop/middleware.py
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+
+class CartCookieMiddleware(MiddlewareMixin):
+    """
+    Writes the signed cart cookie when SignedCookieCartStorage changed
+    the cart during the request. Does nothing for session-backed carts.
+    Works under both WSGI and ASGI.
+    """
+
+    def process_response(self, request, response):
+        if not hasattr(request, "_cart_cookie_value"):
+            return response
+
+        value = request._cart_cookie_value
+        if value:
+            response.set_cookie(
+                settings.CART_COOKIE_NAME,
+                value,
+                max_age=settings.CART_COOKIE_MAX_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        else:
+            response.delete_cookie(settings.CART_COOKIE_NAME, samesite="Lax")
+        return response
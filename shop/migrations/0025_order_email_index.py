@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0024_remove_orderitem_downloads_remaining_downloadlog"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="email",
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0025_order_email_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaURLCheck",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=500, unique=True)),
+                (
+                    "ok",
+                    models.BooleanField(
+                        default=False, help_text="Last probe got a 2xx response"
+                    ),
+                ),
+                ("status_code", models.PositiveIntegerField(blank=True, null=True)),
+                ("content_type", models.CharField(blank=True, max_length=100)),
+                (
+                    "content_length",
+                    models.PositiveBigIntegerField(blank=True, null=True),
+                ),
+                ("error", models.CharField(blank=True, max_length=255)),
+                ("checked_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "verbose_name": "Media URL check",
+            },
+        ),
+    ]
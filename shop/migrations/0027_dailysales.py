@@ -0,0 +1,64 @@
+# Generated by Django 5.2.9 on 2026-10-19 06:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0026_mediaurlcheck"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("revenue_pence", models.PositiveBigIntegerField(default=0)),
+                ("units", models.PositiveIntegerField(default=0)),
+                ("orders", models.PositiveIntegerField(default=0)),
+                ("downloads", models.PositiveIntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="shop.category",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="shop.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "daily sales",
+                "ordering": ["-date", "product"],
+                "indexes": [
+                    models.Index(
+                        fields=["date", "category"], name="shop_dailys_date_5e26f8_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "product"), name="unique_daily_sales_product"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.9 on 2026-10-19 06:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0027_dailysales"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DownloadLogSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(db_index=True)),
+                ("downloads", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "download log summaries",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="downloadlog",
+            index=models.Index(
+                fields=["order_item", "user", "downloaded_at"],
+                name="downloadlog_recent_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="downloadlog",
+            index=models.Index(fields=["downloaded_at"], name="downloadlog_date_idx"),
+        ),
+        migrations.AddField(
+            model_name="downloadlogsummary",
+            name="order_item",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="shop.orderitem"
+            ),
+        ),
+        migrations.AddField(
+            model_name="downloadlogsummary",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="downloadlogsummary",
+            constraint=models.UniqueConstraint(
+                fields=("order_item", "user", "date"),
+                name="unique_download_summary_day",
+            ),
+        ),
+    ]
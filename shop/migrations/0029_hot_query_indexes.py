@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-19 06:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0028_downloadlog_compaction"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="payment_intent_id",
+            field=models.CharField(blank=True, db_index=True, max_length=250),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "status", "created"], name="order_user_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["product", "order"], name="orderitem_product_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["status", "is_active", "order", "created"],
+                name="product_listing_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "status", "is_active"],
+                name="product_category_listing_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wishlist",
+            index=models.Index(
+                fields=["user", "created"], name="wishlist_user_created_idx"
+            ),
+        ),
+    ]
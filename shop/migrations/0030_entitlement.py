@@ -0,0 +1,121 @@
+# Generated by Django 5.2.9 on 2026-10-19 06:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def grant_existing_purchases(apps, schema_editor):
+    """Downloads are authorised by entitlements, so backfill past orders."""
+    Entitlement = apps.get_model("shop", "Entitlement")
+    OrderItem = apps.get_model("shop", "OrderItem")
+    ProductReview = apps.get_model("shop", "ProductReview")
+
+    items = OrderItem.objects.filter(
+        order__status="completed", order__user__isnull=False
+    ).values(
+        "id",
+        "product_id",
+        "purchased_download_id",
+        "download_count",
+        "order__user_id",
+        "order__created",
+        "product__download_limit",
+    )
+    batch = []
+    for item in items.iterator(chunk_size=2000):
+        batch.append(
+            Entitlement(
+                user_id=item["order__user_id"],
+                product_id=item["product_id"],
+                order_item_id=item["id"],
+                download_id=item["purchased_download_id"],
+                downloads_used=item["download_count"],
+                download_limit=item["product__download_limit"],
+                granted_at=item["order__created"],
+            )
+        )
+        if len(batch) >= 2000:
+            Entitlement.objects.bulk_create(batch)
+            batch = []
+    Entitlement.objects.bulk_create(batch)
+    Entitlement.objects.filter(
+        Exists(
+            ProductReview.objects.filter(
+                user=OuterRef("user"), product=OuterRef("product")
+            )
+        )
+    ).update(reviewed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0029_hot_query_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Entitlement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("downloads_used", models.PositiveIntegerField(default=0)),
+                ("download_limit", models.PositiveIntegerField(default=5)),
+                ("reviewed", models.BooleanField(default=False)),
+                ("granted_at", models.DateTimeField()),
+                (
+                    "download",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Purchased variant; empty means every file of the product",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="shop.productdownload",
+                    ),
+                ),
+                (
+                    "order_item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entitlement",
+                        to="shop.orderitem",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entitlements",
+                        to="shop.product",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entitlements",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-granted_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "product"], name="entitlement_user_product_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(grant_existing_purchases, migrations.RunPython.noop),
+    ]
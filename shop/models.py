@@ -153,6 +153,19 @@ class Product(models.Model):
 
     class Meta:
         ordering = ["order", "-created"]
+        indexes = [
+            # Storefront listings (see ebuilder/queryplans.py). status leads:
+            # SQLite filters is_active=True as a bare column, which an
+            # index can't seek on
+            models.Index(
+                fields=["status", "is_active", "order", "created"],
+                name="product_listing_idx",
+            ),
+            models.Index(
+                fields=["category", "status", "is_active"],
+                name="product_category_listing_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -227,12 +240,16 @@ class Product(models.Model):
     @property
     def average_rating(self):
         """Calculate average rating from all reviews"""
+        if hasattr(self, "rating_avg"):  # annotated (shop.loaders)
+            return self.rating_avg or 0
         result = self.reviews.aggregate(avg=Avg("rating"))
         return result["avg"] or 0
 
     @property
     def total_reviews(self):
         """Count total number of reviews"""
+        if hasattr(self, "review_count"):  # annotated (shop.loaders)
+            return self.review_count
         return self.reviews.count()
 
     def can_review(self, user):
@@ -240,16 +257,16 @@ class Product(models.Model):
         if user.is_superuser:
             return True
 
-        # For regular users, check purchase and review status
-        has_purchased = OrderItem.objects.filter(
-            order__user=user, product=self, order__status="completed"
+        # For regular users: bought it and not reviewed it yet
+        return Entitlement.objects.filter(
+            user=user, product=self, reviewed=False
         ).exists()
-        has_reviewed = self.reviews.filter(user=user).exists()
-        return has_purchased and not has_reviewed
 
     @property
     def has_downloads(self):
         """Check if product has any downloadable files"""
+        if "downloads" in getattr(self, "_prefetched_objects_cache", {}):
+            return bool(self.downloads.all())
         return self.downloads.exists()
 
 
@@ -312,15 +329,21 @@ class Order(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
     )
-    email = models.EmailField()
+    email = models.EmailField(db_index=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     paid = models.BooleanField(default=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
-    payment_intent_id = models.CharField(max_length=250, blank=True)
+    payment_intent_id = models.CharField(max_length=250, blank=True, db_index=True)
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            # A customer's purchases / order history
+            models.Index(
+                fields=["user", "status", "created"], name="order_user_status_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.order_id}"
@@ -356,6 +379,14 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     download_count = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # "Has this user bought this product?" (product_detail, can_review)
+            models.Index(
+                fields=["product", "order"], name="orderitem_product_order_idx"
+            ),
+        ]
+
     def __str__(self):
         return str(self.id)
 
@@ -390,6 +421,52 @@ class OrderItem(models.Model):
         return max(self.product.download_limit - self.download_count, 0)
 
 
+class Entitlement(models.Model):
+    """
+    What a customer owns: one row per order item of a completed order,
+    with its download allowance and whether the customer has reviewed the
+    product. Denormalised from Order/OrderItem/ProductReview so ownership,
+    download and review checks are one indexed lookup; maintained by
+    shop/entitlements.py, rebuilt with `manage.py rebuild_entitlements`.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="entitlements", on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        Product, related_name="entitlements", on_delete=models.CASCADE
+    )
+    order_item = models.OneToOneField(
+        OrderItem, related_name="entitlement", on_delete=models.CASCADE
+    )
+    download = models.ForeignKey(
+        ProductDownload,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        help_text="Purchased variant; empty means every file of the product",
+    )
+    downloads_used = models.PositiveIntegerField(default=0)
+    download_limit = models.PositiveIntegerField(default=5)
+    reviewed = models.BooleanField(default=False)
+    granted_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-granted_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "product"], name="entitlement_user_product_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} owns {self.product}"
+
+    @property
+    def downloads_left(self):
+        return max(self.download_limit - self.downloads_used, 0)
+
+
 class ProductReview(models.Model):
     RATING_CHOICES = [
         (1, "1"),
@@ -416,9 +493,7 @@ class ProductReview(models.Model):
 
     @property
     def is_verified_purchase(self):
-        return OrderItem.objects.filter(
-            order__user=self.user, product=self.product, order__status="completed"
-        ).exists()
+        return Entitlement.objects.filter(user=self.user, product=self.product).exists()
 
 
 class Purchase(models.Model):
@@ -441,6 +516,9 @@ class WishList(models.Model):
     class Meta:
         unique_together = ("user", "product")
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["user", "created"], name="wishlist_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} → {self.product}"
@@ -590,3 +668,121 @@ class DownloadLog(models.Model):
     order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     downloaded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Duplicate-download check in secure_download
+            models.Index(
+                fields=["order_item", "user", "downloaded_at"],
+                name="downloadlog_recent_idx",
+            ),
+            # Date-range reporting and compaction
+            models.Index(fields=["downloaded_at"], name="downloadlog_date_idx"),
+        ]
+
+
+class DownloadLogSummary(models.Model):
+    """
+    Downloads per order item, user and day for logs older than
+    DOWNLOAD_LOG_RETENTION_DAYS; the raw DownloadLog rows are deleted once
+    counted here. See compact_download_logs() in shop/rollups.py.
+    """
+
+    order_item = models.ForeignKey(OrderItem, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    date = models.DateField(db_index=True)
+    downloads = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "download log summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order_item", "user", "date"],
+                name="unique_download_summary_day",
+            )
+        ]
+
+
+class MediaURLCheck(models.Model):
+    """
+    Last probe of an external media URL (product images/previews), so
+    unchanged URLs aren't fetched again on every admin save. See
+    shop/media_checks.py.
+    """
+
+    url = models.URLField(max_length=500, unique=True)
+    ok = models.BooleanField(default=False, help_text="Last probe got a 2xx response")
+    status_code = models.PositiveIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    content_length = models.PositiveBigIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    checked_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Media URL check"
+
+    def __str__(self):
+        return self.url
+
+
+class DailySales(models.Model):
+    """
+    Per-day, per-product sales and download totals, kept up to date as
+    orders complete and downloads are logged (see shop/rollups.py) so
+    reports never aggregate the order history. Rebuild with
+    `manage.py rebuild_sales_rollups`.
+    """
+
+    date = models.DateField()
+    product = models.ForeignKey(
+        Product, related_name="daily_sales", on_delete=models.CASCADE
+    )
+    category = models.ForeignKey(
+        Category, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    revenue_pence = models.PositiveBigIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    downloads = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "daily sales"
+        ordering = ["-date", "product"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "product"], name="unique_daily_sales_product"
+            )
+        ]
+        indexes = [models.Index(fields=["date", "category"])]
+
+    def __str__(self):
+        return f"{self.product} on {self.date}"
+
+
+class ProductRecommendation(models.Model):
+    """
+    Precomputed "customers also bought" neighbours: the top-scoring
+    products bought (or wishlisted) together with `product`, best first.
+    Maintained by shop/recommendations.py as orders complete, rebuilt with
+    `manage.py rebuild_recommendations`.
+    """
+
+    product = models.ForeignKey(
+        Product, related_name="recommendations", on_delete=models.CASCADE
+    )
+    recommended = models.ForeignKey(
+        Product, related_name="recommended_for", on_delete=models.CASCADE
+    )
+    score = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ["product", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "recommended"], name="unique_recommendation"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product} -> {self.recommended} ({self.score})"
@@ -0,0 +1,94 @@
+# shop/orders.py
+"""
+Order lifecycle shared by the checkout views and the Stripe webhook.
+
+The checkout page keeps a *pending* order in step with the cart for its
+PaymentIntent. Whichever arrives first - the webhook or the success page's
+fallback check with Stripe - completes it; complete_order() is idempotent,
+so the other one finds the work already done.
+"""
+
+import logging
+
+from django.db.models import F
+from django.utils import timezone
+
+from ebuilder.db import retry_on_locked
+from . import entitlements
+from .models import Order, OrderItem, Product
+from .signals import order_completed
+
+logger = logging.getLogger("shop")
+
+# Orders in these states can still become "completed" (a failed card can be
+# retried against the same PaymentIntent).
+OPEN_STATUSES = ("pending", "failed")
+
+
+@retry_on_locked
+def sync_pending_order(user, cart, payment_intent_id):
+    """
+    Create or refresh the pending order for a PaymentIntent so its items
+    match the cart. Returns the order, or None if it is already completed.
+    """
+    order, created = Order.objects.get_or_create(
+        payment_intent_id=payment_intent_id,
+        defaults={"user": user, "email": user.email, "status": "pending"},
+    )
+    if not created:
+        if order.status not in OPEN_STATUSES:
+            return None
+        order.items.all().delete()
+
+    OrderItem.objects.bulk_create(
+        [
+            OrderItem(
+                order=order,
+                product=item["product"],
+                # Cart only holds downloads that exist, so the prefetched object is safe
+                purchased_download=item["download"],
+                price_paid_pence=int(item["price"] * 100),
+                quantity=item["quantity"],
+            )
+            for item in cart
+        ]
+    )
+    return order
+
+
+@retry_on_locked
+def complete_order(payment_intent_id):
+    """
+    Mark the order for a succeeded PaymentIntent as paid.
+
+    Returns the order if this call completed it, None if there is no open
+    order (unknown intent, or someone else completed it first). Only the
+    caller that gets the order back should send the confirmation emails.
+    """
+    completed = Order.objects.filter(
+        payment_intent_id=payment_intent_id, status__in=OPEN_STATUSES
+    ).update(status="completed", paid=True, updated=timezone.now())
+    if not completed:
+        return None
+
+    order = Order.objects.get(payment_intent_id=payment_intent_id)
+
+    # Update purchase counts
+    for item in order.items.all():
+        Product.objects.filter(pk=item.product_id).update(
+            purchase_count=F("purchase_count") + item.quantity
+        )
+
+    entitlements.grant(order)
+
+    logger.info(f"Order {order.order_id} completed")
+    order_completed.send(sender=Order, order=order)
+    return order
+
+
+@retry_on_locked
+def fail_order(payment_intent_id):
+    """Mark the pending order for a PaymentIntent as failed."""
+    return Order.objects.filter(
+        payment_intent_id=payment_intent_id, status="pending"
+    ).update(status="failed", updated=timezone.now())
@@ -0,0 +1,159 @@
+# shop/recommendations.py
+"""
+"Customers also bought": a product co-occurrence graph stored as the top
+RECOMMENDATIONS_PER_PRODUCT neighbours of each product
+(ProductRecommendation).
+
+Two products score ORDER_WEIGHT for every completed order containing
+both, plus WISHLIST_WEIGHT for every wishlist containing both.
+
+- rebuild() computes the whole graph in one pass over the order items and
+  wishlists - run nightly (`manage.py rebuild_recommendations`)
+- record_order() adds a newly completed order's pairs to the stored
+  scores (order_completed signal, inside complete_order's transaction),
+  so purchases show up without waiting for the nightly job. It reads only
+  the order's products' stored rows - a fixed number of queries however
+  long the order history. Only stored neighbours carry their score
+  forward: a pair outside a product's top RECOMMENDATIONS_PER_PRODUCT
+  restarts from this order's weight until the rebuild. Wishlist changes
+  wait for the rebuild.
+- related_products() is what the product page reads: one query for the
+  ids, resolved through the catalog index (shop/catalog_index.py) and
+  padded with same-category products
+"""
+
+import logging
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+
+from django.db import transaction
+
+from .catalog_index import get_index
+from .models import OrderItem, ProductRecommendation, WishList
+
+logger = logging.getLogger("shop")
+
+RECOMMENDATIONS_PER_PRODUCT = 12
+ORDER_WEIGHT = 2
+WISHLIST_WEIGHT = 1
+# Pairs grow quadratically; larger baskets (bulk/test orders) are trimmed
+MAX_BASKET = 50
+
+
+def _baskets(rows):
+    """(basket id, product id) rows ordered by basket -> product id sets."""
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        products = sorted({product_id for _, product_id in group})
+        yield products[:MAX_BASKET]
+
+
+def _order_rows(orders=None):
+    items = OrderItem.objects.filter(order__status="completed")
+    if orders is not None:
+        items = items.filter(order__in=orders)
+    return items.values_list("order_id", "product_id").order_by("order_id")
+
+
+def _wishlist_rows(users=None):
+    wishlists = WishList.objects.all()
+    if users is not None:
+        wishlists = wishlists.filter(user__in=users)
+    return wishlists.values_list("user_id", "product_id").order_by("user_id")
+
+
+def _scores(order_rows, wishlist_rows, only=None):
+    """{product id: Counter(neighbour id -> score)}, for `only` if given."""
+    scores = defaultdict(Counter)
+    for rows, weight in ((order_rows, ORDER_WEIGHT), (wishlist_rows, WISHLIST_WEIGHT)):
+        for basket in _baskets(rows):
+            for a, b in combinations(basket, 2):
+                if only is None or a in only:
+                    scores[a][b] += weight
+                if only is None or b in only:
+                    scores[b][a] += weight
+    return scores
+
+
+def _rows(product_id, neighbours):
+    return [
+        ProductRecommendation(
+            product_id=product_id, recommended_id=other, score=score, rank=rank
+        )
+        for rank, (other, score) in enumerate(
+            # Ties go to the older product so rebuilds are deterministic
+            sorted(neighbours.items(), key=lambda pair: (-pair[1], pair[0]))[
+                :RECOMMENDATIONS_PER_PRODUCT
+            ]
+        )
+    ]
+
+
+def rebuild(batch_size=2000):
+    """Recompute the whole graph. Returns the number of rows stored."""
+    scores = _scores(
+        _order_rows().iterator(chunk_size=batch_size),
+        _wishlist_rows().iterator(chunk_size=batch_size),
+    )
+    count = 0
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        batch = []
+        for product_id, neighbours in scores.items():
+            batch.extend(_rows(product_id, neighbours))
+            if len(batch) >= batch_size:
+                count += len(ProductRecommendation.objects.bulk_create(batch))
+                batch = []
+        count += len(ProductRecommendation.objects.bulk_create(batch))
+    logger.info(f"Rebuilt {count} product recommendations")
+    return count
+
+
+def record_order(order):
+    """Add this order's product pairs to the stored scores."""
+    basket = sorted(set(order.items.values_list("product_id", flat=True)))
+    basket = basket[:MAX_BASKET]
+    if len(basket) < 2:
+        return
+    scores = defaultdict(Counter)
+    for product_id, other, score in ProductRecommendation.objects.filter(
+        product_id__in=basket
+    ).values_list("product_id", "recommended_id", "score"):
+        scores[product_id][other] = score
+    for a, b in combinations(basket, 2):
+        scores[a][b] += ORDER_WEIGHT
+        scores[b][a] += ORDER_WEIGHT
+    with transaction.atomic():
+        ProductRecommendation.objects.filter(product_id__in=basket).delete()
+        ProductRecommendation.objects.bulk_create(
+            [row for pid in basket for row in _rows(pid, scores[pid])]
+        )
+
+
+def recommended_ids(product):
+    return ProductRecommendation.objects.filter(product=product).values_list(
+        "recommended_id", flat=True
+    )
+
+
+def related_products(product, limit=3):
+    """
+    Listed products to show alongside `product`: its recommendations best
+    first, then products from the same category. One query for the ids;
+    the products come from the catalog index.
+
+    Returns (products, whether any of them are recommendations).
+    """
+    index = get_index()
+    available = ("publish", "full")
+    recommended = [
+        other
+        for other in index.get_many(recommended_ids(product).order_by("rank"))
+        if other.status in available
+    ]
+    seen = {product.id} | {other.id for other in recommended}
+    same_category = [
+        other
+        for other in index.listing(category_id=product.category_id, statuses=available)
+        if other.id not in seen
+    ]
+    return (recommended + same_category)[:limit], bool(recommended)
@@ -0,0 +1,268 @@
+# shop/rollups.py
+"""
+Daily sales rollups (DailySales): revenue, units, orders and downloads per
+product per day, in the site's time zone.
+
+- record_order() runs when an order completes (order_completed signal)
+- record_download() runs when a DownloadLog is created
+- rebuild() recomputes a date range from the order history, for backfills
+  and after data changes the signals don't see (bulk imports, edits)
+- compact_download_logs() folds old DownloadLog rows into daily
+  DownloadLogSummary rows; rebuild() and the exports read both
+
+Orders count on the day they were placed, downloads on the day they
+happened. The receivers live in shop/signals.py; a rollup failure is
+logged without breaking checkout or the download, and
+`manage.py rebuild_sales_rollups` repairs the totals.
+"""
+
+import logging
+from collections import defaultdict
+from itertools import chain
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    DailySales,
+    DownloadLog,
+    DownloadLogSummary,
+    OrderItem,
+    Product,
+)
+
+logger = logging.getLogger("shop")
+
+METRICS = ["revenue_pence", "units", "orders", "downloads"]
+
+
+def _add(day, product_id, **deltas):
+    """Add deltas to one (day, product) row, creating it if needed."""
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    rollup = DailySales.objects.filter(date=day, product_id=product_id)
+    if rollup.update(**increments):
+        return
+    category_id = (
+        Product.objects.filter(pk=product_id)
+        .values_list("category_id", flat=True)
+        .first()
+    )
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(
+                date=day, product_id=product_id, category_id=category_id, **deltas
+            )
+    except IntegrityError:
+        # Created concurrently since the update above
+        rollup.update(**increments)
+
+
+def record_order(order):
+    """Add a newly completed order's items to its day's rollups."""
+    day = timezone.localdate(order.created)
+    totals = defaultdict(lambda: {"revenue_pence": 0, "units": 0})
+    for item in order.items.all():
+        totals[item.product_id]["revenue_pence"] += (
+            item.price_paid_pence * item.quantity
+        )
+        totals[item.product_id]["units"] += item.quantity
+    with transaction.atomic():
+        for product_id, deltas in totals.items():
+            _add(day, product_id, orders=1, **deltas)
+
+
+def record_download(download_log):
+    """Count one logged download against its product and day."""
+    day = timezone.localdate(download_log.downloaded_at)
+    _add(day, download_log.order_item.product_id, downloads=1)
+
+
+def _day_bounds(start, end):
+    """Aware datetimes covering the inclusive date range (None = open)."""
+    bounds = {}
+    if start:
+        bounds["gte"] = timezone.make_aware(datetime.combine(start, time.min))
+    if end:
+        bounds["lt"] = timezone.make_aware(
+            datetime.combine(end + timedelta(days=1), time.min)
+        )
+    return bounds
+
+
+def _date_range(queryset, start, end):
+    """Filter a model with a `date` field to an inclusive range."""
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def rebuild(start=None, end=None, batch_size=1000):
+    """
+    Recompute the rollups for an inclusive date range (everything by
+    default) from completed orders and download logs, raw and compacted.
+    Returns the number of rollup rows written.
+    """
+    bounds = _day_bounds(start, end)
+    tz = timezone.get_current_timezone()
+    rows = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    categories = {}
+
+    sales = (
+        OrderItem.objects.filter(
+            order__status="completed",
+            **{f"order__created__{op}": value for op, value in bounds.items()},
+        )
+        .annotate(day=TruncDate("order__created", tzinfo=tz))
+        .values("day", "product_id", "product__category_id")
+        .annotate(
+            revenue=Sum(F("price_paid_pence") * F("quantity")),
+            units=Sum("quantity"),
+            orders=Count("order", distinct=True),
+        )
+        .order_by()
+    )
+    for row in sales.iterator():
+        key = (row["day"], row["product_id"])
+        categories[row["product_id"]] = row["product__category_id"]
+        rows[key].update(
+            revenue_pence=row["revenue"], units=row["units"], orders=row["orders"]
+        )
+
+    downloads = (
+        DownloadLog.objects.filter(
+            **{f"downloaded_at__{op}": value for op, value in bounds.items()}
+        )
+        .annotate(day=TruncDate("downloaded_at", tzinfo=tz))
+        .values("day", "order_item__product_id", "order_item__product__category_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    compacted = (
+        _date_range(DownloadLogSummary.objects.all(), start, end)
+        .annotate(day=F("date"))
+        .values("day", "order_item__product_id", "order_item__product__category_id")
+        .annotate(count=Sum("downloads"))
+        .order_by()
+    )
+    for row in chain(downloads.iterator(), compacted.iterator()):
+        product_id = row["order_item__product_id"]
+        categories[product_id] = row["order_item__product__category_id"]
+        rows[(row["day"], product_id)]["downloads"] += row["count"]
+
+    stale = _date_range(DailySales.objects.all(), start, end)
+    with transaction.atomic():
+        stale.delete()
+        DailySales.objects.bulk_create(
+            [
+                DailySales(
+                    date=day,
+                    product_id=product_id,
+                    category_id=categories[product_id],
+                    **metrics,
+                )
+                for (day, product_id), metrics in rows.items()
+            ],
+            batch_size=batch_size,
+        )
+    logger.info(f"Rebuilt {len(rows)} daily sales rollups")
+    return len(rows)
+
+
+def compact_download_logs(days=None, batch_size=5000):
+    """
+    Fold DownloadLog rows from before the last `days` days (default
+    DOWNLOAD_LOG_RETENTION_DAYS) into DownloadLogSummary, deleting them
+    batch by batch. Each batch is counted and deleted in one transaction,
+    so an interrupted run never double counts. Returns the number of logs
+    compacted.
+    """
+    if days is None:
+        days = settings.DOWNLOAD_LOG_RETENTION_DAYS
+    cutoff = _day_bounds(timezone.localdate() - timedelta(days=days), None)["gte"]
+    tz = timezone.get_current_timezone()
+    old_logs = DownloadLog.objects.filter(downloaded_at__lt=cutoff).order_by(
+        "downloaded_at"
+    )
+    compacted = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(old_logs.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                break
+            counts = (
+                DownloadLog.objects.filter(pk__in=batch)
+                .annotate(day=TruncDate("downloaded_at", tzinfo=tz))
+                .values("order_item_id", "user_id", "day")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for row in counts:
+                key = {
+                    "order_item_id": row["order_item_id"],
+                    "user_id": row["user_id"],
+                    "date": row["day"],
+                }
+                summary = DownloadLogSummary.objects.filter(**key)
+                if not summary.update(downloads=F("downloads") + row["count"]):
+                    DownloadLogSummary.objects.create(downloads=row["count"], **key)
+            DownloadLog.objects.filter(pk__in=batch).delete()
+        compacted += len(batch)
+
+    if compacted:
+        logger.info(f"Compacted {compacted} download logs older than {days} days")
+    return compacted
+
+
+def _month_start(day, months_back):
+    for _ in range(months_back):
+        day = day.replace(day=1) - timedelta(days=1)
+    return day.replace(day=1)
+
+
+def sales_summary(months=12, top=20):
+    """
+    Dashboard figures for the last `months` calendar months, read from the
+    rollups only: overall totals, per month, per category and the top
+    products by revenue. Revenue is converted from pence for display.
+
+    Order counts are per product only: an order of three products is in
+    three rows, so summing `orders` across products would count it three
+    times.
+    """
+    since = _month_start(timezone.localdate(), months - 1)
+    rollups = DailySales.objects.filter(date__gte=since)
+    # Named apart from the DailySales fields they sum
+    totals = {
+        "pence": Sum("revenue_pence"),
+        "units_sold": Sum("units"),
+        "download_count": Sum("downloads"),
+    }
+
+    def with_revenue(rows):
+        return [{**row, "revenue": (row["pence"] or 0) / 100} for row in rows]
+
+    return {
+        "since": since,
+        "overall": with_revenue([rollups.aggregate(**totals)])[0],
+        "by_month": with_revenue(
+            rollups.annotate(month=TruncMonth("date"))
+            .values("month")
+            .annotate(**totals)
+            .order_by("-month")
+        ),
+        "by_category": with_revenue(
+            rollups.values("category__name").annotate(**totals).order_by("-pence")
+        ),
+        "by_product": with_revenue(
+            rollups.values("product_id", "product__title")
+            .annotate(**totals, order_count=Sum("orders"))
+            .order_by("-pence")[:top]
+        ),
+    }
@@ -1,8 +1,94 @@
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from shop import catalog_index, entitlements, recommendations, user_state
+from shop.config_manager import ConfigManager
 from shop.models import ShopSettings
+from shop.rollups import record_download, record_order
 from content.models import ContentContainer
 
+logger = logging.getLogger("shop")
+
+# Sent once per order when it becomes completed (paid), with order=<Order>.
+order_completed = Signal()
+
 
 def create_shop_settings(sender, **kwargs):
     if not ShopSettings.objects.exists():
         container = ContentContainer.objects.create(name="Shop Container")
         ShopSettings.objects.create(content_container=container)
+
+
+def clear_config_cache(sender, **kwargs):
+    """Saved/deleted ShopSettings -> drop the cached Stripe/email config."""
+    ConfigManager.clear_cache()
+
+
+def update_sales_rollups(sender, order, **kwargs):
+    """Completed order -> add it to the daily sales rollups."""
+    try:
+        # Savepoint: a database error must not break complete_order's transaction
+        with transaction.atomic():
+            record_order(order)
+    except Exception:
+        # Never fail a checkout over reporting; rebuild_sales_rollups repairs it
+        logger.exception(f"Sales rollup failed for order {order.order_id}")
+
+
+def update_recommendations(sender, order, **kwargs):
+    """Completed order -> add its product pairs to the "also bought" graph."""
+    try:
+        with transaction.atomic():
+            recommendations.record_order(order)
+    except Exception:
+        # rebuild_recommendations repairs it overnight
+        logger.exception(f"Recommendation refresh failed for order {order.order_id}")
+
+
+def update_download_rollups(sender, instance, created, raw=False, **kwargs):
+    """New DownloadLog -> count it in the daily sales rollups."""
+    if not created or raw:
+        return
+    try:
+        with transaction.atomic():
+            record_download(instance)
+    except Exception:
+        logger.exception(f"Download rollup failed for log {instance.pk}")
+
+
+def _bump_user_state(user_id):
+    # After commit, or a request could cache the old state under the new version
+    transaction.on_commit(partial(user_state.bump, user_id))
+
+
+def mark_entitlements_reviewed(sender, instance, created, raw=False, **kwargs):
+    """New review -> the customer can't review that product again."""
+    if created and not raw:
+        entitlements.set_reviewed(instance.user_id, instance.product_id)
+        _bump_user_state(instance.user_id)
+
+
+def unmark_entitlements_reviewed(sender, instance, **kwargs):
+    """Deleted review -> the customer may review the product again."""
+    entitlements.set_reviewed(instance.user_id, instance.product_id, False)
+    _bump_user_state(instance.user_id)
+
+
+def bump_user_state(sender, instance, **kwargs):
+    """Wishlist item added/removed -> refresh the owner's cached state."""
+    _bump_user_state(instance.user_id)
+
+
+def bump_catalog(sender, **kwargs):
+    """Product, category or review saved/deleted -> rebuild catalog indexes."""
+    # After commit, or a worker could rebuild from the old rows
+    transaction.on_commit(catalog_index.bump)
+
+
+def sync_entitlement_limits(sender, instance, raw=False, **kwargs):
+    """Saved product -> owners get its current download limit."""
+    if not raw:
+        entitlements.sync_download_limit(instance)
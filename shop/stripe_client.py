@@ -0,0 +1,241 @@
+# shop/stripe_client.py
+"""
+Per-process Stripe client.
+
+Views don't set the global stripe.api_key or use Stripe's default transport.
+They ask get_stripe_client() for a client built from the cached shop config:
+
+- one pooled keep-alive HTTP client (httpx, sync and async) per process
+- an explicit timeout per call site (e.g. a short one for the success page)
+- bounded retries with jittered exponential backoff (Stripe's own retry
+  logic, which also adds idempotency keys to retried POSTs)
+- a circuit breaker: after repeated connection/5xx failures every call fails
+  fast with StripeUnavailable for a cool-down period instead of tying up
+  workers waiting on a degraded Stripe.
+
+STRIPE_API_BASE points the client at another host (a local stub server in
+tests).
+"""
+
+import logging
+import threading
+import time
+
+import stripe
+from django.conf import settings
+
+from ebuilder.metrics import timed
+from .config_manager import ConfigManager
+
+logger = logging.getLogger("shop")
+
+
+class StripeUnavailable(stripe.error.APIConnectionError):
+    """Stripe can't be reached right now (or the circuit breaker is open)."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker, shared by every client in the process.
+
+    closed    - calls go through; consecutive failures are counted
+    open      - calls are refused until reset_timeout has passed
+    half-open - one trial call is let through; success closes the breaker,
+                failure opens it again, and a trial that ends any other way
+                (cancelled, unexpected error) lets the next call try
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """True if a call may be attempted now."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.error(
+                        f"Stripe circuit breaker opened after {self._failures} failures"
+                    )
+                self._opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """The call ended without an answer from Stripe (cancelled, or a bug)."""
+        with self._lock:
+            self._trial_running = False
+
+    def reset(self):
+        self.record_success()
+
+
+breaker = CircuitBreaker(
+    failure_threshold=settings.STRIPE_BREAKER_THRESHOLD,
+    reset_timeout=settings.STRIPE_BREAKER_RESET,
+)
+
+
+def _is_outage(exc):
+    """Errors that mean Stripe (or the network to it) is unhealthy."""
+    if isinstance(exc, stripe.error.APIConnectionError):
+        return True
+    return isinstance(exc, stripe.error.APIError) and (exc.http_status or 500) >= 500
+
+
+def _operation(method):
+    """Metrics label for a service method, e.g. PaymentIntentService.create"""
+    name = method.__name__.removesuffix("_async")
+    return f"{type(method.__self__).__name__}.{name}"
+
+
+class ShopStripeClient:
+    """Thin wrapper around stripe.StripeClient adding the circuit breaker."""
+
+    def __init__(self, secret_key, *, timeout, max_retries, api_base=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = stripe.StripeClient(
+            secret_key,
+            max_network_retries=max_retries,
+            base_addresses={"api": api_base} if api_base else None,
+            http_client=stripe.HTTPXClient(timeout=timeout, allow_sync_methods=True),
+        )
+
+    def _call(self, method, *args, **kwargs):
+        if not breaker.allow():
+            raise StripeUnavailable("Stripe is temporarily unavailable")
+        try:
+            with timed("stripe", _operation(method)):
+                result = method(*args, **kwargs)
+        except stripe.error.StripeError as e:
+            self._record(e)
+            raise
+        except BaseException:
+            breaker.record_abandoned()
+            raise
+        breaker.record_success()
+        return result
+
+    async def _call_async(self, method, *args, **kwargs):
+        if not breaker.allow():
+            raise StripeUnavailable("Stripe is temporarily unavailable")
+        try:
+            with timed("stripe", _operation(method)):
+                result = await method(*args, **kwargs)
+        except stripe.error.StripeError as e:
+            self._record(e)
+            raise
+        except BaseException:
+            # e.g. CancelledError when the client disconnects
+            breaker.record_abandoned()
+            raise
+        breaker.record_success()
+        return result
+
+    def _record(self, exc):
+        if _is_outage(exc):
+            logger.warning(f"Stripe call failed: {str(exc)}")
+            breaker.record_failure()
+            if not isinstance(exc, StripeUnavailable):
+                raise StripeUnavailable(str(exc)) from exc
+        else:
+            # Card declines, bad requests... Stripe itself is fine
+            breaker.record_success()
+
+    # PaymentIntents
+
+    def create_payment_intent(self, **params):
+        return self._call(self._client.v1.payment_intents.create, params)
+
+    async def create_payment_intent_async(self, **params):
+        return await self._call_async(
+            self._client.v1.payment_intents.create_async, params
+        )
+
+    def modify_payment_intent(self, intent_id, **params):
+        return self._call(self._client.v1.payment_intents.update, intent_id, params)
+
+    async def modify_payment_intent_async(self, intent_id, **params):
+        return await self._call_async(
+            self._client.v1.payment_intents.update_async, intent_id, params
+        )
+
+    def retrieve_payment_intent(self, intent_id):
+        return self._call(self._client.v1.payment_intents.retrieve, intent_id)
+
+    async def retrieve_payment_intent_async(self, intent_id):
+        return await self._call_async(
+            self._client.v1.payment_intents.retrieve_async, intent_id
+        )
+
+    # Account
+
+    def retrieve_account(self):
+        return self._call(self._client.v1.accounts.retrieve_current)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_stripe_client(timeout=None, max_retries=None):
+    """
+    Return this process's client for the configured secret key, or None if
+    Stripe isn't configured (or the shop is in demo mode).
+
+    timeout/max_retries override STRIPE_TIMEOUT/STRIPE_MAX_RETRIES for call
+    sites with a tighter budget; each combination gets its own pooled client.
+    """
+    config = ConfigManager.get_stripe_config()
+    if config is None:
+        return None
+
+    timeout = timeout if timeout is not None else settings.STRIPE_TIMEOUT
+    max_retries = (
+        max_retries if max_retries is not None else settings.STRIPE_MAX_RETRIES
+    )
+    api_base = settings.STRIPE_API_BASE
+    key = (config["secret_key"], timeout, max_retries, api_base)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # Keys rotated - drop clients for the old key
+            for old in [k for k in _clients if k[0] != config["secret_key"]]:
+                del _clients[old]
+            client = _clients[key] = ShopStripeClient(
+                config["secret_key"],
+                timeout=timeout,
+                max_retries=max_retries,
+                api_base=api_base,
+            )
+    return client
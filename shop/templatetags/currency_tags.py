@@ -12,8 +12,7 @@ def currency(value):
     Usage: {{ price|currency }}
     """
     try:
-        settings = SiteSettings.objects.first()
-        symbol = settings.currency_symbol if settings else "£"
+        symbol = SiteSettings.get_currency_symbol()
     except Exception:
         symbol = "£"
 
@@ -32,7 +31,6 @@ def currency_symbol():
     Usage: {% currency_symbol %}
     """
     try:
-        settings = SiteSettings.objects.first()
-        return settings.currency_symbol if settings else "£"
+        return SiteSettings.get_currency_symbol()
     except Exception:
         return "£"
@@ -0,0 +1,20 @@
+# shop/templatetags/product_cards.py
+from django import template
+from django.utils.safestring import mark_safe
+
+from shop.card_cache import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products, template_name="shop/includes/product_card.html"):
+    """
+    Render a grid's product cards from the card cache.
+    Usage: {% product_cards products "shop/includes/product_card.html" %}
+    """
+    user = context.get("user")
+    user_state = None
+    if user is not None and user.is_authenticated:
+        user_state = context.get("user_state")
+    return mark_safe("".join(render_cards(products, template_name, user_state)))
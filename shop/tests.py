@@ -0,0 +1,1337 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from unittest import mock
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from pages.models import SiteSettings
+
+from .admin import ProductAdminForm
+from .config_manager import ConfigManager
+from .media_checks import check_urls
+from .emails import send_order_emails_async
+from . import card_cache, catalog_index, entitlements
+from .management.commands.migrate_sqlite_to_postgres import (
+    Command as MigrateToPostgresCommand,
+)
+from .loaders import REVIEWS_PER_PAGE, load_product_detail
+from .orders import complete_order
+from .recommendations import rebuild as rebuild_recommendations
+from .recommendations import record_order, related_products
+from .user_state import get_user_state
+from .rollups import compact_download_logs
+from .rollups import rebuild as rebuild_sales_rollups
+from .rollups import sales_summary
+from .webhooks import handle_payment_intent_succeeded
+from .models import (
+    Category,
+    DailySales,
+    DownloadLog,
+    DownloadLogSummary,
+    Entitlement,
+    MediaURLCheck,
+    Order,
+    OrderItem,
+    Product,
+    ProductDownload,
+    ProductImage,
+    ProductRecommendation,
+    ProductReview,
+    ShopSettings,
+    WishList,
+)
+from .stripe_client import ShopStripeClient, StripeUnavailable
+from .stripe_client import breaker as stripe_breaker
+from .views.downloads import DOWNLOAD_CHUNK_SIZE, secure_download_async
+
+User = get_user_model()
+
+# No SMTP host configured -> Django's (locmem) test email backend
+NO_SMTP = dict.fromkeys(
+    ["host", "port", "use_tls", "username", "password", "from_address"]
+)
+
+
+def make_product(**kwargs):
+    defaults = {
+        "title": "Test Product",
+        "description": "A test product",
+        "price_pence": 1000,
+        "status": "publish",
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(**defaults)
+
+
+@override_settings(CART_STORAGE="cookie", CART_COOKIE_MAX_BYTES=3072)
+class CookieCartTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+
+    def test_add_stores_cart_in_signed_cookie_without_session(self):
+        self.client.post(reverse("shop:cart_add", args=[self.product.id]))
+
+        self.assertIn("cart", self.client.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
+        response = self.client.get(reverse("shop:cart_detail"))
+        self.assertContains(response, self.product.title)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.cookies["cart"] = "not-a-signed-value"
+        response = self.client.get(reverse("shop:cart_detail"))
+        self.assertEqual(len(response.context["cart"]), 0)
+
+    def test_cart_is_size_bounded(self):
+        with override_settings(CART_COOKIE_MAX_BYTES=10):
+            self.client.post(reverse("shop:cart_add", args=[self.product.id]))
+        self.assertNotIn("cart", self.client.cookies)
+
+
+class AsyncViewTests(TestCase):
+    """The ASGI (SERVER_MODE=asgi) versions of the network-bound views."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="buyer@example.com")
+        self.product = make_product()
+        self.download = ProductDownload.objects.create(
+            product=self.product, label="PDF"
+        )
+        self.order = Order.objects.create(
+            user=self.user, email=self.user.email, paid=True, status="completed"
+        )
+        self.item = OrderItem.objects.create(
+            order=self.order,
+            product=self.product,
+            purchased_download=self.download,
+            price_paid_pence=1000,
+        )
+        entitlements.grant(self.order)
+
+    async def test_secure_download_streams_file_asynchronously(self):
+        storage = self.download.file.storage
+        content = b"x" * (DOWNLOAD_CHUNK_SIZE * 2 + 10)
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "guide.pdf"), "wb") as f:
+                f.write(content)
+            self.download.file.name = "guide.pdf"
+            await self.download.asave()
+
+            request = AsyncRequestFactory().get("/")
+            request.user = self.user
+            request.auser = self._auser
+
+            with mock.patch.object(storage, "location", tmp):
+                response = await secure_download_async(
+                    request, self.item.id, self.download.id
+                )
+                self.assertTrue(response.is_async)
+                body = b"".join([chunk async for chunk in response])
+
+        self.assertEqual(body, content)
+        self.assertEqual(response["Content-Length"], str(len(content)))
+        self.assertEqual(await DownloadLog.objects.acount(), 1)
+
+    async def test_order_emails_sent_without_blocking(self):
+        with mock.patch(
+            "shop.emails.ConfigManager.get_email_config", return_value=NO_SMTP
+        ):
+            await send_order_emails_async(self.order)
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+
+    async def _auser(self):
+        return self.user
+
+
+STRIPE_CONFIG = {"public_key": "pk_test", "secret_key": "sk_test"}
+
+
+def mock_get_stripe_client():
+    """Stand-in for get_stripe_client() whose client creates intent pi_1."""
+    client = mock.Mock()
+    client.create_payment_intent.return_value = mock.Mock(
+        id="pi_1", client_secret="pi_1_secret"
+    )
+    return mock.Mock(return_value=client)
+
+
+@mock.patch(
+    "shop.views.checkout.ConfigManager.get_stripe_config", return_value=STRIPE_CONFIG
+)
+@mock.patch(
+    "shop.views.checkout.get_stripe_client", new_callable=mock_get_stripe_client
+)
+class CheckoutPaymentIntentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="buyer@example.com")
+        self.client.force_login(self.user)
+        self.product = make_product()
+        self.client.post(reverse("shop:cart_add", args=[self.product.id]))
+
+    def _checkout(self):
+        return self.client.get(reverse("shop:checkout"))
+
+    def test_reloading_checkout_reuses_intent(self, get_client, _config):
+        stripe_client = get_client.return_value
+
+        for _ in range(3):
+            response = self._checkout()
+
+        self.assertEqual(stripe_client.create_payment_intent.call_count, 1)
+        stripe_client.modify_payment_intent.assert_not_called()
+        self.assertEqual(response.context["client_secret"], "pi_1_secret")
+
+    def test_changed_total_modifies_intent(self, get_client, _config):
+        stripe_client = get_client.return_value
+        self._checkout()
+
+        self.client.post(reverse("shop:cart_add", args=[self.product.id]))
+        response = self._checkout()
+
+        self.assertEqual(stripe_client.create_payment_intent.call_count, 1)
+        stripe_client.modify_payment_intent.assert_called_once_with(
+            "pi_1", amount=2000, currency=mock.ANY
+        )
+        self.assertEqual(response.context["payment_intent_id"], "pi_1")
+
+    def test_stripe_outage_fails_fast_with_friendly_message(self, get_client, _config):
+        get_client.return_value.create_payment_intent.side_effect = StripeUnavailable(
+            "breaker open"
+        )
+
+        response = self._checkout()
+
+        self.assertRedirects(response, reverse("shop:cart_detail"))
+        message = str(list(get_messages(response.wsgi_request))[-1])
+        self.assertIn("temporarily unavailable", message)
+
+
+@mock.patch(
+    "shop.views.checkout.ConfigManager.get_stripe_config", return_value=STRIPE_CONFIG
+)
+@mock.patch(
+    "shop.views.checkout.get_stripe_client", new_callable=mock_get_stripe_client
+)
+@mock.patch("shop.emails.ConfigManager.get_email_config", new=lambda: NO_SMTP)
+class PaymentSuccessTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="buyer@example.com")
+        self.client.force_login(self.user)
+        self.product = make_product()
+        self.client.post(reverse("shop:cart_add", args=[self.product.id]))
+
+        with mock.patch(
+            "shop.views.checkout.get_stripe_client", new_callable=mock_get_stripe_client
+        ), mock.patch(
+            "shop.views.checkout.ConfigManager.get_stripe_config",
+            return_value=STRIPE_CONFIG,
+        ):
+            self.client.get(reverse("shop:checkout"))
+        self.order = Order.objects.get(payment_intent_id="pi_1")
+
+    def _success(self):
+        return self.client.get(
+            reverse("shop:payment_success"), {"payment_intent": "pi_1"}
+        )
+
+    def test_checkout_creates_pending_order_for_cart(self, get_client, _config):
+        self.assertEqual(self.order.status, "pending")
+        self.assertEqual(self.order.items.get().product, self.product)
+
+    def test_webhook_confirmed_order_skips_stripe(self, get_client, _config):
+        handle_payment_intent_succeeded(mock.Mock(id="pi_1"))
+
+        response = self._success()
+
+        self.assertTemplateUsed(response, "shop/success.html")
+        get_client.return_value.retrieve_payment_intent.assert_not_called()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.purchase_count, 1)
+        self.assertEqual(
+            len(self.client.get(reverse("shop:cart_detail")).context["cart"]), 0
+        )
+
+    def test_falls_back_to_stripe_when_webhook_is_late(self, get_client, _config):
+        get_client.return_value.retrieve_payment_intent.return_value = mock.Mock(
+            status="succeeded"
+        )
+
+        response = self._success()
+
+        self.assertTemplateUsed(response, "shop/success.html")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "completed")
+
+        # The webhook arriving afterwards is a no-op
+        self.assertIsNone(complete_order("pi_1"))
+
+    def test_pending_page_when_stripe_unavailable(self, get_client, _config):
+        get_client.return_value.retrieve_payment_intent.side_effect = StripeUnavailable(
+            "timeout"
+        )
+
+        response = self._success()
+
+        self.assertTemplateUsed(response, "shop/payment_pending.html")
+        status = self.client.get(reverse("shop:order_status", args=["pi_1"]))
+        self.assertEqual(status.json(), {"status": "pending"})
+
+
+class StubStripeHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for api.stripe.com, driven by the test."""
+
+    status = 200
+    requests = []
+
+    def do_POST(self):
+        self.requests.append(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.status >= 400:
+            body = {"error": {"type": "api_error", "message": "stub failure"}}
+        else:
+            body = {
+                "id": "pi_stub",
+                "object": "payment_intent",
+                "client_secret": "pi_stub_secret",
+                "status": "requires_payment_method",
+            }
+        payload = json.dumps(body).encode()
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(STRIPE_MAX_RETRIES=0, STRIPE_TIMEOUT=2)
+class StripeClientTests(TestCase):
+    """ShopStripeClient against a local stub HTTP server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(("127.0.0.1", 0), StubStripeHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api_base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubStripeHandler.status = 200
+        StubStripeHandler.requests = []
+        stripe_breaker.reset()
+        self.addCleanup(stripe_breaker.reset)
+        self.stripe = ShopStripeClient(
+            "sk_test", timeout=2, max_retries=0, api_base=self.api_base
+        )
+
+    def test_creates_payment_intent(self):
+        intent = self.stripe.create_payment_intent(amount=1000, currency="gbp")
+
+        self.assertEqual(intent.id, "pi_stub")
+        self.assertEqual(StubStripeHandler.requests, ["/v1/payment_intents"])
+
+    def test_breaker_opens_after_repeated_failures(self):
+        StubStripeHandler.status = 500
+        for _ in range(stripe_breaker.failure_threshold):
+            with self.assertRaises(StripeUnavailable):
+                self.stripe.create_payment_intent(amount=1000, currency="gbp")
+
+        calls = len(StubStripeHandler.requests)
+        with self.assertRaises(StripeUnavailable):
+            self.stripe.create_payment_intent(amount=1000, currency="gbp")
+        # Failed fast - Stripe wasn't contacted
+        self.assertEqual(len(StubStripeHandler.requests), calls)
+
+    def test_half_open_breaker_closes_on_success(self):
+        StubStripeHandler.status = 500
+        for _ in range(stripe_breaker.failure_threshold):
+            with self.assertRaises(StripeUnavailable):
+                self.stripe.create_payment_intent(amount=1000, currency="gbp")
+
+        StubStripeHandler.status = 200
+        with mock.patch.object(stripe_breaker, "reset_timeout", 0):
+            self.stripe.create_payment_intent(amount=1000, currency="gbp")
+        self.assertEqual(stripe_breaker.state, "closed")
+
+    def test_abandoned_trial_does_not_wedge_the_breaker(self):
+        StubStripeHandler.status = 500
+        for _ in range(stripe_breaker.failure_threshold):
+            with self.assertRaises(StripeUnavailable):
+                self.stripe.create_payment_intent(amount=1000, currency="gbp")
+
+        with mock.patch.object(stripe_breaker, "reset_timeout", 0):
+            # The trial is cancelled (client disconnected)...
+            with mock.patch.object(
+                stripe.HTTPXClient,
+                "request_with_retries_async",
+                side_effect=asyncio.CancelledError,
+            ), self.assertRaises(asyncio.CancelledError):
+                asyncio.run(
+                    self.stripe.create_payment_intent_async(amount=1000, currency="gbp")
+                )
+            # ...or fails with something other than a StripeError
+            with mock.patch.object(
+                stripe.HTTPXClient, "request_with_retries", side_effect=RuntimeError
+            ), self.assertRaises(RuntimeError):
+                self.stripe.create_payment_intent(amount=1000, currency="gbp")
+
+            StubStripeHandler.status = 200
+            self.stripe.create_payment_intent(amount=1000, currency="gbp")
+        self.assertEqual(stripe_breaker.state, "closed")
+
+
+class ConfigManagerTests(TestCase):
+    def setUp(self):
+        ConfigManager.clear_cache()
+        self.addCleanup(ConfigManager.clear_cache)
+
+    def test_config_is_cached_until_settings_change(self):
+        ConfigManager.get_stripe_config()
+        with self.assertNumQueries(0):
+            ConfigManager.get("stripe_public_key")
+
+        shop_settings = ShopSettings.objects.first()
+        shop_settings.stripe_public_key = "pk_from_admin"
+        shop_settings.save()
+
+        self.assertEqual(ConfigManager.get("stripe_public_key"), "pk_from_admin")
+
+    @override_settings(
+        STRIPE_SECRET_KEY="sk_secret", EMAIL_HOST_PASSWORD="smtp-password"
+    )
+    @mock.patch.dict("os.environ")
+    def test_secrets_stay_out_of_the_shared_cache(self):
+        os.environ.pop("STRIPE_SECRET_KEY", None)
+        os.environ.pop("EMAIL_HOST_PASSWORD", None)
+
+        self.assertEqual(ConfigManager.get("stripe_secret_key"), "sk_secret")
+        cached = repr(cache.get("ebuilder_config"))
+        self.assertNotIn("sk_secret", cached)
+        self.assertNotIn("smtp-password", cached)
+
+        # Still served from memory, not reloaded per call
+        with self.assertNumQueries(0):
+            self.assertEqual(ConfigManager.get("email_host_password"), "smtp-password")
+
+
+class AdminChangelistTests(TestCase):
+    """Changelist pages run the same number of queries however many rows."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@example.com")
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = Order.objects.count()
+        for i in range(start, start + count):
+            buyer = User.objects.create_user(email=f"buyer{i}@example.com")
+            product = make_product(title=f"Product {i}", slug=f"product-{i}")
+            Order.objects.create(user=buyer, email=buyer.email)
+            ProductReview.objects.create(
+                product=product, user=buyer, rating=5, comment="Great"
+            )
+
+    def count_queries(self, url):
+        self.client.get(url)  # warm the settings caches
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = [
+            reverse("admin:shop_order_changelist"),
+            reverse("admin:shop_product_changelist"),
+            reverse("admin:shop_productreview_changelist"),
+        ]
+        self.add_rows(2)
+        few = [self.count_queries(url) for url in urls]
+        self.add_rows(10)
+        many = [self.count_queries(url) for url in urls]
+        self.assertEqual(few, many)
+
+    def test_order_search_by_email_and_order_id(self):
+        self.add_rows(3)
+        order = Order.objects.get(email="buyer1@example.com")
+        url = reverse("admin:shop_order_changelist")
+
+        response = self.client.get(url, {"q": "Buyer1@Example.com"})
+        self.assertEqual(list(response.context["cl"].result_list), [order])
+
+        response = self.client.get(url, {"q": order.order_id.lower()})
+        self.assertEqual(list(response.context["cl"].result_list), [order])
+
+    def test_partial_order_search_falls_back_to_substrings(self):
+        self.add_rows(3)
+        order = Order.objects.get(email="buyer1@example.com")
+        url = reverse("admin:shop_order_changelist")
+
+        response = self.client.get(url, {"q": "@example.com"})
+        self.assertEqual(len(response.context["cl"].result_list), 3)
+
+        response = self.client.get(url, {"q": order.order_id[:-1]})
+        self.assertIn(order, response.context["cl"].result_list)
+
+    def test_order_change_page_renders(self):
+        self.add_rows(1)
+        order = Order.objects.get()
+        OrderItem.objects.create(
+            order=order, product=Product.objects.get(), price_paid_pence=1000
+        )
+        response = self.client.get(reverse("admin:shop_order_change", args=[order.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class SalesExportTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(email="buyer@example.com")
+        product = make_product()
+        self.orders = []
+        for day, price in [(1, 1000), (15, 2500)]:
+            order = Order.objects.create(
+                user=self.buyer, email=self.buyer.email, paid=True, status="completed"
+            )
+            Order.objects.filter(pk=order.pk).update(
+                created=timezone.make_aware(datetime(2025, 3, day, 12))
+            )
+            item = OrderItem.objects.create(
+                order=order, product=product, price_paid_pence=price, quantity=2
+            )
+            DownloadLog.objects.create(order_item=item, user=self.buyer)
+            self.orders.append(order)
+
+    def test_admin_action_streams_csv(self):
+        self.client.force_login(User.objects.create_superuser(email="a@example.com"))
+        response = self.client.post(
+            reverse("admin:shop_order_changelist"),
+            {
+                "action": "export_orders_csv",
+                "_selected_action": [order.pk for order in self.orders],
+            },
+        )
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response).decode())))
+        self.assertEqual(
+            [(r["order_id"], r["total_pence"]) for r in rows],
+            [(self.orders[0].order_id, "2000"), (self.orders[1].order_id, "5000")],
+        )
+
+    def test_command_filters_by_date_range(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "items.jsonl")
+            call_command(
+                "export_sales",
+                "order_items",
+                format="jsonl",
+                since="2025-03-10",
+                until="2025-03-31",
+                output=path,
+                stdout=io.StringIO(),
+            )
+            with open(path) as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["order_id"], self.orders[1].order_id)
+        self.assertEqual(rows[0]["price_paid_pence"], 2500)
+
+    def test_download_log_export(self):
+        out = io.StringIO()
+        call_command("export_sales", "download_logs", stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["email"], "buyer@example.com")
+
+
+# The suite has already set up the test environment and database - run the
+# benchmark inside them instead of creating its own
+@mock.patch("shop.management.commands.bench.DiscoverRunner")
+@mock.patch("shop.management.commands.bench.setup_test_environment")
+@mock.patch("shop.management.commands.bench.teardown_test_environment")
+class BenchCommandTests(TestCase):
+    TINY = {"iterations": 1, "warmup": 0, "products": 5, "posts": 3, "orders": 1}
+
+    def test_writes_results_as_json(self, *mocks):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.json")
+            call_command("bench", output=path, stdout=io.StringIO(), **self.TINY)
+            with open(path) as f:
+                results = json.load(f)
+
+        self.assertEqual(results["meta"]["iterations"], 1)
+        self.assertEqual(results["meta"]["database"], connection.vendor)
+        self.assertIn("stripe_webhook", results["scenarios"])
+        for result in results["scenarios"].values():
+            self.assertEqual(
+                set(result), {"p50_ms", "p95_ms", "mean_ms", "queries", "peak_kb"}
+            )
+            self.assertGreater(result["queries"], 0)
+
+    def test_regression_against_baseline_fails(self, *mocks):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            with open(path, "w") as f:
+                json.dump(
+                    {"scenarios": {"home_view": {"p95_ms": 0.01, "queries": 0}}}, f
+                )
+            with self.assertRaisesMessage(CommandError, "home_view (p95"):
+                call_command(
+                    "bench",
+                    only=["home_view"],
+                    baseline=path,
+                    stdout=io.StringIO(),
+                    **self.TINY,
+                )
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(email="buyer@example.com")
+        self.product = make_product()
+
+    def place_order(self, payment_intent_id, price=1000, quantity=1):
+        order = Order.objects.create(
+            user=self.buyer, email=self.buyer.email, payment_intent_id=payment_intent_id
+        )
+        item = OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            price_paid_pence=price,
+            quantity=quantity,
+        )
+        complete_order(payment_intent_id)
+        return item
+
+    def rollup_values(self):
+        return list(
+            DailySales.objects.values(
+                "product", "revenue_pence", "units", "orders", "downloads"
+            )
+        )
+
+    def test_completed_orders_and_downloads_update_rollups(self):
+        item = self.place_order("pi_1", price=1000, quantity=2)
+        self.place_order("pi_2", price=500)
+        DownloadLog.objects.create(order_item=item, user=self.buyer)
+
+        rollup = DailySales.objects.get()
+        self.assertEqual(rollup.date, timezone.localdate())
+        self.assertEqual(rollup.category, self.product.category)
+        self.assertEqual(
+            self.rollup_values(),
+            [
+                {
+                    "product": self.product.pk,
+                    "revenue_pence": 2500,
+                    "units": 3,
+                    "orders": 2,
+                    "downloads": 1,
+                }
+            ],
+        )
+
+    def test_rollup_database_error_does_not_fail_the_order(self):
+        def broken_statement(*args, **kwargs):
+            # Leaves the enclosing transaction unusable, like a failed
+            # statement on PostgreSQL
+            with transaction.atomic(savepoint=False):
+                raise DatabaseError("rollup failed")
+
+        with mock.patch("shop.signals.record_order", side_effect=broken_statement):
+            with self.assertLogs("shop", "ERROR"):
+                item = self.place_order("pi_1")
+
+        self.assertEqual(Order.objects.get().status, "completed")
+        self.assertTrue(Entitlement.objects.filter(order_item=item).exists())
+        self.assertFalse(DailySales.objects.exists())
+
+    def test_rebuild_matches_incremental_totals(self):
+        item = self.place_order("pi_1", price=1000, quantity=2)
+        DownloadLog.objects.create(order_item=item, user=self.buyer)
+        Order.objects.create(email="x@example.com", payment_intent_id="pi_pending")
+        incremental = self.rollup_values()
+
+        DailySales.objects.update(revenue_pence=0)
+        out = io.StringIO()
+        call_command("rebuild_sales_rollups", stdout=out)
+
+        self.assertEqual(self.rollup_values(), incremental)
+        self.assertIn("Rebuilt 1", out.getvalue())
+
+    def test_dashboard_reads_rollups(self):
+        self.place_order("pi_1", price=1250)
+        self.client.force_login(User.objects.create_superuser(email="a@example.com"))
+
+        response = self.client.get(reverse("admin:shop_dailysales_changelist"))
+
+        summary = response.context["summary"]
+        self.assertEqual(summary["overall"]["revenue"], 12.5)
+        self.assertEqual(summary["by_product"][0]["product__title"], "Test Product")
+        self.assertContains(response, "Top products")
+
+    def test_summary_counts_orders_per_product_only(self):
+        order = Order.objects.create(
+            user=self.buyer, email=self.buyer.email, payment_intent_id="pi_1"
+        )
+        for product in [self.product, make_product(title="Other")]:
+            OrderItem.objects.create(
+                order=order, product=product, price_paid_pence=1000
+            )
+        complete_order("pi_1")
+
+        summary = sales_summary()
+        self.assertNotIn("order_count", summary["overall"])
+        self.assertNotIn("order_count", summary["by_month"][0])
+        self.assertEqual([row["order_count"] for row in summary["by_product"]], [1, 1])
+
+
+class DownloadLogCompactionTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(email="buyer@example.com")
+        order = Order.objects.create(
+            user=self.buyer, email=self.buyer.email, status="completed", paid=True
+        )
+        self.item = OrderItem.objects.create(
+            order=order, product=make_product(), price_paid_pence=1000
+        )
+        now = timezone.now()
+        for age in [100, 100, 100, 95, 1]:
+            log = DownloadLog.objects.create(order_item=self.item, user=self.buyer)
+            DownloadLog.objects.filter(pk=log.pk).update(
+                downloaded_at=now - timedelta(days=age)
+            )
+
+    def test_old_logs_are_rolled_into_daily_summaries(self):
+        out = io.StringIO()
+        call_command("compact_download_logs", days=30, batch_size=2, stdout=out)
+
+        self.assertIn("Compacted 4", out.getvalue())
+        self.assertEqual(DownloadLog.objects.count(), 1)
+        self.assertEqual(
+            sorted(DownloadLogSummary.objects.values_list("downloads", flat=True)),
+            [1, 3],
+        )
+
+    def test_reporting_counts_raw_and_compacted_logs(self):
+        rebuild_sales_rollups()
+        before = DailySales.objects.aggregate(total=Sum("downloads"))["total"]
+        compact_download_logs(days=30)
+        rebuild_sales_rollups()
+
+        after = DailySales.objects.aggregate(total=Sum("downloads"))["total"]
+        self.assertEqual(before, after)
+        out = io.StringIO()
+        call_command("export_sales", "download_logs", stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row["downloads"] for row in rows], ["3", "1", "1"])
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()  # cached user state is keyed by user id
+        self.buyer = User.objects.create_user(email="buyer@example.com")
+        self.product = make_product(download_limit=2)
+        self.download = ProductDownload.objects.create(
+            product=self.product, label="PDF", file="guide.pdf"
+        )
+        order = Order.objects.create(
+            user=self.buyer, email=self.buyer.email, payment_intent_id="pi_1"
+        )
+        self.item = OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            purchased_download=self.download,
+            price_paid_pence=1000,
+        )
+
+    def download_file(self, user):
+        self.client.force_login(user)
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "guide.pdf"), "wb") as f:
+                f.write(b"pdf")
+            with mock.patch.object(self.download.file.storage, "location", tmp):
+                response = self.client.get(
+                    reverse(
+                        "shop:secure_download", args=[self.item.id, self.download.id]
+                    )
+                )
+                if response.status_code == 200:
+                    response.close()
+        DownloadLog.objects.update(downloaded_at=timezone.now() - timedelta(minutes=1))
+        return response
+
+    def test_completing_an_order_grants_entitlements(self):
+        self.assertFalse(self.product.can_review(self.buyer))
+        complete_order("pi_1")
+
+        entitlement = Entitlement.objects.get()
+        self.assertEqual(
+            (entitlement.user, entitlement.download, entitlement.download_limit),
+            (self.buyer, self.download, 2),
+        )
+        self.assertTrue(self.product.can_review(self.buyer))
+
+    def test_reviews_update_eligibility(self):
+        complete_order("pi_1")
+        review = ProductReview.objects.create(
+            product=self.product, user=self.buyer, rating=5, comment="Great"
+        )
+        self.assertFalse(self.product.can_review(self.buyer))
+        self.client.force_login(self.buyer)
+        response = self.client.get(self.product.get_absolute_url())
+        self.assertTrue(response.context["has_purchased"])
+        self.assertIsNone(response.context["form"])
+
+        review.delete()
+        self.assertTrue(self.product.can_review(self.buyer))
+
+    def test_downloads_are_counted_and_limited(self):
+        complete_order("pi_1")
+        self.assertEqual(self.download_file(self.buyer).status_code, 200)
+        self.assertEqual(self.download_file(self.buyer).status_code, 200)
+        self.assertEqual(self.download_file(self.buyer).status_code, 302)
+
+        self.assertEqual(Entitlement.objects.get().downloads_used, 2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.download_count, 2)
+
+        stranger = User.objects.create_user(email="stranger@example.com")
+        self.assertEqual(self.download_file(stranger).status_code, 302)
+        self.assertEqual(DownloadLog.objects.count(), 2)
+
+    def test_rebuild_recreates_entitlements(self):
+        complete_order("pi_1")
+        self.download_file(self.buyer)
+        ProductReview.objects.create(
+            product=self.product, user=self.buyer, rating=4, comment="Good"
+        )
+        fields = ["user", "product", "order_item", "download", "downloads_used"]
+        before = list(Entitlement.objects.values(*fields, "reviewed"))
+
+        out = io.StringIO()
+        call_command("rebuild_entitlements", stdout=out)
+
+        self.assertEqual(list(Entitlement.objects.values(*fields, "reviewed")), before)
+        self.assertIn("Rebuilt 1", out.getvalue())
+
+
+class UserStateTests(TestCase):
+    def setUp(self):
+        cache.clear()  # cached user state is keyed by user id
+        self.buyer = User.objects.create_user(email="buyer@example.com")
+        self.product = make_product()
+        self.client.force_login(self.buyer)
+
+    def state(self):
+        return get_user_state(self.buyer)
+
+    def place_order(self):
+        order = Order.objects.create(
+            user=self.buyer, email=self.buyer.email, payment_intent_id="pi_1"
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, price_paid_pence=1000
+        )
+        complete_order("pi_1")
+
+    def test_state_follows_wishlist_orders_and_reviews(self):
+        self.assertEqual(self.state().wishlisted, set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("shop:wishlist_toggle", args=[self.product.id]))
+        self.assertEqual(self.state().wishlisted, {self.product.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("shop:remove_from_wishlist", args=[self.product.id])
+            )
+        self.assertEqual(self.state().wishlisted, set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place_order()
+        self.assertTrue(self.state().can_review(self.product.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("shop:add_review", args=[self.product.id]),
+                {"rating": 5, "comment": "Great"},
+            )
+        self.assertEqual(self.state().reviewed, {self.product.id})
+        self.assertFalse(self.state().can_review(self.product.id))
+
+    def test_new_version_waits_for_commit(self):
+        self.assertEqual(self.state().purchased, set())
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.place_order()
+        # Not bumped yet: a concurrent request can't cache the uncommitted
+        # order's absence under the new version
+        self.assertEqual(self.state().purchased, set())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.state().purchased, {self.product.id})
+
+    def test_cached_state_costs_no_queries(self):
+        WishList.objects.create(user=self.buyer, product=self.product)
+        url = self.product.get_absolute_url()
+        self.client.get(url)  # warm the caches
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertContains(response, "Remove from Wish List")
+        per_user = [q["sql"] for q in queries if '"user_id" = ' in q["sql"]]
+        self.assertFalse(per_user)
+
+
+class ProductDetailTests(TestCase):
+    """The product page loads in a fixed number of queries."""
+
+    # loader (product, images, downloads, reviews) + related products
+    # + site-wide context processors
+    PAGE_QUERIES = 10
+
+    def setUp(self):
+        self.product = make_product(download_limit=3)
+        ProductDownload.objects.create(product=self.product, label="Get the PDF")
+        ProductImage.objects.create(product=self.product, image="products/a.jpg")
+
+    def add_reviews(self, count):
+        start = ProductReview.objects.count()
+        for i in range(start, start + count):
+            reviewer = User.objects.create_user(
+                email=f"reviewer{i}@example.com", first_name=f"Reviewer{i}"
+            )
+            ProductReview.objects.create(
+                product=self.product, user=reviewer, rating=4, comment="Good"
+            )
+
+    def count_queries(self, **params):
+        url = self.product.get_absolute_url()
+        self.client.get(url, params)  # warm the settings caches
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_loader_query_count(self):
+        self.add_reviews(3)
+        with self.assertNumQueries(4):
+            product, reviews = load_product_detail(self.product.slug)
+            self.assertEqual(product.category.name, "Uncategorized")
+            self.assertEqual(len(product.images.all()), 1)
+            self.assertTrue(product.has_downloads)
+            self.assertEqual((product.total_reviews, product.average_rating), (3, 4))
+            self.assertEqual(
+                {review.user.first_name for review in reviews},
+                {"Reviewer0", "Reviewer1", "Reviewer2"},
+            )
+
+    def test_page_query_count_is_pinned(self):
+        self.add_reviews(2)
+        self.assertEqual(self.count_queries(), self.PAGE_QUERIES)
+        self.add_reviews(REVIEWS_PER_PAGE + 3)
+        self.assertEqual(self.count_queries(), self.PAGE_QUERIES)
+        self.assertEqual(self.count_queries(reviews=2), self.PAGE_QUERIES)
+
+    def test_reviews_are_paginated(self):
+        self.add_reviews(REVIEWS_PER_PAGE + 2)
+        url = self.product.get_absolute_url()
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["reviews"]), REVIEWS_PER_PAGE)
+        self.assertContains(response, f"{REVIEWS_PER_PAGE + 2} reviews")
+        self.assertContains(response, "Older reviews")
+
+        response = self.client.get(url, {"reviews": 2})
+        self.assertEqual(
+            [review.user.first_name for review in response.context["reviews"]],
+            ["Reviewer1", "Reviewer0"],
+        )
+
+    def test_unlisted_product_is_404(self):
+        self.product.status = "draft"
+        self.product.save()
+        response = self.client.get(self.product.get_absolute_url())
+        self.assertEqual(response.status_code, 404)
+
+
+class MigrateToPostgresTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def test_missing_source_is_rejected(self):
+        source = os.path.join(self.tmp, "typo.sqlite3")
+        with self.assertRaisesMessage(CommandError, "does not exist"):
+            call_command("migrate_sqlite_to_postgres", source=source, interactive=False)
+        self.assertFalse(os.path.exists(source))
+
+    def test_source_without_migrations_is_rejected(self):
+        path = os.path.join(self.tmp, "empty.sqlite3")
+        open(path, "w").close()
+        source = SQLiteDatabaseWrapper(
+            connections.configure_settings(
+                {
+                    **connections.settings,
+                    "source": {"ENGINE": "django.db.backends.sqlite3", "NAME": path},
+                }
+            )["source"],
+            alias="source",
+        )
+        self.addCleanup(source.close)
+
+        with self.assertRaisesMessage(CommandError, "no applied migrations"):
+            MigrateToPostgresCommand()._check_migrations(source, connection)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(email="buyer@example.com")
+        self.a, self.b, self.c, self.d = [
+            make_product(title=f"Product {name}", slug=f"product-{name}")
+            for name in "abcd"
+        ]
+
+    def place_order(self, payment_intent_id, *products, complete=True):
+        order = Order.objects.create(
+            user=self.buyer, email=self.buyer.email, payment_intent_id=payment_intent_id
+        )
+        for product in products:
+            OrderItem.objects.create(
+                order=order, product=product, price_paid_pence=1000
+            )
+        if complete:
+            complete_order(payment_intent_id)
+
+    def neighbours(self, product):
+        return list(
+            ProductRecommendation.objects.filter(product=product).values_list(
+                "recommended", "score"
+            )
+        )
+
+    def test_graph_from_orders_and_wishlists(self):
+        self.place_order("pi_1", self.a, self.b)
+        self.place_order("pi_2", self.a, self.b, self.c)
+        self.place_order("pi_3", self.a, self.d, complete=False)
+        wisher = User.objects.create_user(email="wisher@example.com")
+        WishList.objects.create(user=wisher, product=self.a)
+        WishList.objects.create(user=wisher, product=self.c)
+
+        out = io.StringIO()
+        call_command("rebuild_recommendations", stdout=out)
+
+        self.assertEqual(self.neighbours(self.a), [(self.b.pk, 4), (self.c.pk, 3)])
+        self.assertEqual(self.neighbours(self.d), [])
+        self.assertIn("Stored 6", out.getvalue())
+
+    def test_completed_orders_update_their_products(self):
+        self.place_order("pi_1", self.a, self.b)
+        self.assertEqual(self.neighbours(self.a), [(self.b.pk, 2)])
+
+        self.place_order("pi_2", self.b, self.c)
+        self.assertEqual(self.neighbours(self.b), [(self.a.pk, 2), (self.c.pk, 2)])
+        self.assertEqual(self.neighbours(self.c), [(self.b.pk, 2)])
+
+        incremental = list(ProductRecommendation.objects.values_list())
+        rebuild_recommendations()
+        self.assertEqual(
+            [row[1:] for row in ProductRecommendation.objects.values_list()],
+            [row[1:] for row in incremental],
+        )
+
+    def test_recording_an_order_ignores_history(self):
+        for n in range(5):
+            self.place_order(f"pi_{n}", self.a, self.b, self.c)
+        order = Order.objects.get(payment_intent_id="pi_0")
+
+        with CaptureQueriesContext(connection) as few_orders:
+            record_order(order)
+        for n in range(5, 30):
+            self.place_order(f"pi_{n}", self.a, self.b, self.c, self.d)
+        with CaptureQueriesContext(connection) as many_orders:
+            record_order(order)
+
+        self.assertEqual(len(few_orders), len(many_orders))
+        self.assertNotIn("shop_orderitem", str(many_orders.captured_queries[1:]))
+
+    def test_related_products_put_recommendations_first(self):
+        other = Category.objects.create(name="Other", slug="other")
+        Product.objects.filter(pk=self.d.pk).update(category=other)
+        catalog_index.bump()
+        self.place_order("pi_1", self.a, self.d)
+        catalog_index.get_index()
+
+        with self.assertNumQueries(1):
+            related, also_bought = related_products(self.a)
+        self.assertEqual(related, [self.d, self.c, self.b])  # then newest first
+        self.assertTrue(also_bought)
+
+        response = self.client.get(self.a.get_absolute_url())
+        self.assertEqual(response.context["related_products"], related)
+        self.assertContains(response, "Customers Also Bought")
+
+
+class CatalogIndexTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        version_file = override_settings(
+            CATALOG_VERSION_FILE=os.path.join(tmp.name, "catalog.version")
+        )
+        version_file.enable()
+        self.addCleanup(version_file.disable)
+
+        self.guides = Category.objects.create(name="Guides", slug="guides")
+        self.empty = Category.objects.create(name="Empty", slug="empty")
+        self.guide = make_product(
+            title="Garden Guide", slug="garden-guide", category=self.guides, order=1
+        )
+        self.planner = make_product(
+            title="Planner", slug="planner", featured=True, description="Weekly pages"
+        )
+        self.draft = make_product(title="Draft", slug="draft", status="draft")
+        catalog_index.bump()
+
+    def test_listings_filter_in_memory(self):
+        index = catalog_index.get_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(index.listing(), [self.planner, self.guide])
+            self.assertEqual(index.listing(category_id=self.guides.id), [self.guide])
+            self.assertEqual(index.listing(query="WEEKLY"), [self.planner])
+            self.assertEqual(index.featured(), [self.planner])
+            self.assertEqual(index.category("guides").product_count, 1)
+            self.assertNotIn(self.empty, index.listed_categories())
+
+    def test_listing_pages_do_not_query_products(self):
+        catalog_index.get_index()
+        pages = [
+            (reverse("shop:product_list"), "Garden Guide"),
+            (
+                reverse("shop:product_list") + "?category=guides&q=garden",
+                "Garden Guide",
+            ),
+            (reverse("shop:category", args=["guides"]), "Garden Guide"),
+            (reverse("shop:category_hub"), "/shop/category/guides/"),
+        ]
+        for url, expected in pages:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, expected)
+            self.assertNotContains(response, "Draft")
+            self.assertNotContains(response, "/shop/category/empty/")
+            self.assertFalse([q["sql"] for q in queries if "shop_product" in q["sql"]])
+
+        response = self.client.get(reverse("shop:category", args=["missing"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_changes_rebuild_the_index(self):
+        index = catalog_index.get_index()
+        self.assertIs(catalog_index.get_index(), index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.status = "publish"
+            self.draft.save()
+        rebuilt = catalog_index.get_index()
+
+        self.assertIsNot(rebuilt, index)
+        self.assertIn(self.draft, rebuilt.listing())
+        self.assertNotIn(self.draft, index.listing())
+
+
+class ProductCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        version_file = override_settings(
+            CATALOG_VERSION_FILE=os.path.join(tmp.name, "catalog.version")
+        )
+        version_file.enable()
+        self.addCleanup(version_file.disable)
+
+        self.products = [
+            make_product(title=f"Card {i}", slug=f"card-{i}") for i in range(5)
+        ]
+        catalog_index.bump()
+        self.url = reverse("shop:product_list")
+
+    def rendered_cards(self):
+        with mock.patch(
+            "shop.card_cache.render_to_string", wraps=card_cache.render_to_string
+        ) as render:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        cards = [c for c in render.call_args_list if "card_state" not in c.args[0]]
+        return response, len(cards)
+
+    def test_cards_are_rendered_once_per_version(self):
+        self.assertEqual(self.rendered_cards()[1], 5)
+        self.assertEqual(self.rendered_cards()[1], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].title = "Card zero"
+            self.products[0].save()
+        response, rendered = self.rendered_cards()
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, "Card zero")
+
+    def test_currency_change_rerenders_cards(self):
+        self.rendered_cards()
+        SiteSettings.objects.update_or_create(defaults={"currency_symbol": "€"})
+
+        response, rendered = self.rendered_cards()
+        self.assertEqual(rendered, 5)
+        self.assertContains(response, "€10.00")
+
+    def test_customer_badges_are_not_cached(self):
+        buyer = User.objects.create_user(email="buyer@example.com")
+        WishList.objects.create(user=buyer, product=self.products[2])
+        self.client.force_login(buyer)
+
+        response, _ = self.rendered_cards()
+        self.assertContains(response, 'title="In your wish list"', count=1)
+
+        self.client.logout()
+        response, rendered = self.rendered_cards()
+        self.assertEqual(rendered, 0)
+        self.assertNotContains(response, 'title="In your wish list"')
+
+
+class StubMediaHandler(BaseHTTPRequestHandler):
+    """Serves headers for fake media files; /slow never answers in time."""
+
+    requests = []
+    files = {
+        "/photo.png": "image/png",
+        "/photo.gif": "image/gif",
+        "/preview.pdf": "application/pdf",
+    }
+
+    def do_HEAD(self):
+        self.requests.append(("HEAD", self.path))
+        if self.path == "/slow":
+            time.sleep(1)
+        if self.path == "/no-head.pdf":
+            self.send_response(405)
+            self.end_headers()
+            return
+        self.send_headers()
+
+    def do_GET(self):
+        self.requests.append(("GET", self.path))
+        self.send_response(206)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Range", "bytes 0-0/4096")
+        self.send_header("Content-Length", "1")
+        self.end_headers()
+        self.wfile.write(b"%")
+
+    def send_headers(self):
+        content_type = self.files.get(self.path)
+        self.send_response(200 if content_type else 404)
+        self.send_header("Content-Type", content_type or "text/html")
+        self.send_header("Content-Length", "2048")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(MEDIA_CHECK_TIMEOUT=0.3)
+class MediaURLCheckTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubMediaHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubMediaHandler.requests = []
+
+    def test_results_are_stored_and_reused(self):
+        url = f"{self.base}/photo.png"
+        check = check_urls([url])[url]
+        self.assertTrue(check.ok)
+        self.assertEqual(check.content_type, "image/png")
+        self.assertEqual(check.content_length, 2048)
+
+        check_urls([url])
+        self.assertEqual(StubMediaHandler.requests, [("HEAD", "/photo.png")])
+        self.assertEqual(MediaURLCheck.objects.count(), 1)
+
+    def test_slow_hosts_time_out_without_blocking_others(self):
+        urls = [f"{self.base}/slow", f"{self.base}/no-head.pdf"]
+        started = time.monotonic()
+        checks = check_urls(urls)
+
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertIn("Timed out", checks[urls[0]].error)
+        self.assertEqual(checks[urls[1]].content_type, "application/pdf")
+        self.assertEqual(checks[urls[1]].content_length, 4096)
+
+    def test_admin_form_rejects_wrong_media_types(self):
+        form = ProductAdminForm(
+            data={
+                "layout_mode": "standard",
+                "title": "Product",
+                "slug": "product",
+                "description": "x",
+                "status": "publish",
+                "price_pence": 100,
+                "download_limit": 5,
+                "purchase_count": 0,
+                "order": 0,
+                "external_image_url": f"{self.base}/photo.gif",
+                "external_preview_url": f"{self.base}/missing.pdf",
+            }
+        )
+
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors["external_image_url"],
+            ["Only JPG, PNG and WebP images are allowed"],
+        )
+        self.assertEqual(
+            form.errors["external_preview_url"], ["Could not validate preview URL"]
+        )
@@ -1,4 +1,5 @@
 # shop/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views, webhooks
 from django.views.generic import TemplateView
@@ -7,6 +8,10 @@ from .views.wishlist import remove_from_wishlist
 
 app_name = "shop"
 
+# Under ASGI the network-bound views (Stripe, SMTP, file streaming) are
+# served by their async versions so they don't hold a worker while waiting.
+ASYNC_VIEWS = settings.SERVER_MODE == "asgi"
+
 urlpatterns = [
     path("", views.product_list, name="product_list"),
     path("category/<slug:slug>/", views.category_list, name="category"),
@@ -18,19 +23,36 @@ urlpatterns = [
     path("cart/remove/<int:product_id>/", views.cart_remove, name="cart_remove"),
     path("cart/update/<int:product_id>/", views.cart_update, name="cart_update"),
     # Checkout
-    path("checkout/", views.checkout, name="checkout"),
-    path("success/", views.payment_success, name="payment_success"),
+    path(
+        "checkout/",
+        views.checkout_async if ASYNC_VIEWS else views.checkout,
+        name="checkout",
+    ),
+    path(
+        "success/",
+        views.payment_success_async if ASYNC_VIEWS else views.payment_success,
+        name="payment_success",
+    ),
     path("cancel/", views.payment_cancel, name="payment_cancel"),
     # Stripe webhook
-    path("webhook/", webhooks.stripe_webhook, name="stripe_webhook"),
+    path(
+        "webhook/",
+        webhooks.stripe_webhook_async if ASYNC_VIEWS else webhooks.stripe_webhook,
+        name="stripe_webhook",
+    ),
     # Secure downloads (uses ProductDownload model)
     path(
         "secure-download/<int:order_item_id>/<int:download_id>/",
-        views.secure_download,
+        views.secure_download_async if ASYNC_VIEWS else views.secure_download,
         name="secure_download",
     ),
     # Orders / Purchases
     path("orders/", views.order_history, name="order_history"),
+    path(
+        "orders/status/<str:payment_intent_id>/",
+        views.order_status,
+        name="order_status",
+    ),
     path("orders/<str:order_id>/", views.order_detail, name="order_detail"),
     path("purchases/", views.purchases, name="purchases"),
     # Reviews
@@ -15,12 +15,16 @@ from .cart import (
 
 from .checkout import (
     checkout,
+    checkout_async,
     payment_success,
+    payment_success_async,
     payment_cancel,
+    order_status,
 )
 
 from .downloads import (
     secure_download,
+    secure_download_async,
     purchases,
     order_history,
     order_detail,
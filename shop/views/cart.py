@@ -4,7 +4,7 @@ from django.views.decorators.http import require_POST
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 import logging
-from ..cart import Cart
+from ..cart import Cart, CartFullError
 
 
 logger = logging.getLogger("shop")
@@ -25,7 +25,14 @@ def cart_add(request, product_id):
     else:
         download_id = None
 
-    cart.add(product=product, quantity=quantity, download_id=download_id)
+    try:
+        cart.add(product=product, quantity=quantity, download_id=download_id)
+    except CartFullError:
+        messages.error(
+            request,
+            "Your cart is full. Please check out or remove an item before adding more.",
+        )
+        return redirect("shop:cart_detail")
 
     messages.success(request, f"{product.title} has been added to your cart.")
     # Add for screen reader announcement
@@ -59,10 +66,13 @@ def cart_update(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     quantity = int(request.POST.get("quantity", 1))
     download_id = request.POST.get("download_id")
-    cart.add(
-        product=product,
-        quantity=quantity,
-        override_quantity=True,
-        download_id=download_id,
-    )
+    try:
+        cart.add(
+            product=product,
+            quantity=quantity,
+            override_quantity=True,
+            download_id=download_id,
+        )
+    except CartFullError:
+        messages.error(request, "Your cart is full and could not be updated.")
     return redirect("shop:cart_detail")
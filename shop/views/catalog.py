@@ -1,13 +1,17 @@
 # shop/views/catalog.py
-from ..models import Category, Product, OrderItem
-from django.shortcuts import render, get_object_or_404
+from ..models import Entitlement
+from django.http import Http404
+from django.shortcuts import render
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
 import logging
 from shop.forms import ProductReviewForm
-from ..models import WishList
 from ..models import ShopSettings
 from ..config_manager import ConfigManager
+from ..catalog_index import get_index
+from content.cache import container_blocks, container_hero
+from ..loaders import load_product_detail
+from .. import recommendations
+from ..user_state import get_user_state
 
 # Set up logger
 logger = logging.getLogger("shop")
@@ -31,115 +35,75 @@ def product_list(request):
     if not shop_settings:
         shop_settings = ShopSettings.objects.create()
 
-    # Base product queryset
-    products = Product.objects.filter(
-        is_active=True, status__in=["publish", "soon", "full"]
-    )
+    # Listed products come from the in-memory catalog index (no queries)
+    index = get_index()
 
     # Apply display mode filtering
-    if shop_settings.product_display_mode == "featured":
-        products = products.filter(featured=True)
-    elif (
+    products = index.listing(
+        featured=shop_settings.product_display_mode == "featured", query=query
+    )
+    if (
         shop_settings.product_display_mode == "category"
-        and shop_settings.display_category
+        and shop_settings.display_category_id
     ):
-        products = products.filter(category=shop_settings.display_category)
+        products = [
+            p for p in products if p.category_id == shop_settings.display_category_id
+        ]
 
     # Apply URL-based category filter (overrides display mode if present)
     current_category = None
     if category_slug:
-        current_category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=current_category)
-
-    # Apply search filter
-    if query:
-        products = products.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
+        current_category = index.category(category_slug)
+        if current_category is None:
+            raise Http404("No Category matches the given query.")
+        products = [p for p in products if p.category_id == current_category.id]
 
-    # Order and paginate
-    products = products.order_by("order", "-created")
+    # Paginate (already in listing order)
     paginator = Paginator(products, shop_settings.products_per_page)
     page = request.GET.get("page")
     products = paginator.get_page(page)
 
     # Get categories for filter sidebar
-    categories = Category.objects.annotate(
-        product_count=Count(
-            "product",
-            filter=Q(
-                product__is_active=True,
-                product__status__in=["publish", "soon", "full"],
-            ),
-        )
-    ).filter(product_count__gt=0)
+    categories = index.listed_categories()
 
     # ============================================
     # Unified Container-Based Blocks
     # ============================================
 
-    container_blocks = []
-
-    # SectionBlocks
-    container_blocks += list(
-        shop_settings.content_container.sections.filter(published=True)
-    )
-
-    # FAQBlocks
-    container_blocks += list(
-        shop_settings.content_container.faq_blocks.filter(published=True)
-    )
-
-    # NewsletterBlocks
-    container_blocks += list(
-        shop_settings.content_container.newsletter_blocks.filter(published=True)
-    )
-
-    # SpotlightBlocks
-    container_blocks += list(
-        shop_settings.content_container.spotlight_blocks.filter(published=True)
-    )
-    # GalleryBlocks
-    container_blocks += list(
-        shop_settings.content_container.gallery_blocks.filter(published=True)
+    # Published blocks and hero are cached (content/cache.py)
+    container_id = shop_settings.content_container_id
+    content_blocks = (
+        container_blocks(
+            container_id,
+            "sections",
+            "faq_blocks",
+            "newsletter_blocks",
+            "spotlight_blocks",
+            "gallery_blocks",
+        )
+        if container_id
+        else []
     )
 
     # Product placeholder block
     if shop_settings.show_products_on_homepage:
-        container_blocks.append(
-            {
-                "type": "products",
-                "order": shop_settings.products_order,
-            }
+        content_blocks = sorted(
+            content_blocks
+            + [
+                {
+                    "type": "products",
+                    "block_type": "products",
+                    "order": shop_settings.products_order,
+                }
+            ],
+            key=lambda x: x["order"] if isinstance(x, dict) else x.order,
         )
-
-    # Sort everything by order
-    content_blocks = sorted(
-        container_blocks,
-        key=lambda x: x["order"] if isinstance(x, dict) else x.order,
-    )
-    # Add safe block_type attribute for templates
-    for block in content_blocks:
-        if isinstance(block, dict):
-            block["block_type"] = block.get("type")
-        else:
-            block.block_type = block.__class__.__name__
     # ============================================
     # Hero (Unified Container System)
     # ============================================
 
-    hero = None
-    hero_banner = None
-
-    if shop_settings.content_container:
-        hero = (
-            shop_settings.content_container.hero_blocks.filter(published=True)
-            .order_by("order")
-            .first()
-        )
-
-        if hero and hero.banner_published:
-            hero_banner = hero
+    hero = container_hero(container_id) if container_id else None
+    hero_banner = hero if hero and hero.banner_published else None
 
     return render(
         request,
@@ -160,41 +124,29 @@ def product_list(request):
 
 
 def product_detail(request, slug):
-    product = get_object_or_404(
-        Product,
-        slug=slug,
-        is_active=True,
-        status__in=["publish", "soon", "full"],
-    )
-
-    wishlist_items = []
-    if request.user.is_authenticated:
-        wishlist_items = list(
-            WishList.objects.filter(user=request.user).values_list(
-                "product_id", flat=True
-            )
-        )
+    # Product, category, images, downloads and a page of reviews in one pass
+    product, reviews = load_product_detail(slug, request.GET.get("reviews"))
 
-    related_products = Product.objects.filter(
-        category=product.category,
-        status__in=["publish", "full"],
-        is_active=True,
-    ).exclude(id=product.id)[:3]
+    # Precomputed "customers also bought", padded from the same category
+    related_products, also_bought = recommendations.related_products(product)
 
+    # Wishlist / purchase / review state comes from the cached user state;
+    # only owners pay for the lookup of their order
+    state = get_user_state(request.user)
+    has_purchased = product.id in state.purchased
     order_item = None
-    has_purchased = False
-    review_form = None
-
-    if request.user.is_authenticated:
-        order_item = OrderItem.objects.filter(
-            order__user=request.user,
-            order__paid=True,
-            product=product,
-        ).first()
-        has_purchased = bool(order_item)
-        review_form = ProductReviewForm() if product.can_review(request.user) else None
+    if has_purchased:
+        entitlement = (
+            Entitlement.objects.filter(user=request.user, product=product)
+            .select_related("order_item__order")
+            .order_by("granted_at")
+            .first()
+        )
+        order_item = entitlement.order_item if entitlement else None
+    can_review = request.user.is_superuser or state.can_review(product.id)
+    review_form = ProductReviewForm() if can_review else None
 
-    # Additional product images
+    # Additional product images (prefetched)
     images = product.images.all()
     template = (
         "shop/detail_landing.html"
@@ -207,13 +159,14 @@ def product_detail(request, slug):
         template,
         {
             "product": product,
-            "wishlist_items": wishlist_items,
             "related_products": related_products,
+            "also_bought": also_bought,
             "has_purchased": has_purchased,
             "order_item": order_item,
             "STRIPE_PUBLIC_KEY": ConfigManager.get("stripe_public_key"),
             "form": review_form,
             "images": images,
+            "reviews": reviews,
             "breadcrumbs": [
                 {"title": "Shop", "url": "/shop/"},
                 {
@@ -227,20 +180,17 @@ def product_detail(request, slug):
 
 
 def category_hub(request):
-    categories = Category.objects.filter(
-        product__status__in=["publish", "soon", "full"], product__is_active=True
-    ).distinct()
+    categories = get_index().listed_categories()
     return render(request, "shop/category_hub.html", {"categories": categories})
 
 
 def category_list(request, slug):
-    category = get_object_or_404(Category, slug=slug)
+    index = get_index()
+    category = index.category(slug)
+    if category is None:
+        raise Http404("No Category matches the given query.")
 
-    products = Product.objects.filter(
-        category=category,
-        status__in=["publish", "soon", "full"],
-        is_active=True,
-    ).order_by("order", "-created")
+    products = index.listing(category_id=category.id)
 
     paginator = Paginator(products, 12)
     page = request.GET.get("page")
@@ -1,12 +1,19 @@
 # shop/views/checkout.py
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, redirect
-from ..models import Order, OrderItem
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from ..models import Order
 from pages.models import SiteSettings
-from ..emails import send_order_confirmation_email
+from ..emails import send_order_emails, send_order_emails_async
 from ..cart import Cart
 from ..config_manager import ConfigManager
+from ..orders import complete_order, sync_pending_order
+from ..stripe_client import StripeUnavailable, get_stripe_client
 import stripe
 import logging
 
@@ -19,8 +26,53 @@ def checkout(request):
     Display checkout page with Stripe payment form.
     Requires authenticated user.
     """
+    response, payment = _prepare_checkout(request)
+    if response:
+        return response
+
+    try:
+        intent = _ensure_payment_intent(request, payment)
+        if intent != payment["stored_intent"]:
+            sync_pending_order(request.user, payment["cart"], intent["id"])
+        return render(request, "shop/checkout.html", _checkout_context(payment, intent))
+
+    except Exception as e:
+        return _checkout_error(request, e)
+
+
+async def checkout_async(request):
+    """
+    ASGI version of checkout: the PaymentIntent round-trip to Stripe is
+    awaited instead of holding a worker.
+    """
+    response, payment = await sync_to_async(_prepare_checkout)(request)
+    if response:
+        return response
+
+    try:
+        intent = await _ensure_payment_intent_async(request, payment)
+        if intent != payment["stored_intent"]:
+            await sync_to_async(sync_pending_order)(
+                request.user, payment["cart"], intent["id"]
+            )
+        return await sync_to_async(render)(
+            request, "shop/checkout.html", _checkout_context(payment, intent)
+        )
+
+    except Exception as e:
+        return await sync_to_async(_checkout_error)(request, e)
+
+
+def _prepare_checkout(request):
+    """
+    Validate the user, Stripe config and cart for checkout.
+
+    Returns (redirect_response, None) if checkout can't go ahead, otherwise
+    (None, payment) where payment holds the cart, Stripe config and the
+    PaymentIntent parameters.
+    """
     if not request.user.is_authenticated:
-        return redirect("account_login")
+        return redirect("account_login"), None
 
     # Check if demo mode or Stripe not configured
     stripe_config = ConfigManager.get_stripe_config()
@@ -29,144 +81,323 @@ def checkout(request):
             request,
             "Payment processing is not available at this time. Please contact the store owner.",
         )
-        return redirect("shop:cart_detail")
+        return redirect("shop:cart_detail"), None
 
     cart = Cart(request)
+    stored_intent = request.session.get(settings.CHECKOUT_INTENT_SESSION_ID)
+    if (
+        stored_intent
+        and Order.objects.filter(
+            payment_intent_id=stored_intent["id"], status="completed"
+        ).exists()
+    ):
+        # Paid (the webhook completed it) but the success page never loaded
+        _forget_checkout(request)
+        messages.info(request, "Your order is complete - find it in your purchases.")
+        return redirect("shop:purchases"), None
+
     if len(cart) == 0:
         messages.error(request, "Your cart is empty.")
-        return redirect("shop:cart_detail")
+        return redirect("shop:cart_detail"), None
 
-    try:
-        total_price = cart.get_total_price()
+    # Cart contents may come from a cookie - re-check prices and
+    # availability against the database before taking payment.
+    if cart.revalidate():
+        messages.warning(
+            request,
+            "Some items in your cart have changed price or are no longer available.",
+        )
+        if len(cart) == 0:
+            return redirect("shop:cart_detail"), None
 
-        if total_price <= 0:
-            messages.error(request, "Invalid cart total")
-            return redirect("shop:cart_detail")
+    total_price = cart.get_total_price()
 
-        # Get currency from SiteSettings, fallback to settings, then to 'gbp'
-        try:
-            site_settings = SiteSettings.objects.first()
-            currency = site_settings.currency_code.lower() if site_settings else "gbp"
-        except Exception:
-            currency = getattr(settings, "STRIPE_CURRENCY", "gbp")
-
-        # Create a new PaymentIntent each time user loads checkout
-        stripe.api_key = stripe_config["secret_key"]
-        intent = stripe.PaymentIntent.create(
-            amount=int(total_price * 100),
-            currency=currency,  # Now uses database setting
-            automatic_payment_methods={"enabled": False},
-            metadata={
+    if total_price <= 0:
+        messages.error(request, "Invalid cart total")
+        return redirect("shop:cart_detail"), None
+
+    # Get currency from SiteSettings, fallback to settings, then to 'gbp'
+    try:
+        site_settings = SiteSettings.objects.first()
+        currency = site_settings.currency_code.lower() if site_settings else "gbp"
+    except Exception:
+        currency = getattr(settings, "STRIPE_CURRENCY", "gbp")
+
+    return None, {
+        "cart": cart,
+        "cart_hash": cart.get_fingerprint(),
+        "stored_intent": stored_intent,
+        "stripe_config": stripe_config,
+        "stripe": get_stripe_client(),
+        "intent_params": {
+            "amount": int(total_price * 100),
+            "currency": currency,  # Now uses database setting
+            "automatic_payment_methods": {"enabled": False},
+            "metadata": {
                 "user_id": str(request.user.id),
             },
-            receipt_email=request.user.email,
-        )
+            "receipt_email": request.user.email,
+        },
+    }
 
-        context = {
-            "client_secret": intent.client_secret,
-            "STRIPE_PUBLIC_KEY": stripe_config["public_key"],
-            "cart": cart,
-            "payment_intent_id": intent.id,
-        }
-        return render(request, "shop/checkout.html", context)
 
-    except stripe.error.StripeError as e:
+def _checkout_context(payment, intent):
+    return {
+        "client_secret": intent["client_secret"],
+        "STRIPE_PUBLIC_KEY": payment["stripe_config"]["public_key"],
+        "cart": payment["cart"],
+        "payment_intent_id": intent["id"],
+    }
+
+
+# One PaymentIntent per cart: reloading the checkout page reuses the intent
+# stored in the session and only talks to Stripe when there is no intent yet
+# or the amount/currency changed.
+
+
+def _intent_action(request, payment):
+    """Return "reuse", "modify" or "create" for the stored intent."""
+    stored = payment["stored_intent"]
+    params = payment["intent_params"]
+    if not stored or stored.get("user_id") != request.user.id:
+        return "create"
+    if stored["cart_hash"] == payment["cart_hash"]:
+        return "reuse"
+    if (stored["amount"], stored["currency"]) != (
+        params["amount"],
+        params["currency"],
+    ):
+        return "modify"
+    # Different items, same total - nothing for Stripe to know
+    return "reuse"
+
+
+def _ensure_payment_intent(request, payment):
+    """Make sure a PaymentIntent matching the cart exists; return its details."""
+    params = payment["intent_params"]
+    action = _intent_action(request, payment)
+    intent = payment["stored_intent"]
+
+    if action == "modify":
+        try:
+            payment["stripe"].modify_payment_intent(
+                intent["id"], amount=params["amount"], currency=params["currency"]
+            )
+        except stripe.error.InvalidRequestError as e:
+            # Already paid or cancelled - start a fresh one
+            logger.info(f"Could not update PaymentIntent {intent['id']}: {str(e)}")
+            action = "create"
+
+    if action == "create":
+        created = payment["stripe"].create_payment_intent(**params)
+        intent = {"id": created.id, "client_secret": created.client_secret}
+
+    return _remember_intent(request, payment, intent)
+
+
+async def _ensure_payment_intent_async(request, payment):
+    """Async version of _ensure_payment_intent."""
+    params = payment["intent_params"]
+    action = _intent_action(request, payment)
+    intent = payment["stored_intent"]
+
+    if action == "modify":
+        try:
+            await payment["stripe"].modify_payment_intent_async(
+                intent["id"], amount=params["amount"], currency=params["currency"]
+            )
+        except stripe.error.InvalidRequestError as e:
+            logger.info(f"Could not update PaymentIntent {intent['id']}: {str(e)}")
+            action = "create"
+
+    if action == "create":
+        created = await payment["stripe"].create_payment_intent_async(**params)
+        intent = {"id": created.id, "client_secret": created.client_secret}
+
+    return _remember_intent(request, payment, intent)
+
+
+def _remember_intent(request, payment, intent):
+    """Store the intent, with the cart it was priced for, in the session."""
+    params = payment["intent_params"]
+    intent = {
+        "id": intent["id"],
+        "client_secret": intent["client_secret"],
+        "user_id": request.user.id,
+        "cart_hash": payment["cart_hash"],
+        "amount": params["amount"],
+        "currency": params["currency"],
+    }
+    if intent != payment["stored_intent"]:
+        request.session[settings.CHECKOUT_INTENT_SESSION_ID] = intent
+    return intent
+
+
+def _checkout_error(request, e):
+    if isinstance(e, StripeUnavailable):
+        logger.error(f"Stripe unavailable during checkout: {str(e)}")
+        messages.error(
+            request,
+            "Payments are temporarily unavailable. Your cart has been saved - "
+            "please try again in a few minutes.",
+        )
+    elif isinstance(e, stripe.error.StripeError):
         logger.error(f"Stripe error during checkout: {str(e)}")
         messages.error(request, f"Payment processing error: {str(e)}")
-        return redirect("shop:cart_detail")
-
-    except Exception as e:
+    else:
         logger.error(f"Unexpected checkout error: {str(e)}")
         messages.error(request, "An error occurred during checkout. Please try again.")
-        return redirect("shop:cart_detail")
+    return redirect("shop:cart_detail")
 
 
 def payment_success(request):
     """
-    Handle successful payment.
-    Creates order, sends confirmation email, shows success page.
+    Show the result of a payment.
+
+    The Stripe webhook normally completes the order before the customer is
+    redirected here, so this is a local lookup. Only if the webhook hasn't
+    landed yet do we ask Stripe, with a short timeout; if that doesn't settle
+    it either, a pending page polls order_status until it does.
     Downloads are accessed via dashboard - no download links sent.
     """
+    try:
+        response, order = _find_order(request)
+        if response:
+            return response
+
+        if order.status != "completed":
+            if _retrieve_intent_status(order) == "succeeded":
+                completed = complete_order(order.payment_intent_id)
+                if completed:
+                    # Send emails - order confirmation only, no download links
+                    send_order_emails(completed)
+                order.refresh_from_db()
+
+        return _payment_result(request, order)
+
+    except Exception as e:
+        return _payment_success_error(request, e)
+
+
+async def payment_success_async(request):
+    """
+    ASGI version of payment_success: the fallback Stripe lookup and the
+    SMTP sends are awaited instead of holding a worker.
+    """
+    try:
+        response, order = await sync_to_async(_find_order)(request)
+        if response:
+            return response
+
+        if order.status != "completed":
+            if await _retrieve_intent_status_async(order) == "succeeded":
+                completed = await sync_to_async(complete_order)(order.payment_intent_id)
+                if completed:
+                    await send_order_emails_async(completed)
+                await order.arefresh_from_db()
+
+        return await sync_to_async(_payment_result)(request, order)
+
+    except Exception as e:
+        return await sync_to_async(_payment_success_error)(request, e)
+
+
+@login_required
+@require_GET
+def order_status(request, payment_intent_id):
+    """Polled by the pending page: the order's locally confirmed status."""
+    status = (
+        Order.objects.filter(user=request.user, payment_intent_id=payment_intent_id)
+        .values_list("status", flat=True)
+        .first()
+    )
+    if status is None:
+        raise Http404("Order not found.")
+    return JsonResponse({"status": status})
+
+
+def _find_order(request):
+    """
+    Look up the customer's order for ?payment_intent=...
+
+    Returns (redirect_response, None) if there is none, otherwise (None, order).
+    """
     payment_intent_id = request.GET.get("payment_intent")
     if not payment_intent_id:
         messages.error(request, "No payment information found.")
-        return redirect("shop:cart_detail")
+        return redirect("shop:cart_detail"), None
 
-    try:
-        stripe_config = ConfigManager.get_stripe_config()
-        stripe.api_key = stripe_config["secret_key"]
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-        if payment_intent.status != "succeeded":
-            messages.error(request, "Payment was not successful.")
-            return redirect("shop:cart_detail")
-
-        if not request.user.is_authenticated:
-            messages.error(request, "You must be logged in to complete checkout.")
-            return redirect("account_login")
-
-        # Prevent duplicate orders
-        existing_order = Order.objects.filter(
-            payment_intent_id=payment_intent_id
-        ).first()
-        if existing_order:
-            return redirect("shop:purchases")
-
-        cart = Cart(request)
-
-        # Create the order
-        order = Order.objects.create(
-            user=request.user,
-            email=request.user.email,
-            payment_intent_id=payment_intent_id,
-            paid=True,
-            status="completed",
-        )
+    if not request.user.is_authenticated:
+        messages.error(request, "You must be logged in to complete checkout.")
+        return redirect("account_login"), None
 
-        # Create order items
-        for item in cart:
-            # Get the purchased download if specified
-            purchased_download = None
-            if item.get("download_id"):
-                from ..models import ProductDownload
-
-                try:
-                    purchased_download = ProductDownload.objects.get(
-                        id=item["download_id"]
-                    )
-                except ProductDownload.DoesNotExist:
-                    pass
-
-            OrderItem.objects.create(
-                order=order,
-                product=item["product"],
-                purchased_download=purchased_download,
-                price_paid_pence=int(item["price"] * 100),
-                quantity=item["quantity"],
-            )
+    order = Order.objects.filter(
+        payment_intent_id=payment_intent_id, user=request.user
+    ).first()
+    if order is None:
+        messages.error(request, "No payment information found.")
+        return redirect("shop:cart_detail"), None
+    return None, order
 
-            # Update product purchase count
-            product = item["product"]
-            product.purchase_count += item["quantity"]
-            product.save()
 
-        # Send emails - order confirmation only, no download links
-        try:
-            send_order_confirmation_email(order)
-            from ..emails import send_admin_new_order_email
+def _retrieve_intent_status(order):
+    """The PaymentIntent's status according to Stripe, or None if unknown."""
+    client = get_stripe_client(timeout=settings.STRIPE_CONFIRM_TIMEOUT, max_retries=0)
+    if client is None:
+        return None
+    try:
+        return client.retrieve_payment_intent(order.payment_intent_id).status
+    except stripe.error.StripeError as e:
+        logger.warning(f"Could not confirm {order.payment_intent_id}: {str(e)}")
+        return None
+
 
-            send_admin_new_order_email(order)
-        except Exception as e:
-            logger.error(f"Error sending emails for order {order.order_id}: {str(e)}")
+async def _retrieve_intent_status_async(order):
+    """Async version of _retrieve_intent_status."""
+    client = await sync_to_async(get_stripe_client)(
+        timeout=settings.STRIPE_CONFIRM_TIMEOUT, max_retries=0
+    )
+    if client is None:
+        return None
+    try:
+        intent = await client.retrieve_payment_intent_async(order.payment_intent_id)
+        return intent.status
+    except stripe.error.StripeError as e:
+        logger.warning(f"Could not confirm {order.payment_intent_id}: {str(e)}")
+        return None
 
-        cart.clear()
 
+def _payment_result(request, order):
+    """Render the success, failure or pending response for an order."""
+    if order.status == "completed":
+        _forget_checkout(request)
         return render(request, "shop/success.html", {"order": order})
 
-    except Exception as e:
-        logger.error(f"Error in payment_success: {str(e)}")
-        messages.error(request, "There was an error processing your order.")
+    if order.status == "failed":
+        messages.error(request, "Payment was not successful.")
         return redirect("shop:cart_detail")
 
+    return render(
+        request,
+        "shop/payment_pending.html",
+        {
+            "order": order,
+            "status_url": reverse("shop:order_status", args=[order.payment_intent_id]),
+        },
+    )
+
+
+def _forget_checkout(request):
+    """Empty the cart and drop the session's PaymentIntent once it's paid."""
+    Cart(request).clear()
+    request.session.pop(settings.CHECKOUT_INTENT_SESSION_ID, None)
+
+
+def _payment_success_error(request, e):
+    logger.error(f"Error in payment_success: {str(e)}")
+    messages.error(request, "There was an error processing your order.")
+    return redirect("shop:cart_detail")
+
 
 def payment_cancel(request):
     """Handle cancelled payment."""
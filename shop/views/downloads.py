@@ -1,20 +1,30 @@
 # shop/views/downloads.py
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from datetime import timedelta
+import asyncio
 import os
 import mimetypes
 import logging
 
-from ..models import OrderItem, Order, DownloadLog
+from ebuilder.db import retry_on_locked
+from ..models import DownloadLog, Entitlement, Order, OrderItem
 
 logger = logging.getLogger("shop")
 
 
+# Read size for async streaming; big enough to keep syscalls cheap, small
+# enough that many slow clients don't pin much memory.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
 @login_required
 @require_http_methods(["GET"])
 def secure_download(request, order_item_id, download_id):
@@ -28,25 +38,86 @@ def secure_download(request, order_item_id, download_id):
     - Logs activity
     - Returns file safely
     """
+    response, file_path = _authorize_download(request, order_item_id, download_id)
+    if response:
+        return response
 
-    # Get order item
-    order_item = get_object_or_404(OrderItem, id=order_item_id)
+    filename, content_type = _file_info(file_path)
+    response = FileResponse(
+        open(file_path, "rb"),
+        as_attachment=True,
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
 
-    # Ownership check
-    if order_item.order.user != request.user:
-        messages.error(request, "You do not have permission to access this file.")
-        return redirect("shop:purchases")
+    return response
+
+
+@login_required
+@require_http_methods(["GET"])
+async def secure_download_async(request, order_item_id, download_id):
+    """
+    ASGI version of secure_download.
 
-    # Get requested download
-    download = get_object_or_404(order_item.product.downloads, id=download_id)
+    The checks run exactly as in the sync view; the file is then streamed
+    with async chunked reads so a slow client only costs an idle coroutine,
+    not a worker.
+    """
+    response, file_path = await sync_to_async(_authorize_download)(
+        request, order_item_id, download_id
+    )
+    if response:
+        return response
+
+    filename, content_type = _file_info(file_path)
+    response = StreamingHttpResponse(_aiter_file(file_path), content_type=content_type)
+    response["Content-Length"] = str(os.path.getsize(file_path))
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    return response
+
+
+async def _aiter_file(path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Yield a file's contents without blocking the event loop on disk reads."""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def _file_info(file_path):
+    filename = os.path.basename(file_path)
+    content_type, _ = mimetypes.guess_type(filename)
+    return filename, content_type or "application/octet-stream"
+
+
+def _authorize_download(request, order_item_id, download_id):
+    """
+    Run every download check and record the download.
+
+    Returns (redirect_response, None) if the download is refused, otherwise
+    (None, file_path). Raises Http404 for unknown or missing files.
+    """
+    # Ownership check: one indexed lookup on the customer's entitlements
+    entitlement = (
+        Entitlement.objects.select_related("product", "download", "order_item")
+        .filter(order_item_id=order_item_id, user=request.user)
+        .first()
+    )
+    if entitlement is None:
+        messages.error(request, "You do not have permission to access this file.")
+        return redirect("shop:purchases"), None
 
     # Ensure correct variant was purchased
-    if (
-        order_item.purchased_download
-        and order_item.purchased_download.id != download.id
-    ):
-        messages.error(request, "This file was not part of your purchase.")
-        return redirect("shop:purchases")
+    if entitlement.download_id:
+        if entitlement.download_id != download_id:
+            messages.error(request, "This file was not part of your purchase.")
+            return redirect("shop:purchases"), None
+        download = entitlement.download
+    else:
+        download = get_object_or_404(entitlement.product.downloads, id=download_id)
 
     # Validate file exists
     file_field = download.file
@@ -60,52 +131,46 @@ def secure_download(request, order_item_id, download_id):
         raise Http404("File missing on server.")
 
     # ===== DOWNLOAD LIMIT CHECK =====
-    if order_item.download_count >= order_item.product.download_limit:
+    if entitlement.downloads_left == 0:
         logger.warning(
-            f"Download limit reached: order_item={order_item.id}, user={request.user.id}"
+            f"Download limit reached: order_item={order_item_id}, user={request.user.id}"
         )
         messages.error(request, "You have reached your download limit.")
-        return redirect("shop:purchases")
+        return redirect("shop:purchases"), None
 
     # ===== DUPLICATE REQUEST PROTECTION =====
     recent_download = DownloadLog.objects.filter(
-        order_item=order_item,
+        order_item_id=order_item_id,
         user=request.user,
         downloaded_at__gte=timezone.now() - timedelta(seconds=2),
     ).exists()
 
     if recent_download:
         logger.warning(
-            f"Duplicate download prevented: order_item={order_item.id}, user={request.user.id}"
+            f"Duplicate download prevented: order_item={order_item_id}, user={request.user.id}"
         )
-        return redirect("shop:purchases")
+        return redirect("shop:purchases"), None
 
     # ===== RECORD DOWNLOAD =====
-    order_item.download_count += 1
-    order_item.save()
-
-    DownloadLog.objects.create(
-        order_item=order_item,
-        user=request.user,
-    )
+    _record_download(entitlement, request.user)
 
     logger.info(
-        f"Download successful: order_item={order_item.id}, user={request.user.id}"
+        f"Download successful: order_item={order_item_id}, user={request.user.id}"
     )
+    return None, file_path
 
-    # ===== SERVE FILE =====
-    filename = os.path.basename(file_path)
-    content_type, _ = mimetypes.guess_type(filename)
-    content_type = content_type or "application/octet-stream"
 
-    response = FileResponse(
-        open(file_path, "rb"),
-        as_attachment=True,
-        content_type=content_type,
-    )
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-    return response
+@retry_on_locked
+def _record_download(entitlement, user):
+    """Count the download on the entitlement and order item, and log it."""
+    with transaction.atomic():
+        Entitlement.objects.filter(pk=entitlement.pk).update(
+            downloads_used=F("downloads_used") + 1
+        )
+        OrderItem.objects.filter(pk=entitlement.order_item_id).update(
+            download_count=F("download_count") + 1
+        )
+        DownloadLog.objects.create(order_item=entitlement.order_item, user=user)
 
 
 @login_required
@@ -115,8 +180,13 @@ def purchases(request):
     Includes download links for each product's downloads.
     """
     orders = (
-        Order.objects.filter(user=request.user)
-        .prefetch_related("items__product__downloads")
+        Order.objects.filter(user=request.user, status="completed")
+        .prefetch_related(
+            "items__product__downloads",
+            "items__purchased_download",
+            # Download allowances, one query for every item
+            "items__entitlement",
+        )
         .order_by("-created")
     )
     return render(request, "shop/purchases.html", {"orders": orders})
@@ -125,7 +195,9 @@ def purchases(request):
 @login_required
 def order_history(request):
     """Display order history for the logged-in user."""
-    orders = Order.objects.filter(user=request.user).order_by("-created")
+    orders = Order.objects.filter(user=request.user, status="completed").order_by(
+        "-created"
+    )
     return render(request, "shop/order_history.html", {"orders": orders})
 
 
@@ -1,12 +1,13 @@
 # shop/webhooks.py
 import stripe
 import logging
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from .models import Order
-from .emails import send_order_confirmation_email, send_admin_new_order_email
+from .emails import send_order_emails, send_order_emails_async
 from .config_manager import ConfigManager
+from .orders import complete_order, fail_order
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +18,8 @@ def stripe_webhook(request):
     """
     Handle Stripe webhook events.
     """
-    payload = request.body
-    sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
-
-    try:
-        webhook_secret = ConfigManager.get("stripe_webhook_secret")
-        event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
-    except (ValueError, stripe.error.SignatureVerificationError) as e:
-        logger.error(f"Stripe webhook error: {str(e)}")
+    event = _verify_event(request, ConfigManager.get("stripe_webhook_secret"))
+    if event is None:
         return HttpResponse(status=400)
 
     event_type = event["type"]
@@ -38,41 +33,57 @@ def stripe_webhook(request):
     return HttpResponse(status=200)
 
 
+@csrf_exempt
+@require_POST
+async def stripe_webhook_async(request):
+    """
+    ASGI version of stripe_webhook: database updates run in the sync
+    thread, confirmation emails are sent without blocking the event loop.
+    """
+    webhook_secret = await sync_to_async(ConfigManager.get)("stripe_webhook_secret")
+    event = _verify_event(request, webhook_secret)
+    if event is None:
+        return HttpResponse(status=400)
+
+    event_type = event["type"]
+    payment_intent = event["data"]["object"]
+
+    if event_type == "payment_intent.succeeded":
+        order = await sync_to_async(complete_order)(payment_intent.id)
+        if order:
+            await send_order_emails_async(order)
+    elif event_type == "payment_intent.payment_failed":
+        await sync_to_async(handle_payment_intent_failed)(payment_intent)
+
+    return HttpResponse(status=200)
+
+
+def _verify_event(request, webhook_secret):
+    """Return the verified Stripe event, or None if the signature is bad."""
+    payload = request.body
+    sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
+
+    try:
+        return stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        logger.error(f"Stripe webhook error: {str(e)}")
+        return None
+
+
 def handle_payment_intent_succeeded(payment_intent):
     """
     Handle successful payment from webhook.
-    Updates order status and sends confirmation emails.
+    Completes the pending order created at checkout and sends confirmation
+    emails - unless the success page already did.
     Downloads are accessed via dashboard - no download links sent.
     """
-    order = Order.objects.filter(
-        payment_intent_id=payment_intent.id, status="pending"
-    ).first()
+    order = complete_order(payment_intent.id)
 
     if order:
-        order.status = "completed"
-        order.paid = True
-        order.save()
-
-        # Update purchase counts
-        for order_item in order.items.all():
-            product = order_item.product
-            product.purchase_count += order_item.quantity
-            product.save()
-
         # Send confirmation emails only - no download links
-        try:
-            send_order_confirmation_email(order)
-            send_admin_new_order_email(order)
-        except Exception as e:
-            logger.error(f"Error sending emails in webhook: {str(e)}")
+        send_order_emails(order)
 
 
 def handle_payment_intent_failed(payment_intent):
     """Handle failed payment from webhook."""
-    order = Order.objects.filter(
-        payment_intent_id=payment_intent.id, status="pending"
-    ).first()
-
-    if order:
-        order.status = "failed"
-        order.save()
+    fail_order(payment_intent.id)